@@ -0,0 +1,45 @@
+from datetime import date
+
+from rest_framework.exceptions import ParseError
+
+
+def parse_date(value):
+    """``YYYY-MM-DD`` (or a longer ISO timestamp) to a date; blank is None"""
+    if value in (None, ""):
+        return None
+    return date.fromisoformat(str(value)[:10])
+
+
+class DateRange:
+    """Inclusive ``from``/``to`` (or ``year``) query parameters.
+
+    Order dates are stored as native Neo4j dates, so views filter with a
+    plain range the ``orderDate`` index can seek on::
+
+        MATCH (o:Order)
+        WHERE o.orderDate >= $from AND o.orderDate <= $to
+
+    Missing bounds default to the earliest/latest representable date.
+    """
+
+    def __init__(self, request):
+        params = request.query_params
+        self.start = self._parse(params, "from")
+        self.end = self._parse(params, "to")
+        year = params.get("year")
+        if year and self.start is None and self.end is None:
+            try:
+                self.start, self.end = date(int(year), 1, 1), date(int(year), 12, 31)
+            except ValueError:
+                raise ParseError({"error": "year must be a valid year"})
+
+    @property
+    def params(self):
+        return {"from": self.start or date.min, "to": self.end or date.max}
+
+    @staticmethod
+    def _parse(params, name):
+        try:
+            return parse_date(params.get(name))
+        except ValueError:
+            raise ParseError({"error": f"{name} must be a date (YYYY-MM-DD)"})
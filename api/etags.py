@@ -0,0 +1,118 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.fields import FieldSet
+from api.services.neo4j import Neo4jService
+
+
+class EntityTag:
+    """ETag and ``If-None-Match`` handling for an entity detail view.
+
+    Every API-written node carries a ``version`` that creates set to 1 and
+    updates increment. The view's version query returns the versions of the
+    node and of the related nodes its detail response embeds (e.g. a
+    product's category and supplier) as a list named ``version``::
+
+        MATCH (p:Product {productID: $id})
+        OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)
+        RETURN [coalesce(p.version, 0), coalesce(c.version, 0)] AS version
+
+    Tags are remembered per worker for ``API_ETAG_TTL`` seconds, so repeat
+    conditional GETs are answered without touching Neo4j. Writes call
+    ``invalidate()``; other workers (and edits to related nodes) can serve
+    an old tag until it expires.
+
+    Views that already hold the record in memory (e.g. from
+    ``ReferenceCache``) pass its ``version`` list instead of a query.
+
+    One version has several representations (JSON, MessagePack, columnar,
+    each ``?fields=`` projection), so any but plain JSON with the default
+    fields gets a suffix on the tag, and responses carry ``Vary: Accept``.
+    """
+    _tags = {}  # (label, id) -> (expires_at, etag)
+    _lock = threading.Lock()
+
+    def __init__(self, request, label, id, version_query=None, version=None):
+        self.request = request
+        self.key = (label, id)
+        self.version_query = version_query
+        self._etag = None if version is None else self._format(version)
+
+    @property
+    def etag(self):
+        if self._etag is None:
+            self._etag = self._cached() or self._lookup()
+        if self._etag is None:
+            return None
+        return self._etag[:-1] + self._variant() + '"'
+
+    def is_fresh(self):
+        """Whether the client's ``If-None-Match`` still matches"""
+        header = self.request.headers.get("If-None-Match")
+        if not header or self.etag is None:
+            return False
+        if header.strip() == "*":
+            return True
+        return self.etag in [tag.removeprefix("W/") for tag in parse_etags(header)]
+
+    def not_modified(self):
+        return Response(
+            status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": self.etag, "Vary": "Accept"}
+        )
+
+    def response(self, data):
+        headers = {"Vary": "Accept"}
+        if self.etag:
+            headers["ETag"] = self.etag
+        return Response(data, headers=headers)
+
+    @classmethod
+    def invalidate(cls, label, id):
+        with cls._lock:
+            cls._tags.pop((label, id), None)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._tags.clear()
+
+    def _variant(self):
+        renderer = getattr(self.request, "accepted_renderer", None)
+        media_type = renderer.media_type if renderer else "application/json"
+        fields = self.request.query_params.get(FieldSet.param)
+        if fields is not None:
+            names = [name.strip() for name in fields.split(",") if name.strip()]
+            fields = ",".join(dict.fromkeys(names))
+        if media_type == "application/json" and fields is None:
+            return ""
+        return "-" + hashlib.sha1(f"{media_type};{fields}".encode()).hexdigest()[:8]
+
+    def _cached(self):
+        with self._lock:
+            entry = self._tags.get(self.key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def _lookup(self):
+        rows = Neo4jService.read(self.version_query, {"id": self.key[1]})
+        if not rows:
+            return None
+        etag = self._format(rows[0]["version"])
+        with self._lock:
+            if len(self._tags) >= settings.API_ETAG_CACHE_SIZE:
+                # Drop the oldest half rather than tracking recency
+                for key in list(self._tags)[:len(self._tags) // 2]:
+                    del self._tags[key]
+            self._tags[self.key] = (time.monotonic() + settings.API_ETAG_TTL, etag)
+        return etag
+
+    @staticmethod
+    def _format(versions):
+        return '"' + ".".join(str(version) for version in versions) + '"'
@@ -0,0 +1,69 @@
+from rest_framework.exceptions import ParseError
+
+
+class FieldSet:
+    """The columns a view returns, chosen with ``?fields=name,city``.
+
+    ``columns`` maps every field the entity can return to its Cypher
+    expression, or to an ``(expression, match)`` pair when it reads a related
+    node that ``match`` (an ``OPTIONAL MATCH``) binds. The view's query
+    template marks where those go::
+
+        MATCH (p:Product)
+        WHERE p.productID IN $ids
+        {matches}
+        RETURN {returns}
+
+    Only the requested columns are returned, in the order given, and a
+    related node is only matched when one of its columns is. Without
+    ``?fields=`` the view's ``default`` columns are used; ``required`` ones
+    (the ID and any sort column the view or its pagination needs) are
+    always included.
+    """
+    param = "fields"
+
+    def __init__(self, request, columns, default, required=("id",)):
+        self.columns = columns
+        value = request.query_params.get(self.param)
+        if value is None:
+            names = list(default)
+        else:
+            names = [name.strip() for name in value.split(",") if name.strip()]
+            unknown = [name for name in names if name not in columns]
+            if unknown:
+                raise ParseError({
+                    "error": f"Unknown fields: {', '.join(unknown)}",
+                    "allowed": list(columns),
+                })
+        names = list(dict.fromkeys(names))
+        self.names = [name for name in required if name not in names] + names
+
+    @classmethod
+    def every(cls, columns):
+        """All of ``columns``, the widest query a template can produce"""
+        fields = cls.__new__(cls)
+        fields.columns = columns
+        fields.names = list(columns)
+        return fields
+
+    @property
+    def matches(self):
+        matches = []
+        for name in self.names:
+            column = self.columns[name]
+            if isinstance(column, tuple) and column[1] not in matches:
+                matches.append(column[1])
+        return "\n".join(matches)
+
+    @property
+    def returns(self):
+        return ",\n       ".join(
+            f"{self._expression(name)} AS {name}" for name in self.names
+        )
+
+    def query(self, template):
+        return template.replace("{matches}", self.matches).replace("{returns}", self.returns)
+
+    def _expression(self, name):
+        column = self.columns[name]
+        return column[0] if isinstance(column, tuple) else column
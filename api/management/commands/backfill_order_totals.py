@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.services.rollups import backfill_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute every order's lineCount, subtotal, discountTotal and total from its line items"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=10000, help="Orders per write transaction",
+        )
+
+    def handle(self, *args, **options):
+        backfill_totals(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Order totals backfilled"))
@@ -0,0 +1,294 @@
+import json
+import random
+import string
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.neo4j import Neo4jService
+
+# (weight, endpoint, path) for every GET route; {placeholders} are filled
+# with IDs sampled from the graph before the run
+READS = [
+    (8, "customers/", "customers/"),
+    (6, "customers/{id}/", "customers/{customer}/"),
+    (4, "customers/{id}/orders/", "customers/{customer}/orders/"),
+    (8, "products/", "products/"),
+    (6, "products/{id}/", "products/{product}/"),
+    (3, "products/{id}/orders/", "products/{product}/orders/"),
+    (8, "orders/", "orders/"),
+    (6, "orders/{id}/", "orders/{order}/"),
+    (4, "orders/{id}/details/", "orders/{order}/details/"),
+    (3, "orders/{id}/products/", "orders/{order}/products/"),
+    (2, "suppliers/", "suppliers/"),
+    (2, "suppliers/{id}/", "suppliers/{supplier}/"),
+    (2, "suppliers/{id}/products/", "suppliers/{supplier}/products/"),
+    (2, "categories/", "categories/"),
+    (2, "categories/{id}/", "categories/{category}/"),
+    (2, "categories/{id}/products/", "categories/{category}/products/"),
+    (2, "employees/", "employees/"),
+    (2, "employees/{id}/", "employees/{employee}/"),
+    (2, "employees/{id}/orders/", "employees/{employee}/orders/"),
+    (1, "employees/{id}/territories/", "employees/{employee}/territories/"),
+    (1, "employees/{id}/subordinates/", "employees/{employee}/subordinates/"),
+    (1, "employees/{id}/hierarchy/", "employees/{employee}/hierarchy/"),
+    (1, "employees/{id}/chain/", "employees/{employee}/chain/"),
+    (1, "employees/{id}/team-sales/", "employees/{employee}/team-sales/"),
+    (1, "shippers/", "shippers/"),
+    (1, "shippers/{id}/", "shippers/{shipper}/"),
+    (2, "shippers/{id}/orders/", "shippers/{shipper}/orders/"),
+    (1, "regions/", "regions/"),
+    (1, "regions/{id}/", "regions/{region}/"),
+    (1, "regions/{id}/territories/", "regions/{region}/territories/"),
+    (1, "territories/", "territories/"),
+    (1, "territories/{id}/", "territories/{territory}/"),
+    (1, "territories/{id}/employees/", "territories/{territory}/employees/"),
+    (2, "search/products/", "search/products/?q=gol"),
+    (2, "search/customers/", "search/customers/?q=market"),
+    (1, "search/suppliers/", "search/suppliers/?q=river"),
+    (3, "analytics/dashboard/", "analytics/dashboard/"),
+    (2, "analytics/top-products/", "analytics/top-products/"),
+    (2, "analytics/top-customers/", "analytics/top-customers/"),
+    (2, "analytics/top-employees/", "analytics/top-employees/"),
+    (2, "analytics/sales-by-category/", "analytics/sales-by-category/"),
+    (2, "analytics/sales-by-country/", "analytics/sales-by-country/"),
+    (2, "analytics/sales-by-supplier/", "analytics/sales-by-supplier/"),
+    (2, "analytics/shipping-stats/", "analytics/shipping-stats/"),
+    (2, "analytics/monthly-sales/", "analytics/monthly-sales/"),
+    (1, "analytics/cache/", "analytics/cache/"),
+]
+
+# label -> (placeholder, ID property) for the ID pools the reads draw from
+ID_POOLS = {
+    "Customer": ("customer", "customerID"),
+    "Product": ("product", "productID"),
+    "Order": ("order", "orderID"),
+    "Supplier": ("supplier", "supplierID"),
+    "Category": ("category", "categoryID"),
+    "Employee": ("employee", "employeeID"),
+    "Shipper": ("shipper", "shipperID"),
+    "Region": ("region", "regionID"),
+    "Territory": ("territory", "territoryID"),
+}
+
+
+class Command(BaseCommand):
+    help = "Drive every API route with a read/write mix and report latency percentiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/")
+        parser.add_argument("--concurrency", type=int, default=8, help="Client threads")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+        parser.add_argument(
+            "--write-ratio", type=float, default=0.1,
+            help="Share of iterations that run a create/update/delete flow",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Random seed")
+        parser.add_argument("--output", help="Write the results to this JSON file")
+        parser.add_argument("--compare", help="Print p95 changes against an earlier results file")
+
+    def handle(self, *args, **options):
+        self.base_url = options["base_url"].rstrip("/") + "/"
+        self.ids = self._sample_ids()
+        self.samples = defaultdict(list)  # endpoint -> [(seconds, ok)]
+        self.lock = threading.Lock()
+
+        deadline = time.monotonic() + options["duration"]
+        workers = [
+            threading.Thread(
+                target=self._worker,
+                args=(random.Random(options["seed"] + n), deadline, options["write_ratio"]),
+            )
+            for n in range(options["concurrency"])
+        ]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+
+        results = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "baseUrl": self.base_url,
+                "concurrency": options["concurrency"],
+                "duration": round(elapsed, 3),
+                "writeRatio": options["write_ratio"],
+                "orders": Neo4jService.read("MATCH (o:Order) RETURN count(o) AS n")[0]["n"],
+            },
+            "total": _summarize([s for samples in self.samples.values() for s in samples], elapsed),
+            "endpoints": {
+                endpoint: _summarize(samples, elapsed)
+                for endpoint, samples in sorted(self.samples.items())
+            },
+        }
+        self._report(results)
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                self._compare(json.load(f), results)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _sample_ids(self):
+        ids = {}
+        for label, (placeholder, key) in ID_POOLS.items():
+            rows = Neo4jService.read(f"MATCH (n:{label}) RETURN n.{key} AS id LIMIT 1000")
+            if not rows:
+                raise CommandError(f"No {label} nodes found, run `manage.py seed_benchmark` first")
+            ids[placeholder] = [row["id"] for row in rows]
+        return ids
+
+    def _worker(self, rng, deadline, write_ratio):
+        session = requests.Session()
+        weights = [weight for weight, _, _ in READS]
+        flows = [
+            self._order_flow, self._bulk_order_flow, self._customer_flow, self._product_flow,
+            self._supplier_flow, self._category_flow, self._employee_flow,
+            self._shipper_flow,
+        ]
+        while time.monotonic() < deadline:
+            if rng.random() < write_ratio:
+                rng.choice(flows)(session, rng)
+                continue
+            _, endpoint, path = rng.choices(READS, weights)[0]
+            path = path.format(**{
+                placeholder: rng.choice(pool) for placeholder, pool in self.ids.items()
+            })
+            self._call(session, "GET", endpoint, path)
+
+    def _call(self, session, method, endpoint, path, body=None):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, self.base_url + path, json=body, timeout=60)
+            ok = response.status_code < 400
+            data = response.json() if ok and response.content else None
+        except (requests.RequestException, ValueError):
+            ok, data = False, None
+        with self.lock:
+            self.samples[f"{method} {endpoint}"].append((time.perf_counter() - start, ok))
+        return data
+
+    def _crud_flow(self, session, collection, body):
+        """POST a new entity, PUT it and DELETE it again"""
+        created = self._call(session, "POST", f"{collection}/", f"{collection}/", body)
+        if not created:
+            return
+        entity_id = created["id"]
+        item = f"{collection}/{{id}}/"
+        self._call(session, "PUT", item, f"{collection}/{entity_id}/", body)
+        self._call(session, "DELETE", item, f"{collection}/{entity_id}/")
+
+    def _order_flow(self, session, rng):
+        created = self._call(session, "POST", "orders/", "orders/", {
+            "customerId": rng.choice(self.ids["customer"]),
+            "employeeId": rng.choice(self.ids["employee"]),
+            "shipperId": rng.choice(self.ids["shipper"]),
+            "orderDate": "1998-05-01",
+            "requiredDate": "1998-05-29",
+            "freight": 12.5,
+        })
+        if not created:
+            return
+        order_id = created["id"]
+        for product_id in rng.sample(self.ids["product"], min(2, len(self.ids["product"]))):
+            self._call(session, "POST", "orders/{id}/details/", f"orders/{order_id}/details/", {
+                "productId": product_id, "quantity": rng.randint(1, 20),
+            })
+        self._call(session, "PUT", "orders/{id}/", f"orders/{order_id}/", {
+            "orderDate": "1998-05-01", "shippedDate": "1998-05-04", "freight": 14.0,
+        })
+        self._call(session, "DELETE", "orders/{id}/", f"orders/{order_id}/")
+
+    def _bulk_order_flow(self, session, rng):
+        results = self._call(session, "POST", "orders/bulk/", "orders/bulk/", [
+            {
+                "customerId": rng.choice(self.ids["customer"]),
+                "employeeId": rng.choice(self.ids["employee"]),
+                "orderDate": "1998-05-01",
+                "items": [
+                    {"productId": product_id, "quantity": rng.randint(1, 20)}
+                    for product_id in rng.sample(self.ids["product"], min(3, len(self.ids["product"])))
+                ],
+            }
+            for _ in range(20)
+        ])
+        for result in results or []:
+            if result["status"] == 201:
+                self._call(session, "DELETE", "orders/{id}/", f"orders/{result['id']}/")
+
+    def _customer_flow(self, session, rng):
+        customer_id = "Z" + "".join(rng.choices(string.ascii_uppercase, k=4))
+        self._crud_flow(session, "customers", {
+            "customerID": customer_id, "companyName": "Benchmark Traders", "country": "Norway",
+        })
+
+    def _product_flow(self, session, rng):
+        self._crud_flow(session, "products", {
+            "productName": "Benchmark Tea", "unitPrice": 18,
+            "categoryId": rng.choice(self.ids["category"]),
+            "supplierId": rng.choice(self.ids["supplier"]),
+        })
+
+    def _supplier_flow(self, session, rng):
+        self._crud_flow(session, "suppliers", {"companyName": "Benchmark Supplies"})
+
+    def _category_flow(self, session, rng):
+        self._crud_flow(session, "categories", {"categoryName": "Benchmark"})
+
+    def _employee_flow(self, session, rng):
+        self._crud_flow(session, "employees", {
+            "firstName": "Bench", "lastName": "Mark",
+            "reportsToId": rng.choice(self.ids["employee"]),
+        })
+
+    def _shipper_flow(self, session, rng):
+        self._crud_flow(session, "shippers", {"companyName": "Benchmark Freight"})
+
+    def _report(self, results):
+        self.stdout.write(
+            f"{'endpoint':48} {'count':>7} {'err':>5} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        rows = list(results["endpoints"].items()) + [("TOTAL", results["total"])]
+        for endpoint, stats in rows:
+            self.stdout.write(
+                f"{endpoint:48} {stats['count']:7} {stats['errors']:5} {stats['throughput']:8.1f} "
+                f"{stats['p50']:8.1f} {stats['p95']:8.1f} {stats['p99']:8.1f}"
+            )
+
+    def _compare(self, before, after):
+        self.stdout.write(f"\np95 change against {before['meta']['timestamp']}:")
+        for endpoint, stats in after["endpoints"].items():
+            old = before["endpoints"].get(endpoint)
+            if not old or not old["p95"]:
+                continue
+            change = (stats["p95"] - old["p95"]) / old["p95"] * 100
+            self.stdout.write(f"{endpoint:48} {old['p95']:8.1f} -> {stats['p95']:8.1f} ms ({change:+.0f}%)")
+
+
+def _summarize(samples, elapsed):
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    return {
+        "count": len(samples),
+        "errors": sum(1 for _, ok in samples if not ok),
+        "throughput": round(len(samples) / elapsed, 2) if elapsed else 0,
+        "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0,
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "p99": _percentile(latencies, 99),
+    }
+
+
+def _percentile(ordered, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return round(ordered[int(rank) - 1], 2)
@@ -0,0 +1,91 @@
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from neo4j.exceptions import Neo4jError
+
+from api.queries import Query
+from api.services import plans
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN every registered query and fail if a plan regressed against the snapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Only check these queries (default: all)")
+        parser.add_argument(
+            "--snapshot", default=os.path.join(settings.BASE_DIR, "query_plans.json"),
+            help="Plan snapshot to compare with (default: query_plans.json)",
+        )
+        parser.add_argument(
+            "--update", action="store_true",
+            help="Accept the current plans and write them to the snapshot",
+        )
+        parser.add_argument(
+            "--tolerance", type=float, default=10,
+            help="Fail when a plan's largest row estimate grows by more than this factor",
+        )
+        parser.add_argument(
+            "--seed", action="store_true",
+            help="Replace the database's contents with seed_benchmark's graph first",
+        )
+
+    def handle(self, *args, **options):
+        queries = Query.all()
+        unknown = [name for name in options["names"] if name not in queries]
+        if unknown:
+            raise CommandError(f"Unknown queries: {', '.join(unknown)}")
+        if options["names"]:
+            queries = {name: queries[name] for name in options["names"]}
+        if options["seed"]:
+            # Plans and estimates depend on the data, so compare on a known graph
+            call_command("seed_benchmark", flush=True, stdout=self.stdout)
+
+        snapshot = plans.load_snapshot(options["snapshot"])
+        current, failed, regressed, changed, new = {}, [], [], [], []
+        for name, query in queries.items():
+            try:
+                plan = current[name] = plans.explain(query.statement)
+            except Neo4jError as exc:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: {exc.message}"))
+                continue
+            if name not in snapshot:
+                new.append(name)
+                continue
+            problems = plans.regressions(snapshot[name], plan, options["tolerance"])
+            if problems:
+                regressed.append(name)
+                self.stdout.write(self.style.ERROR(f"{name} regressed: {'; '.join(problems)}"))
+                self.stdout.write("\n".join(plans.format_plan(plan)))
+            elif plan != snapshot[name]:
+                changed.append(name)
+                self.stdout.write(self.style.WARNING(f"{name}: plan changed"))
+
+        for name in new:
+            self.stdout.write(self.style.ERROR(f"{name}: no snapshot yet"))
+        stale = sorted(set(snapshot) - set(Query.registry))
+        for name in stale:
+            self.stdout.write(f"{name}: in the snapshot but no longer registered")
+
+        self.stdout.write(
+            f"Checked {len(queries)} query plans: {len(regressed)} regressed, "
+            f"{len(changed)} changed, {len(new)} new, {len(failed)} failed"
+        )
+        if options["update"]:
+            updated = {
+                name: plan for name, plan in snapshot.items() if name not in stale
+            }
+            updated.update(current)
+            plans.save_snapshot(options["snapshot"], updated)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['snapshot']}"))
+        if failed:
+            raise CommandError(f"Could not EXPLAIN {len(failed)} queries")
+        if new and not options["update"]:
+            # Unchecked queries must not pass silently
+            raise CommandError(f"{len(new)} queries have no snapshot; "
+                               "record them with --update and commit the snapshot")
+        if regressed and not options["update"]:
+            raise CommandError(f"{len(regressed)} query plans regressed; "
+                               "fix them or accept them with --update")
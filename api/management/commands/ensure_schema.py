@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.schema import ensure_schema, missing_schema
+
+
+class Command(BaseCommand):
+    help = "Create the Neo4j uniqueness constraints, lookup indexes and full-text indexes used by the API"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only verify the schema and fail if anything is missing",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            missing = missing_schema()
+            for statement in missing:
+                self.stdout.write(f"missing: {statement}")
+            if missing:
+                raise CommandError(f"{len(missing)} constraint(s)/index(es) missing")
+            self.stdout.write(self.style.SUCCESS("Neo4j schema is complete"))
+            return
+
+        created, failed = ensure_schema()
+        for statement in created:
+            self.stdout.write(statement)
+        for statement, reason in failed:
+            self.stdout.write(self.style.ERROR(f"failed: {statement}\n  {reason}"))
+        if failed:
+            raise CommandError(
+                f"{len(failed)} constraint(s)/index(es) could not be created "
+                f"({len(created)} created)"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Neo4j schema is complete ({len(created)} created)"
+        ))
@@ -0,0 +1,34 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from api.services import northwind
+from api.services.neo4j import Neo4jService
+
+
+class Command(BaseCommand):
+    help = "Dump the graph as gzipped NDJSON Northwind tables that import_northwind can load"
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Created if missing; existing table files are overwritten")
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Tables to export in parallel",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        os.makedirs(directory, exist_ok=True)
+        exports = [(table.name, northwind.table_query(table)) for table in northwind.TABLES]
+        exports += [(link.name, northwind.link_query(link)) for link in northwind.LINKS]
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = [pool.submit(self._export, directory, name, query) for name, query in exports]
+            total = sum(future.result() for future in futures)
+        self.stdout.write(self.style.SUCCESS(f"Exported {total} rows to {directory}"))
+
+    def _export(self, directory, name, query):
+        rows = (record["row"] for record in Neo4jService.stream(query))
+        return northwind.write_rows(
+            os.path.join(directory, f"{name}.ndjson.gz"), rows,
+            lambda count: self.stdout.write(f"{name}: {count} rows"),
+        )
@@ -0,0 +1,90 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import northwind
+from api.services.ids import IdService
+from api.services.neo4j import Neo4jService
+from api.services.rollups import backfill_totals, rebuild
+from api.services.schema import ensure_schema
+
+
+class Command(BaseCommand):
+    help = "Load the graph from a directory of Northwind CSV or NDJSON tables (plain or gzipped)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Directory with categories.csv, orders.ndjson.gz, ...")
+        parser.add_argument(
+            "--flush", action="store_true",
+            help="Delete everything in the database first",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=10000, help="Rows per write transaction",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Tables to load in parallel",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        self.batch_size = options["batch_size"]
+        files = {
+            item.name: northwind.find_file(directory, item.name)
+            for item in northwind.TABLES + northwind.LINKS
+        }
+        if not any(files.values()):
+            raise CommandError(f"No Northwind tables found in {directory}")
+        for name, path in files.items():
+            if path is None:
+                self.stdout.write(f"{name}: no file, skipped")
+
+        if options["flush"]:
+            Neo4jService.run("""
+            MATCH (n)
+            CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+            """)
+        _, failed = ensure_schema()
+        if failed:
+            raise CommandError("Could not create the Neo4j schema; run ensure_schema for details")
+        started = time.monotonic()
+
+        # Node tables touch disjoint labels, so they load in parallel. The
+        # relationship passes share end nodes and would contend for their
+        # locks, so they run one after another.
+        tables = [table for table in northwind.TABLES if files[table.name]]
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for future in [
+                pool.submit(self._load_nodes, table, files[table.name]) for table in tables
+            ]:
+                future.result()
+        for table in tables:
+            for fk in table.foreign_keys:
+                northwind.load_foreign_key(
+                    table, fk, northwind.read_rows(files[table.name]), self.batch_size,
+                    self._progress(f"{table.name}.{fk.column}"),
+                )
+        for link in northwind.LINKS:
+            if files[link.name]:
+                northwind.load_link(
+                    link, northwind.read_rows(files[link.name]), self.batch_size,
+                    self._progress(link.name),
+                )
+
+        IdService.resync()
+        backfill_totals(self.batch_size)
+        rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {directory} in {time.monotonic() - started:.1f}s; "
+            "restart running API workers so their ID blocks and caches start fresh"
+        ))
+
+    def _load_nodes(self, table, path):
+        return northwind.load_nodes(
+            table, northwind.read_rows(path), self.batch_size, self._progress(table.name),
+        )
+
+    def _progress(self, name):
+        def report(count):
+            self.stdout.write(f"{name}: {count} rows")
+        return report
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from api.services.neo4j import Neo4jService
+
+DATE_FIELDS = ["orderDate", "requiredDate", "shippedDate"]
+
+
+class Command(BaseCommand):
+    help = "Convert string order dates to native Neo4j dates so date-range filters can use the indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=10000, help="Orders per write transaction",
+        )
+
+    def handle(self, *args, **options):
+        for field in DATE_FIELDS:
+            # Strings that don't start with YYYY-MM-DD (including '') become null
+            Neo4jService.run(f"""
+            MATCH (o:Order)
+            WHERE o.{field} = toString(o.{field})  // strings only
+            CALL {{
+                WITH o
+                SET o.{field} = CASE
+                    WHEN o.{field} =~ '\\\\d{{4}}-\\\\d{{2}}-\\\\d{{2}}.*'
+                    THEN date(substring(o.{field}, 0, 10))
+                END
+            }} IN TRANSACTIONS OF {int(options["batch_size"])} ROWS
+            """)
+            remaining = Neo4jService.read(
+                f"MATCH (o:Order) WHERE o.{field} = toString(o.{field}) RETURN count(o) AS n"
+            )[0]["n"]
+            self.stdout.write(f"{field}: {remaining} string values left")
+        self.stdout.write(self.style.SUCCESS("Order dates migrated"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.services.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the category, country, supplier and total sales rollups from the order graph"
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write(self.style.SUCCESS("Sales rollups rebuilt"))
@@ -0,0 +1,254 @@
+import random
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.neo4j import Neo4jService
+from api.services.rollups import backfill_totals, rebuild
+from api.services.schema import ensure_schema
+
+# Northwind's own sizes; --scale multiplies customers and orders only
+CATEGORIES = [
+    "Beverages", "Condiments", "Confections", "Dairy Products",
+    "Grains/Cereals", "Meat/Poultry", "Produce", "Seafood",
+]
+SUPPLIERS = 29
+PRODUCTS = 77
+SHIPPERS = ["Speedy Express", "United Package", "Federal Shipping"]
+REGIONS = ["Eastern", "Western", "Northern", "Southern"]
+TERRITORIES = 53
+# employeeID -> managerID, the Northwind reporting chain
+EMPLOYEES = {1: 2, 2: None, 3: 2, 4: 2, 5: 2, 6: 5, 7: 5, 8: 2, 9: 5}
+CUSTOMERS = 91
+ORDERS = 830
+
+COUNTRIES = {
+    "Argentina": ["Buenos Aires"], "Austria": ["Graz", "Salzburg"],
+    "Belgium": ["Bruxelles", "Charleroi"], "Brazil": ["Rio de Janeiro", "Sao Paulo"],
+    "Canada": ["Montréal", "Vancouver"], "Denmark": ["Århus", "København"],
+    "Finland": ["Helsinki", "Oulu"], "France": ["Lyon", "Marseille", "Paris"],
+    "Germany": ["Berlin", "München", "Stuttgart"], "Ireland": ["Cork"],
+    "Italy": ["Bergamo", "Torino"], "Mexico": ["México D.F."], "Norway": ["Stavern"],
+    "Poland": ["Warszawa"], "Portugal": ["Lisboa"], "Spain": ["Barcelona", "Madrid"],
+    "Sweden": ["Bräcke", "Luleå"], "Switzerland": ["Bern", "Genève"],
+    "UK": ["Cowes", "London"], "USA": ["Boise", "Portland", "Seattle"],
+    "Venezuela": ["Caracas"],
+}
+WORDS = [
+    "Alpine", "Blue", "Bottom", "Coastal", "Eastern", "Golden", "Great", "Harbor",
+    "Island", "Lake", "Maple", "North", "Old", "Pacific", "River", "Royal",
+    "Silver", "South", "Sunset", "Valley", "West", "Wild",
+]
+KINDS = ["Delicatessen", "Foods", "Imports", "Market", "Provisions", "Supplies", "Traders"]
+FIRST_DATE = date(1996, 7, 4)
+LAST_DATE = date(1998, 5, 6)
+
+
+class Command(BaseCommand):
+    help = "Load a synthetic Northwind graph at a given scale for benchmarking"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", type=int, default=1,
+            help="Multiplier for customers and orders (1 = Northwind's 830 orders)",
+        )
+        parser.add_argument(
+            "--flush", action="store_true",
+            help="Delete everything in the database first",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Random seed")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Rows per write transaction",
+        )
+
+    def handle(self, *args, **options):
+        if options["flush"]:
+            Neo4jService.run("""
+            MATCH (n)
+            CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+            """)
+        elif Neo4jService.read("MATCH (n) RETURN count(n) > 0 AS used")[0]["used"]:
+            raise CommandError("The database is not empty, pass --flush to replace its contents")
+
+        _, failed = ensure_schema()
+        if failed:
+            raise CommandError("Could not create the Neo4j schema; run ensure_schema for details")
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        scale = options["scale"]
+
+        self._reference_data()
+        customers = self._customers(CUSTOMERS * scale)
+        self._orders(ORDERS * scale, customers)
+        backfill_totals(self.batch_size)
+        rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {CUSTOMERS * scale} customers and {ORDERS * scale} orders; "
+            "restart running API workers so their ID blocks and caches start fresh"
+        ))
+
+    def _write(self, query, rows):
+        for start in range(0, len(rows), self.batch_size):
+            Neo4jService.write(query, {"rows": rows[start:start + self.batch_size]})
+
+    def _company(self):
+        return f"{self.rng.choice(WORDS)} {self.rng.choice(WORDS)} {self.rng.choice(KINDS)}"
+
+    def _place(self):
+        country = self.rng.choice(list(COUNTRIES))
+        return country, self.rng.choice(COUNTRIES[country])
+
+    def _date(self, start=FIRST_DATE, end=LAST_DATE):
+        return start + timedelta(days=self.rng.randint(0, (end - start).days))
+
+    def _reference_data(self):
+        rng = self.rng
+        self._write("""
+        UNWIND $rows AS row
+        CREATE (c:Category {categoryID: row.id, categoryName: row.name, description: ''})
+        """, [{"id": i, "name": name} for i, name in enumerate(CATEGORIES, 1)])
+
+        suppliers = []
+        for i in range(1, SUPPLIERS + 1):
+            country, city = self._place()
+            suppliers.append({
+                "supplierID": i, "companyName": self._company(), "contactName": "",
+                "contactTitle": "", "address": "", "city": city, "region": "",
+                "postalCode": "", "country": country, "phone": "", "fax": "", "homePage": "",
+            })
+        self._write("UNWIND $rows AS row CREATE (s:Supplier) SET s = row", suppliers)
+
+        self.products = {}
+        products = []
+        for i in range(1, PRODUCTS + 1):
+            price = round(rng.uniform(2.5, 100), 2)
+            self.products[i] = price
+            products.append({
+                "categoryID": rng.randint(1, len(CATEGORIES)),
+                "supplierID": rng.randint(1, SUPPLIERS),
+                "props": {
+                    "productID": i, "productName": f"{rng.choice(WORDS)} {rng.choice(KINDS)} #{i}",
+                    "unitPrice": price, "unitsInStock": rng.randint(0, 120),
+                    "unitsOnOrder": rng.choice([0, 0, 0, 10, 40]),
+                    "quantityPerUnit": f"{rng.randint(1, 48)} units",
+                    "discontinued": rng.random() < 0.1, "reorderLevel": rng.choice([0, 5, 10, 25]),
+                },
+            })
+        self._write("""
+        UNWIND $rows AS row
+        MATCH (c:Category {categoryID: row.categoryID})
+        MATCH (s:Supplier {supplierID: row.supplierID})
+        CREATE (p:Product)
+        SET p = row.props
+        CREATE (p)-[:PART_OF]->(c)
+        CREATE (s)-[:SUPPLIES]->(p)
+        """, products)
+
+        self._write("""
+        UNWIND $rows AS row
+        CREATE (:Shipper {shipperID: row.id, companyName: row.name, phone: ''})
+        """, [{"id": i, "name": name} for i, name in enumerate(SHIPPERS, 1)])
+
+        self._write("""
+        UNWIND $rows AS row
+        CREATE (:Region {regionID: row.id, regionDescription: row.name})
+        """, [{"id": i, "name": name} for i, name in enumerate(REGIONS, 1)])
+        territories = [
+            {"id": f"{10000 + i * 137:05d}", "name": f"Territory {i}",
+             "regionID": rng.randint(1, len(REGIONS))}
+            for i in range(1, TERRITORIES + 1)
+        ]
+        self._write("""
+        UNWIND $rows AS row
+        MATCH (r:Region {regionID: row.regionID})
+        CREATE (t:Territory {territoryID: row.id, territoryDescription: row.name})
+        CREATE (t)-[:IN_REGION]->(r)
+        """, territories)
+
+        employees = []
+        for employee_id in EMPLOYEES:
+            country, city = self._place()
+            employees.append({
+                "employeeID": employee_id, "firstName": f"First{employee_id}",
+                "lastName": f"Last{employee_id}", "title": "Sales Representative",
+                "titleOfCourtesy": "", "birthDate": str(self._date(date(1950, 1, 1), date(1970, 1, 1))),
+                "hireDate": str(self._date(date(1992, 1, 1), date(1994, 12, 31))),
+                "address": "", "city": city, "region": "", "postalCode": "",
+                "country": country, "homePhone": "", "extension": "", "notes": "",
+            })
+        self._write("UNWIND $rows AS row CREATE (e:Employee) SET e = row", employees)
+        self._write("""
+        UNWIND $rows AS row
+        MATCH (e:Employee {employeeID: row.id})
+        MATCH (m:Employee {employeeID: row.managerID})
+        CREATE (e)-[:REPORTS_TO]->(m)
+        """, [{"id": e, "managerID": m} for e, m in EMPLOYEES.items() if m])
+        self._write("""
+        UNWIND $rows AS row
+        MATCH (e:Employee {employeeID: row.employeeID})
+        MATCH (t:Territory {territoryID: row.territoryID})
+        CREATE (e)-[:IN_TERRITORY]->(t)
+        """, [
+            {"employeeID": rng.choice(list(EMPLOYEES)), "territoryID": t["id"]}
+            for t in territories
+        ])
+
+    def _customers(self, count):
+        customers = []
+        for i in range(1, count + 1):
+            country, city = self._place()
+            customers.append({
+                "customerID": f"C{i:04d}" if i < 10000 else f"{i:05d}",
+                "companyName": self._company(), "contactName": "", "contactTitle": "",
+                "address": "", "city": city, "region": "", "postalCode": "",
+                "country": country, "phone": "", "fax": "",
+            })
+        self._write("UNWIND $rows AS row CREATE (c:Customer) SET c = row", customers)
+        return customers
+
+    def _orders(self, count, customers):
+        rng = self.rng
+        orders = []
+        for order_id in range(10248, 10248 + count):
+            customer = rng.choice(customers)
+            ordered = self._date()
+            shipped = ordered + timedelta(days=rng.randint(1, 30))
+            lines = rng.sample(list(self.products), rng.randint(1, 5))
+            orders.append({
+                "customerID": customer["customerID"],
+                "employeeID": rng.choice(list(EMPLOYEES)),
+                "shipperID": rng.randint(1, len(SHIPPERS)),
+                "props": {
+                    "orderID": order_id, "orderDate": ordered,
+                    "requiredDate": ordered + timedelta(days=28),
+                    "shippedDate": shipped if shipped <= LAST_DATE else None,
+                    "freight": round(rng.uniform(0.5, 300), 2), "shipName": customer["companyName"],
+                    "shipAddress": "", "shipCity": customer["city"], "shipRegion": "",
+                    "shipPostalCode": "", "shipCountry": customer["country"],
+                },
+                "items": [
+                    {"productID": product_id, "unitPrice": self.products[product_id],
+                     "quantity": rng.randint(1, 60),
+                     "discount": rng.choice([0, 0, 0, 0.05, 0.1, 0.15, 0.2, 0.25])}
+                    for product_id in lines
+                ],
+            })
+        self._write("""
+        UNWIND $rows AS row
+        MATCH (c:Customer {customerID: row.customerID})
+        MATCH (e:Employee {employeeID: row.employeeID})
+        MATCH (s:Shipper {shipperID: row.shipperID})
+        CREATE (o:Order)
+        SET o = row.props
+        CREATE (c)-[:PURCHASED]->(o)
+        CREATE (e)-[:SOLD]->(o)
+        CREATE (s)-[:SHIPS]->(o)
+        WITH o, row
+        UNWIND row.items AS item
+        MATCH (p:Product {productID: item.productID})
+        CREATE (o)-[:ORDERS {
+            unitPrice: item.unitPrice,
+            quantity: item.quantity,
+            discount: item.discount
+        }]->(p)
+        """, orders)
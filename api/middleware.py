@@ -0,0 +1,68 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+from api.services.metrics import RequestStats, current_request
+
+
+class QueryMetricsMiddleware:
+    """Tag Neo4j queries with the view that ran them and report their time.
+
+    Adds a ``Server-Timing`` header with the number of queries and the time
+    spent in them. Rows of streamed responses are still being fetched when
+    the header goes out, so those queries only show up in ``/metrics``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self._add_header(response, stats)
+
+    async def _acall(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self._add_header(response, stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current_request.get()
+        if stats is not None:
+            # DRF's api_view wraps the function in a class named after it
+            stats.view = getattr(view_func, "view_class", view_func).__name__
+
+    @staticmethod
+    def _add_header(response, stats):
+        if stats.queries:
+            response["Server-Timing"] = (
+                f'neo4j;dur={stats.seconds * 1000:.1f};desc="{stats.queries} queries"'
+            )
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Gzip responses of at least ``API_GZIP_MIN_BYTES`` for clients that accept it.
+
+    Smaller bodies aren't worth the CPU. Streamed responses are always
+    compressed since their size isn't known up front.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.API_GZIP_MIN_BYTES:
+            return response
+        return super().process_response(request, response)
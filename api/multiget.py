@@ -0,0 +1,43 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+
+class MultiGet:
+    """Fetch several entities by ID with one query.
+
+    IDs come from ``?ids=1,2,3`` or, for lists too long for a URL, from a
+    POST body ``{"ids": [1, 2, 3]}``. The view's query filters with
+    ``WHERE x.id IN $ids``; the response lists results in the order the IDs
+    were given, with ``null`` (and an entry in ``missing``) for unknown ones.
+    """
+    param = "ids"
+
+    def __init__(self, request, cast=int):
+        if request.method == "POST":
+            ids = request.data.get(self.param) if isinstance(request.data, dict) else None
+            if not isinstance(ids, list):
+                raise ParseError({"error": f"{self.param} must be a list"})
+        else:
+            ids = [id for id in request.query_params.get(self.param, "").split(",") if id.strip()]
+        try:
+            self.ids = [cast(id.strip() if isinstance(id, str) else id) for id in ids]
+        except (ValueError, TypeError):
+            raise ParseError({"error": f"Invalid value in {self.param}"})
+        if len(self.ids) > settings.API_MAX_PAGE_SIZE:
+            raise ParseError({"error": f"At most {settings.API_MAX_PAGE_SIZE} ids per request"})
+
+    @classmethod
+    def requested(cls, request):
+        return cls.param in request.query_params
+
+    @property
+    def params(self):
+        return {"ids": self.ids}
+
+    def response(self, rows, id_field="id"):
+        by_id = {row[id_field]: row for row in rows}
+        return Response({
+            "results": [by_id.get(id) for id in self.ids],
+            "missing": [id for id in self.ids if id not in by_id],
+        })
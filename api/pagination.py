@@ -0,0 +1,86 @@
+import base64
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from api.services.neo4j import Neo4jService
+
+
+class KeysetPage:
+    """Cursor pagination keyed on a view's (sort key, id) columns.
+
+    The view's query filters with ``$after`` (``null`` on the first page, else
+    a map with ``key`` and ``id`` from the last row served), orders by the same
+    columns and limits to ``$limit``, which is one more than the page size so
+    we can tell whether a next page exists::
+
+        WHERE $after IS NULL
+           OR p.productName > $after.key
+           OR (p.productName = $after.key AND p.productID > $after.id)
+
+    The cursor handed to clients is opaque (base64 JSON of that pair).
+    ``read()`` runs the query with those parameters and builds the response.
+    """
+    cursor_param = "cursor"
+    size_param = "limit"
+
+    def __init__(self, request, key, id_field="id", default_size=None):
+        self.request = request
+        self.key = key
+        self.id_field = id_field
+        self.size = self._page_size(default_size or settings.API_PAGE_SIZE)
+        self.after = self._decode(request.query_params.get(self.cursor_param))
+
+    @property
+    def params(self):
+        return {"after": self.after, "limit": self.size + 1}
+
+    def read(self, query, params=None):
+        params = {**(params or {}), **self.params}
+        # The columnar renderer takes the rows as value lists, so skip the dicts
+        if getattr(getattr(self.request, "accepted_renderer", None), "columnar", False):
+            return self.response(Neo4jService.read_columns(query, params))
+        return self.response(Neo4jService.read(query, params))
+
+    def response(self, rows):
+        next_url = None
+        if len(rows) > self.size:
+            rows = rows[:self.size]
+            last = rows[-1]
+            cursor = self._encode(self._key_of(last), last[self.id_field])
+            next_url = replace_query_param(
+                self.request.build_absolute_uri(), self.cursor_param, cursor
+            )
+        return Response({"next": next_url, "results": rows})
+
+    def _key_of(self, row):
+        return self.key(row) if callable(self.key) else row[self.key]
+
+    def _page_size(self, default):
+        value = self.request.query_params.get(self.size_param)
+        if value is None:
+            return default
+        try:
+            size = int(value)
+        except ValueError:
+            raise ParseError({"error": f"{self.size_param} must be an integer"})
+        return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+    @staticmethod
+    def _encode(key, id):
+        raw = json.dumps([key, id], separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode(cursor):
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            key, id = json.loads(raw)
+        except (ValueError, TypeError):
+            raise ParseError({"error": "Invalid cursor"})
+        return {"key": key, "id": id}
@@ -0,0 +1,45 @@
+from importlib import import_module
+
+from django.conf import settings
+
+from api.fields import FieldSet
+
+
+class Query(str):
+    """A Cypher statement registered under a name, see ``manage.py check_plans``.
+
+    It is the statement's text wherever a query string is expected, so views
+    hand it straight to ``Neo4jService``. Every statement the views run is
+    declared once at module level::
+
+        ORDER_LINES = Query("orders.lines", \"\"\"
+        MATCH (o:Order {orderID: $id})-[r:ORDERS]->(p:Product)
+        ...
+        \"\"\")
+
+    ``columns`` marks a ``FieldSet`` template; its plan is checked with every
+    column requested, the widest query it can produce.
+    """
+    registry = {}
+
+    def __new__(cls, name, text, columns=None):
+        if name in cls.registry:
+            raise ValueError(f"Query {name!r} is already registered")
+        query = super().__new__(cls, text)
+        query.name = name
+        query.columns = columns
+        cls.registry[name] = query
+        return query
+
+    @property
+    def statement(self):
+        """The text to EXPLAIN, with a template's placeholders filled in"""
+        if self.columns is None:
+            return str(self)
+        return FieldSet.every(self.columns).query(self)
+
+    @classmethod
+    def all(cls):
+        """Every registered query by name; the URLconf imports all the views"""
+        import_module(settings.ROOT_URLCONF)
+        return dict(sorted(cls.registry.items()))
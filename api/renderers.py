@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+import msgpack
+import orjson
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+from api.services.neo4j import Columns
+
+
+def encode_default(value):
+    """Encode what orjson and msgpack can't handle natively"""
+    if isinstance(value, Columns):
+        return list(value)
+    # neo4j.time.Date / DateTime (iso_format) and Python dates (isoformat)
+    if hasattr(value, "iso_format"):
+        return value.iso_format()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    # Lazily translated strings in DRF's error messages
+    if isinstance(value, Promise):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not serializable")
+
+
+class ORJSONRenderer(BaseRenderer):
+    """The default JSON renderer, encoding with orjson instead of ``json``"""
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        option = orjson.OPT_NON_STR_KEYS
+        # The browsable API asks for indented output
+        if (renderer_context or {}).get("indent") or "indent=" in (accepted_media_type or ""):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=encode_default, option=option)
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    """JSON with a list of rows sent as column names plus one array per row.
+
+    ``[{"id": 1, "name": "Chai"}, ...]`` becomes::
+
+        {"columns": ["id", "name"], "rows": [[1, "Chai"], ...]}
+
+    both for a top-level list and for a paginated response's ``results``.
+    Anything else renders as plain JSON. Paginated views ask Neo4j for
+    ``Columns`` when this renderer is chosen (see ``KeysetPage.read``), so
+    no per-row dicts are built at all.
+    """
+    media_type = "application/vnd.northwind.columns+json"
+    format = "columns"
+    charset = None
+    columnar = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, dict) and "results" in data:
+            data = {**data, "results": self._columns(data["results"])}
+        else:
+            data = self._columns(data)
+        return orjson.dumps(data, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+    @staticmethod
+    def _columns(rows):
+        if isinstance(rows, Columns):
+            return {"columns": rows.columns, "rows": rows.rows}
+        if not isinstance(rows, list):
+            return rows
+        if not all(row is None or isinstance(row, dict) for row in rows):
+            return rows
+        # Rows can have different keys; the union is kept. Missing ?ids= rows stay null
+        columns = list(dict.fromkeys(key for row in rows if row for key in row))
+        return {
+            "columns": columns,
+            "rows": [
+                None if row is None else [row.get(column) for column in columns]
+                for row in rows
+            ],
+        }
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack, the same shape as the JSON response in a smaller binary form"""
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
@@ -0,0 +1,216 @@
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.response import Response
+
+from api.services.neo4j import Neo4jService
+
+
+class AnalyticsCache:
+    """In-process LRU cache for analytics results.
+
+    Entries expire after ``ANALYTICS_CACHE_TTL`` seconds and the least
+    recently used ones are evicted once the cached results exceed
+    ``ANALYTICS_CACHE_MAX_BYTES`` (measured as their JSON size). Every entry
+    carries tags naming what it was computed from; write views call
+    ``invalidate()`` with the tags they touch. Invalidation only reaches the
+    worker that handled the write, other workers catch up within the TTL.
+
+    A result computed while a write invalidated one of its tags may predate
+    the write, so callers take a ``generation()`` before computing and
+    ``set()`` drops the result if it moved on.
+    """
+    _entries = OrderedDict()  # key -> (expires_at, size, tags, data)
+    _generations = {}  # tag -> invalidation count
+    _size = 0
+    _lock = threading.Lock()
+    _stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+    MISSING = object()
+
+    @classmethod
+    def get(cls, key):
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    cls._discard(key)
+                cls._stats["misses"] += 1
+                return cls.MISSING
+            cls._entries.move_to_end(key)
+            cls._stats["hits"] += 1
+            return entry[3]
+
+    @classmethod
+    def generation(cls, tags):
+        with cls._lock:
+            return tuple(cls._generations.get(tag, 0) for tag in tags)
+
+    @classmethod
+    def set(cls, key, data, tags=(), generation=None):
+        size = len(json.dumps(data, default=str))
+        max_bytes = settings.ANALYTICS_CACHE_MAX_BYTES
+        if size > max_bytes:
+            return
+        expires_at = time.monotonic() + settings.ANALYTICS_CACHE_TTL
+        with cls._lock:
+            if generation is not None and generation != tuple(
+                cls._generations.get(tag, 0) for tag in tags
+            ):
+                return
+            if key in cls._entries:
+                cls._discard(key)
+            cls._entries[key] = (expires_at, size, frozenset(tags), data)
+            cls._size += size
+            while cls._size > max_bytes:
+                cls._discard(next(iter(cls._entries)))
+                cls._stats["evictions"] += 1
+
+    @classmethod
+    def get_or_compute(cls, key, compute, tags=()):
+        data = cls.get(key)
+        if data is cls.MISSING:
+            generation = cls.generation(tags)
+            data = compute()
+            cls.set(key, data, tags, generation)
+        return data
+
+    @classmethod
+    async def get_or_compute_async(cls, key, compute, tags=()):
+        data = cls.get(key)
+        if data is cls.MISSING:
+            generation = cls.generation(tags)
+            data = await compute()
+            cls.set(key, data, tags, generation)
+        return data
+
+    @classmethod
+    def invalidate(cls, *tags):
+        """Drop every entry computed from any of ``tags``"""
+        tags = set(tags)
+        with cls._lock:
+            for tag in tags:
+                cls._generations[tag] = cls._generations.get(tag, 0) + 1
+            stale = [key for key, entry in cls._entries.items() if entry[2] & tags]
+            for key in stale:
+                cls._discard(key)
+            cls._stats["invalidations"] += len(stale)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+            cls._size = 0
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            return {**cls._stats, "entries": len(cls._entries), "bytes": cls._size}
+
+    @classmethod
+    def _discard(cls, key):
+        cls._size -= cls._entries.pop(key)[1]
+
+
+class ReferenceCache:
+    """Small reference sets (categories, shippers, regions, territories and
+    the employees behind the org chart) held whole in memory.
+
+    A set is loaded with one query on first use and kept as the query's rows
+    plus an index on their ``id``. Write views call ``invalidate()`` with the
+    sets they touch; every set is also reloaded after
+    ``REFERENCE_CACHE_TTL`` seconds, which bounds how stale other workers and
+    counts changed by other views (e.g. a shipper's orderCount) can get.
+    """
+    _sets = {}  # name -> (expires_at, rows, rows by id)
+    _generations = {}  # name -> invalidation count
+    _lock = threading.Lock()
+
+    @classmethod
+    def rows(cls, name, query):
+        return cls._load(name, query)[1]
+
+    @classmethod
+    def get(cls, name, query, id):
+        """The row with ``id`` in the set, or None"""
+        return cls._load(name, query)[2].get(id)
+
+    @classmethod
+    def invalidate(cls, *names):
+        with cls._lock:
+            for name in names:
+                cls._sets.pop(name, None)
+                cls._generations[name] = cls._generations.get(name, 0) + 1
+
+    @classmethod
+    def clear(cls):
+        cls.invalidate(*list(cls._sets))
+
+    @classmethod
+    def _load(cls, name, query):
+        with cls._lock:
+            entry = cls._sets.get(name)
+            generation = cls._generations.get(name, 0)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry
+        rows = Neo4jService.read(query)
+        entry = (
+            time.monotonic() + settings.REFERENCE_CACHE_TTL,
+            rows,
+            {row["id"]: row for row in rows},
+        )
+        with cls._lock:
+            # A write that invalidated the set while we were reading may not
+            # be in these rows, so serve them but leave the next call to reload
+            if cls._generations.get(name, 0) == generation:
+                cls._sets[name] = entry
+        return entry
+
+
+def cached_analytics(*tags):
+    """Cache a GET view's 200 responses per view and normalized query params.
+
+    Goes below ``@api_view`` so the view receives a DRF request.
+    """
+    def decorator(view):
+        def cache_key(request, args, kwargs):
+            return (
+                view.__name__,
+                args,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(
+                    (name, tuple(sorted(values)))
+                    for name, values in request.query_params.lists()
+                )),
+            )
+
+        def store(key, generation, response):
+            if response.status_code == 200:
+                AnalyticsCache.set(key, response.data, tags, generation)
+            return response
+
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                key = cache_key(request, args, kwargs)
+                data = AnalyticsCache.get(key)
+                if data is not AnalyticsCache.MISSING:
+                    return Response(data)
+                generation = AnalyticsCache.generation(tags)
+                return store(key, generation, await view(request, *args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = cache_key(request, args, kwargs)
+            data = AnalyticsCache.get(key)
+            if data is not AnalyticsCache.MISSING:
+                return Response(data)
+            generation = AnalyticsCache.generation(tags)
+            return store(key, generation, view(request, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,104 @@
+import os
+import threading
+
+from django.conf import settings
+from api.queries import Query
+from api.services.neo4j import Neo4jService
+
+
+# Label -> ID property for every entity whose IDs are generated by the API
+ID_PROPERTIES = {
+    "Category": "categoryID",
+    "Employee": "employeeID",
+    "Order": "orderID",
+    "Product": "productID",
+    "Shipper": "shipperID",
+    "Supplier": "supplierID",
+}
+
+
+SEQUENCE_BUMP = Query("ids.bump", """
+MATCH (s:Sequence {name: $name})
+SET s.value = s.value + $size
+RETURN s.value AS value
+""")
+
+SEQUENCE_SEED = Query("ids.seed", """
+MERGE (s:Sequence {name: $name})
+ON CREATE SET s.value = $seed + $size
+ON MATCH SET s.value = s.value + $size
+RETURN s.value AS value
+""")
+
+# Labels can't be parameters, so each label has its own max and resync query
+MAX_IDS = {
+    label: Query(f"ids.max.{label.lower()}", f"""
+MATCH (x:{label})
+RETURN coalesce(max(x.{key}), 0) AS maxId
+""")
+    for label, key in ID_PROPERTIES.items()
+}
+
+RESYNCS = {
+    label: Query(f"ids.resync.{label.lower()}", f"""
+MATCH (s:Sequence {{name: $name}})
+CALL {{ MATCH (x:{label}) RETURN coalesce(max(x.{key}), 0) AS maxId }}
+SET s.value = CASE WHEN maxId > s.value THEN maxId ELSE s.value END
+""")
+    for label, key in ID_PROPERTIES.items()
+}
+
+
+class IdService:
+    """Hands out unique integer IDs from blocks reserved on (:Sequence) nodes.
+
+    Each process reserves ``NEO4J_ID_BLOCK_SIZE`` IDs at a time by atomically
+    bumping the sequence node for the label, then serves them from memory.
+    IDs stay unique across workers; a restarted worker leaves a gap.
+    """
+    _blocks = {}
+    _locks = {}  # label -> lock held while that label's block is used or refilled
+    _pid = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def next_id(cls, label):
+        with cls._lock:
+            if cls._pid != os.getpid():
+                # Never share reserved blocks with a forked worker
+                cls._blocks = {}
+                cls._locks = {}
+                cls._pid = os.getpid()
+            label_lock = cls._locks.setdefault(label, threading.Lock())
+        # Refilling one label's block from Neo4j only holds up that label
+        with label_lock:
+            next_id, last_id = cls._blocks.get(label, (1, 0))
+            if next_id > last_id:
+                next_id, last_id = cls.reserve(label, cls.block_size())
+            cls._blocks[label] = (next_id + 1, last_id)
+            return next_id
+
+    @classmethod
+    def reserve(cls, label, size):
+        """Reserve ``size`` IDs for ``label`` and return the (first, last) pair"""
+        last_id = Neo4jService.transaction(cls._bump, label, size)
+        return last_id - size + 1, last_id
+
+    @classmethod
+    def resync(cls):
+        """Move every sequence past the highest ID in the graph (after bulk loads)"""
+        for label, query in RESYNCS.items():
+            Neo4jService.write(query, {"name": label})
+
+    @staticmethod
+    def block_size():
+        return getattr(settings, "NEO4J_ID_BLOCK_SIZE", 100)
+
+    @staticmethod
+    def _bump(tx, label, size):
+        record = tx.run(SEQUENCE_BUMP, name=label, size=size).single()
+        if record is None:
+            # First use: seed the sequence from the IDs already in the graph
+            seed = tx.run(MAX_IDS[label]).single()["maxId"]
+            record = tx.run(SEQUENCE_SEED, name=label, seed=seed, size=size).single()
+        return record["value"]
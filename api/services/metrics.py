@@ -0,0 +1,163 @@
+import contextvars
+import logging
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    """Neo4j work done on behalf of one request, see QueryMetricsMiddleware"""
+
+    def __init__(self):
+        self.view = "-"
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Shared by every task/thread serving the request; the object is mutated in
+# place so copies of the context (sync_to_async, asyncio.gather) see updates
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class QueryMetrics:
+    """Per-view Neo4j query metrics, exported in Prometheus text format.
+
+    ``Neo4jService`` calls ``record()`` for every statement it runs. Values
+    are labelled with the view that issued the query so the expensive routes
+    stand out. Metrics are per process: each worker exports its own.
+    """
+    SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    ROWS = (1, 10, 100, 1000, 10000, 100000)
+
+    # name -> (type, help, buckets)
+    METRICS = {
+        "neo4j_query_duration_seconds": (
+            "histogram", "Client-side time to run a query and fetch its rows", SECONDS,
+        ),
+        "neo4j_query_rows": (
+            "histogram", "Rows returned per query", ROWS,
+        ),
+        "neo4j_result_available_after_seconds": (
+            "histogram", "Server time until the first record was available", SECONDS,
+        ),
+        "neo4j_result_consumed_after_seconds": (
+            "histogram", "Server time until the last record was consumed", SECONDS,
+        ),
+        "neo4j_query_db_hits_total": (
+            "counter", "Database hits of profiled queries (NEO4J_PROFILE_QUERIES)", None,
+        ),
+        "neo4j_query_updates_total": (
+            "counter", "Nodes, relationships, properties and labels written", None,
+        ),
+    }
+    _series = {}  # (name, view) -> Histogram or number
+    _lock = threading.Lock()
+
+    @staticmethod
+    def prepare(query):
+        """Prefix ``PROFILE`` when db hit counting is switched on"""
+        if getattr(settings, "NEO4J_PROFILE_QUERIES", False):
+            return "PROFILE " + query
+        return query
+
+    @classmethod
+    def record(cls, query, seconds, rows=None, summary=None, stats=None):
+        stats = stats or current_request.get()
+        view = stats.view if stats else "-"
+        if stats:
+            stats.queries += 1
+            stats.seconds += seconds
+
+        with cls._lock:
+            cls._observe("neo4j_query_duration_seconds", view, seconds)
+            if rows is not None:
+                cls._observe("neo4j_query_rows", view, rows)
+            if summary is not None:
+                if summary.result_available_after is not None:
+                    cls._observe("neo4j_result_available_after_seconds", view,
+                                 summary.result_available_after / 1000)
+                if summary.result_consumed_after is not None:
+                    cls._observe("neo4j_result_consumed_after_seconds", view,
+                                 summary.result_consumed_after / 1000)
+                if summary.profile:
+                    cls._increment("neo4j_query_db_hits_total", view, _db_hits(summary.profile))
+                updates = _updates(summary.counters)
+                if updates:
+                    cls._increment("neo4j_query_updates_total", view, updates)
+
+        threshold = getattr(settings, "NEO4J_SLOW_QUERY_MS", None)
+        if threshold is not None and seconds * 1000 >= threshold:
+            logger.warning(
+                "Slow Neo4j query in %s (%.0f ms, %s rows): %s",
+                view, seconds * 1000, rows, " ".join(query.split()),
+            )
+
+    @classmethod
+    def export(cls):
+        """Render every series in the Prometheus text exposition format"""
+        lines = []
+        with cls._lock:
+            for name, (kind, help, buckets) in cls.METRICS.items():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (series, view), value in sorted(cls._series.items()):
+                    if series != name:
+                        continue
+                    label = f'view="{view}"'
+                    if kind == "counter":
+                        lines.append(f"{name}{{{label}}} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets, value.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {value.count}')
+                    lines.append(f"{name}_sum{{{label}}} {value.sum}")
+                    lines.append(f"{name}_count{{{label}}} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._series.clear()
+
+    @classmethod
+    def _observe(cls, name, view, value):
+        histogram = cls._series.get((name, view))
+        if histogram is None:
+            histogram = cls._series[(name, view)] = Histogram(cls.METRICS[name][2])
+        histogram.observe(value)
+
+    @classmethod
+    def _increment(cls, name, view, value):
+        cls._series[(name, view)] = cls._series.get((name, view), 0) + value
+
+
+def _db_hits(plan):
+    return plan.get("dbHits", 0) + sum(_db_hits(child) for child in plan.get("children", []))
+
+
+def _updates(counters):
+    return (
+        counters.nodes_created + counters.nodes_deleted
+        + counters.relationships_created + counters.relationships_deleted
+        + counters.properties_set + counters.labels_added + counters.labels_removed
+    )
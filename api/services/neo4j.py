@@ -1,5 +1,45 @@
-from neo4j import GraphDatabase
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from neo4j import READ_ACCESS, AsyncGraphDatabase, GraphDatabase
 from django.conf import settings
+from api.services.metrics import QueryMetrics, current_request
+
+
+def driver_options():
+    """Pool and retry configuration shared by the sync and async drivers"""
+    return {
+        "auth": (settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+        "max_connection_pool_size": settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+        "max_connection_lifetime": settings.NEO4J_MAX_CONNECTION_LIFETIME,
+        "connection_acquisition_timeout": settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        "max_transaction_retry_time": settings.NEO4J_MAX_TRANSACTION_RETRY_TIME,
+    }
+
+
+class Columns:
+    """A query result as one list of column names and a list of values per row.
+
+    Skips building a dict per record. Indexing returns a row as a dict and
+    slicing returns another ``Columns``, so it can stand in for the list of
+    dicts ``read`` returns.
+    """
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Columns(self.columns, self.rows[index])
+        return dict(zip(self.columns, self.rows[index]))
+
 
 class Neo4jService:
     _driver = None
@@ -7,14 +47,195 @@ class Neo4jService:
     @classmethod
     def driver(cls):
         if cls._driver is None:
-            cls._driver = GraphDatabase.driver(
-                settings.NEO4J_URI,
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-            )
+            cls._driver = GraphDatabase.driver(settings.NEO4J_URI, **driver_options())
         return cls._driver
 
+    @classmethod
+    def session(cls, **config):
+        return cls.driver().session(database=settings.NEO4J_DATABASE, **config)
+
     @classmethod
     def run(cls, query, params=None):
-        with cls.driver().session() as session:
+        """Run a query in an auto-commit transaction (schema and admin commands)"""
+        start = time.perf_counter()
+        with cls.session() as session:
             result = session.run(query, params or {})
-            return [record.data() for record in result]
+            rows = [record.data() for record in result]
+            summary = result.consume()
+        QueryMetrics.record(query, time.perf_counter() - start, len(rows), summary)
+        return rows
+
+    @classmethod
+    def read(cls, query, params=None):
+        """Run a read query in a managed transaction, routed to a reader.
+
+        Against a cluster (``neo4j://``) reads go to followers; transient
+        errors and leader switches are retried by the driver.
+        """
+        with cls.session() as session:
+            return session.execute_read(cls._collect, query, params or {})
+
+    @classmethod
+    def read_columns(cls, query, params=None):
+        """Like ``read`` but returns the rows as ``Columns``"""
+        with cls.session() as session:
+            return session.execute_read(cls._collect_columns, query, params or {})
+
+    @classmethod
+    def stream(cls, query, params=None):
+        """Yield a read query's rows as the driver receives them.
+
+        Records are pulled from the server in fetch-size batches instead of
+        being collected into a list, so memory stays flat for large results.
+        The session stays open until the generator is exhausted or closed.
+        """
+        stats = current_request.get()
+        start = time.perf_counter()
+        rows = 0
+        with cls.session(default_access_mode=READ_ACCESS) as session:
+            result = session.run(QueryMetrics.prepare(query), params or {})
+            for record in result:
+                rows += 1
+                yield record.data()
+            summary = result.consume()
+        QueryMetrics.record(query, time.perf_counter() - start, rows, summary, stats)
+
+    @classmethod
+    def write(cls, query, params=None):
+        """Run a write query inside a managed (retryable) transaction"""
+        with cls.session() as session:
+            return session.execute_write(cls._collect, query, params or {})
+
+    @classmethod
+    def transaction(cls, work, *args):
+        """Call ``work(tx, *args)`` inside a managed write transaction.
+
+        Everything ``work`` runs on ``tx`` commits or rolls back together;
+        ``work`` may be retried on transient errors so it must not have
+        side effects outside the transaction.
+        """
+        start = time.perf_counter()
+        with cls.session() as session:
+            result = session.execute_write(work, *args)
+        QueryMetrics.record(work.__name__, time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    def _collect(tx, query, params):
+        start = time.perf_counter()
+        result = tx.run(QueryMetrics.prepare(query), params)
+        rows = [record.data() for record in result]
+        QueryMetrics.record(query, time.perf_counter() - start, len(rows), result.consume())
+        return rows
+
+    @staticmethod
+    def _collect_columns(tx, query, params):
+        start = time.perf_counter()
+        result = tx.run(QueryMetrics.prepare(query), params)
+        columns = list(result.keys())
+        rows = [record.values() for record in result]
+        QueryMetrics.record(query, time.perf_counter() - start, len(rows), result.consume())
+        return Columns(columns, rows)
+
+
+class AsyncNeo4jService:
+    """Async counterpart of ``Neo4jService`` for ``async def`` views.
+
+    An async driver is bound to the event loop it was first used on, so one
+    is only kept when the worker has a ``long_lived_loop``: under ASGI
+    (uvicorn), where ``backend.asgi`` sets it, one driver serves every
+    request. Under WSGI each async view runs on a fresh loop, so reads and
+    writes go through the sync ``Neo4jService`` pool in worker threads instead,
+    and ``transaction`` uses a driver that is closed with its loop's work.
+    """
+    long_lived_loop = False
+    _driver = None
+    _loop = None
+
+    @classmethod
+    def driver(cls):
+        loop = asyncio.get_running_loop()
+        if cls._driver is None or cls._loop is not loop:
+            cls._driver = AsyncGraphDatabase.driver(settings.NEO4J_URI, **driver_options())
+            cls._loop = loop
+        return cls._driver
+
+    @classmethod
+    def session(cls, **config):
+        return cls.driver().session(database=settings.NEO4J_DATABASE, **config)
+
+    @classmethod
+    @asynccontextmanager
+    async def _session(cls):
+        if cls.long_lived_loop:
+            async with cls.session() as session:
+                yield session
+            return
+        async with AsyncGraphDatabase.driver(settings.NEO4J_URI, **driver_options()) as driver:
+            async with driver.session(database=settings.NEO4J_DATABASE) as session:
+                yield session
+
+    @staticmethod
+    async def _in_thread(call, *args):
+        # Not thread-sensitive: the sync driver is thread-safe, and awaits
+        # gathered by one view (the dashboard) then run side by side
+        return await sync_to_async(call, thread_sensitive=False)(*args)
+
+    @classmethod
+    async def run(cls, query, params=None):
+        if not cls.long_lived_loop:
+            return await cls._in_thread(Neo4jService.run, query, params)
+        start = time.perf_counter()
+        async with cls.session() as session:
+            result = await session.run(query, params or {})
+            rows = [record.data() async for record in result]
+            summary = await result.consume()
+        QueryMetrics.record(query, time.perf_counter() - start, len(rows), summary)
+        return rows
+
+    @classmethod
+    async def read(cls, query, params=None):
+        """Run a read query in a managed transaction, routed to a reader"""
+        if not cls.long_lived_loop:
+            return await cls._in_thread(Neo4jService.read, query, params)
+        async with cls.session() as session:
+            return await session.execute_read(cls._collect, query, params or {})
+
+    @classmethod
+    async def stream(cls, query, params=None):
+        """Async ``Neo4jService.stream``, for a ``long_lived_loop`` only"""
+        stats = current_request.get()
+        start = time.perf_counter()
+        rows = 0
+        async with cls.session(default_access_mode=READ_ACCESS) as session:
+            result = await session.run(QueryMetrics.prepare(query), params or {})
+            async for record in result:
+                rows += 1
+                yield record.data()
+            summary = await result.consume()
+        QueryMetrics.record(query, time.perf_counter() - start, rows, summary, stats)
+
+    @classmethod
+    async def write(cls, query, params=None):
+        """Run a write query inside a managed (retryable) transaction"""
+        if not cls.long_lived_loop:
+            return await cls._in_thread(Neo4jService.write, query, params)
+        async with cls.session() as session:
+            return await session.execute_write(cls._collect, query, params or {})
+
+    @classmethod
+    async def transaction(cls, work, *args):
+        """Await ``work(tx, *args)`` inside a managed write transaction"""
+        start = time.perf_counter()
+        async with cls._session() as session:
+            result = await session.execute_write(work, *args)
+        QueryMetrics.record(work.__name__, time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    async def _collect(tx, query, params):
+        start = time.perf_counter()
+        result = await tx.run(QueryMetrics.prepare(query), params)
+        rows = [record.data() async for record in result]
+        QueryMetrics.record(query, time.perf_counter() - start, len(rows), await result.consume())
+        return rows
@@ -0,0 +1,234 @@
+import csv
+import gzip
+import json
+import os
+from collections import namedtuple
+from itertools import islice
+
+from api.dates import parse_date
+from api.services.neo4j import Neo4jService
+
+# The graph is loaded from and dumped to Northwind's own table layout: one
+# file per table (categories.csv, order-details.csv, ...), foreign-key
+# columns for single-valued relationships and link tables for the rest.
+#
+#   Table: a node label keyed by `key`; `foreign_keys` become relationships
+#   ForeignKey: `column` holds the `key` of the `label` node at the other end
+#     of `type`; `outgoing` is whether the relationship starts at the row's node
+#   Link: a table of (start, end) key pairs plus relationship properties
+Table = namedtuple("Table", "name label key foreign_keys")
+ForeignKey = namedtuple("ForeignKey", "column type label key outgoing")
+Link = namedtuple("Link", "name type start end properties")
+
+TABLES = [
+    Table("categories", "Category", "categoryID", []),
+    Table("suppliers", "Supplier", "supplierID", []),
+    Table("products", "Product", "productID", [
+        ForeignKey("categoryID", "PART_OF", "Category", "categoryID", True),
+        ForeignKey("supplierID", "SUPPLIES", "Supplier", "supplierID", False),
+    ]),
+    Table("shippers", "Shipper", "shipperID", []),
+    Table("regions", "Region", "regionID", []),
+    Table("territories", "Territory", "territoryID", [
+        ForeignKey("regionID", "IN_REGION", "Region", "regionID", True),
+    ]),
+    Table("employees", "Employee", "employeeID", [
+        ForeignKey("reportsTo", "REPORTS_TO", "Employee", "employeeID", True),
+    ]),
+    Table("customers", "Customer", "customerID", []),
+    Table("orders", "Order", "orderID", [
+        ForeignKey("customerID", "PURCHASED", "Customer", "customerID", False),
+        ForeignKey("employeeID", "SOLD", "Employee", "employeeID", False),
+        ForeignKey("shipVia", "SHIPS", "Shipper", "shipperID", False),
+    ]),
+]
+
+LINKS = [
+    Link("employee-territories", "IN_TERRITORY", ("Employee", "employeeID"),
+         ("Territory", "territoryID"), []),
+    Link("order-details", "ORDERS", ("Order", "orderID"),
+         ("Product", "productID"), ["unitPrice", "quantity", "discount"]),
+]
+
+# CSV values are strings; these columns are converted, the rest stay as-is
+INTEGERS = {
+    "categoryID", "supplierID", "productID", "shipperID", "regionID", "employeeID",
+    "orderID", "reportsTo", "shipVia", "unitsInStock", "unitsOnOrder",
+    "reorderLevel", "quantity",
+}
+FLOATS = {"unitPrice", "freight", "discount"}
+BOOLEANS = {"discontinued"}
+DATES = {"orderDate", "requiredDate", "shippedDate"}
+# Binary image columns in the Northwind dump that the API never serves
+SKIPPED = {"picture", "photo"}
+
+EXTENSIONS = [".ndjson.gz", ".ndjson", ".jsonl.gz", ".jsonl", ".csv.gz", ".csv"]
+
+
+def find_file(directory, name):
+    """The file holding table ``name`` in ``directory``, or None"""
+    for extension in EXTENSIONS:
+        path = os.path.join(directory, name + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_rows(path):
+    """Yield a CSV or NDJSON file's rows as dicts of typed values, lazily"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8-sig", newline="") as f:
+        if ".csv" in path:
+            for row in csv.DictReader(f):
+                yield {
+                    column: _convert(column, None if value == "NULL" else value)
+                    for column, value in row.items() if column not in SKIPPED
+                }
+        else:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield {column: _convert(column, value) for column, value in row.items()}
+
+
+def _convert(column, value):
+    if not isinstance(value, str):
+        return value
+    if column in INTEGERS | FLOATS | BOOLEANS | DATES and value.strip() == "":
+        return None
+    if column in INTEGERS:
+        return int(float(value))
+    if column in FLOATS:
+        return float(value)
+    if column in BOOLEANS:
+        return value.strip().lower() in ("1", "true", "yes")
+    if column in DATES:
+        return parse_date(value)
+    return value
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def load_nodes(table, rows, batch_size, progress=None):
+    """MERGE the table's nodes by key and set their non-foreign-key properties"""
+    foreign = {fk.column for fk in table.foreign_keys}
+    query = f"""
+    UNWIND $rows AS row
+    CALL {{
+        WITH row
+        MERGE (n:{table.label} {{{table.key}: row.{table.key}}})
+        SET n += row, n.version = coalesce(n.version, 0) + 1
+    }} IN TRANSACTIONS OF {int(batch_size)} ROWS
+    """
+    return _load(query, (
+        {column: value for column, value in row.items() if column not in foreign}
+        for row in rows
+    ), batch_size, progress)
+
+
+def load_foreign_key(table, fk, rows, batch_size, progress=None):
+    """Point each row's node at the node named by ``fk.column``, replacing the old link"""
+    pattern = f"(n)-[:{fk.type}]->(x)" if fk.outgoing else f"(x)-[:{fk.type}]->(n)"
+    stale = f"(n)-[old:{fk.type}]->(y:{fk.label})" if fk.outgoing \
+        else f"(y:{fk.label})-[old:{fk.type}]->(n)"
+    query = f"""
+    UNWIND $rows AS row
+    CALL {{
+        WITH row
+        MATCH (n:{table.label} {{{table.key}: row.id}})
+        MATCH (x:{fk.label} {{{fk.key}: row.ref}})
+        OPTIONAL MATCH {stale}
+        WHERE y <> x
+        DELETE old
+        MERGE {pattern}
+    }} IN TRANSACTIONS OF {int(batch_size)} ROWS
+    """
+    return _load(query, (
+        {"id": row[table.key], "ref": row[fk.column]}
+        for row in rows if row.get(fk.column) is not None
+    ), batch_size, progress)
+
+
+def load_link(link, rows, batch_size, progress=None):
+    (start_label, start_key), (end_label, end_key) = link.start, link.end
+    query = f"""
+    UNWIND $rows AS row
+    CALL {{
+        WITH row
+        MATCH (a:{start_label} {{{start_key}: row.start}})
+        MATCH (b:{end_label} {{{end_key}: row.end}})
+        MERGE (a)-[r:{link.type}]->(b)
+        SET r = row.props
+    }} IN TRANSACTIONS OF {int(batch_size)} ROWS
+    """
+    return _load(query, (
+        {
+            "start": row[start_key],
+            "end": row[end_key],
+            "props": {name: row.get(name) for name in link.properties},
+        }
+        for row in rows
+    ), batch_size, progress)
+
+
+def _load(query, rows, batch_size, progress):
+    # Each statement carries several server-side transactions' worth of rows
+    # so the round trip is amortised while memory stays bounded
+    count = 0
+    for chunk in chunks(rows, batch_size * 10):
+        Neo4jService.run(query, {"rows": chunk})
+        count += len(chunk)
+        if progress:
+            progress(count)
+    return count
+
+
+def table_query(table):
+    """Stream a table's rows back out, foreign keys included"""
+    columns = ", ".join(
+        f"{fk.column}: head([{_fk_pattern(fk)} | x.{fk.key}])"
+        for fk in table.foreign_keys
+    )
+    return f"""
+    MATCH (n:{table.label})
+    RETURN n {{.*{", " + columns if columns else ""}}} AS row
+    """
+
+
+def _fk_pattern(fk):
+    return f"(n)-[:{fk.type}]->(x:{fk.label})" if fk.outgoing \
+        else f"(x:{fk.label})-[:{fk.type}]->(n)"
+
+
+def link_query(link):
+    (start_label, start_key), (end_label, end_key) = link.start, link.end
+    return f"""
+    MATCH (a:{start_label})-[r:{link.type}]->(b:{end_label})
+    RETURN r {{.*, {start_key}: a.{start_key}, {end_key}: b.{end_key}}} AS row
+    """
+
+
+def write_rows(path, rows, progress=None, every=100000):
+    """Write rows as gzipped NDJSON, one line at a time"""
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, default=_json_default, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+            if progress and count % every == 0:
+                progress(count)
+    if progress:
+        progress(count)
+    return count
+
+
+def _json_default(value):
+    # neo4j.time.Date / DateTime
+    if hasattr(value, "iso_format"):
+        return value.iso_format()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
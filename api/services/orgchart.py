@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+from api.queries import Query
+from api.services.cache import ReferenceCache
+
+# One row per employee; in bad data with several REPORTS_TO edges,
+# reportsToId is the lowest manager ID and managerIds has them all
+EMPLOYEES = Query("employees.tree", """
+MATCH (e:Employee)
+OPTIONAL MATCH (e)-[:REPORTS_TO]->(m:Employee)
+WITH e, m
+ORDER BY m.employeeID
+WITH e, collect(m.employeeID) AS managerIds
+RETURN e.employeeID AS id,
+       e.firstName AS firstName,
+       e.lastName AS lastName,
+       e.firstName + ' ' + e.lastName AS name,
+       e.title AS title,
+       managerIds[0] AS reportsToId,
+       managerIds
+""")
+
+
+class OrgChart:
+    """The whole REPORTS_TO tree, held in memory per worker.
+
+    Built from the "employees" ``ReferenceCache`` set, so it is rebuilt after
+    the employee writes that invalidate that set and every
+    ``REFERENCE_CACHE_TTL`` seconds. Walking it never touches Neo4j.
+    """
+    _current = None
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.employees = {row["id"]: row for row in rows}
+        self.reports = defaultdict(list)  # manager id -> direct report ids
+        for row in rows:
+            for manager_id in row["managerIds"]:
+                self.reports[manager_id].append(row["id"])
+
+    @classmethod
+    def load(cls):
+        rows = ReferenceCache.rows("employees", EMPLOYEES)
+        chart = cls._current
+        # The set's rows are a new list whenever it has been reloaded
+        if chart is None or chart.rows is not rows:
+            chart = cls._current = cls(rows)
+        return chart
+
+    def team(self, employee_id, max_depth=None):
+        """``(id, depth, manager id)`` of the employee (depth 0) and everyone
+        under them, down to ``max_depth`` levels.
+
+        Ordered level by level from the top, so every manager comes before
+        their reports and each depth is the shortest path. The manager is the
+        one the walk came through, so an employee with several REPORTS_TO
+        edges in bad data is counted once, under a manager in the team. An
+        employee already seen is skipped, which also stops a REPORTS_TO cycle.
+        """
+        team, seen, level, depth = [], {employee_id}, [(employee_id, None)], 0
+        while level:
+            team += [(member, depth, manager) for member, manager in level]
+            if depth == max_depth:
+                break
+            below = []
+            for member, _ in level:
+                for report in self.reports[member]:
+                    if report not in seen:
+                        seen.add(report)
+                        below.append((report, member))
+            level, depth = below, depth + 1
+        return team
+
+    def chain(self, employee_id):
+        """``(id, depth)`` of the employee's managers, nearest first, up to
+        the top or to where a REPORTS_TO cycle comes back round"""
+        chain, seen = [], {employee_id}
+        manager_id = self.employees[employee_id]["reportsToId"]
+        while manager_id is not None and manager_id not in seen and manager_id in self.employees:
+            seen.add(manager_id)
+            chain.append((manager_id, len(chain) + 1))
+            manager_id = self.employees[manager_id]["reportsToId"]
+        return chain
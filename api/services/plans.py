@@ -0,0 +1,79 @@
+import json
+import os
+from collections import Counter
+
+from api.services.neo4j import Neo4jService
+
+# Operators that mean a query stopped using an index or started multiplying
+# rows; a plan with more of them than its snapshot has regressed
+REGRESSIONS = ("AllNodesScan", "NodeByLabelScan", "CartesianProduct")
+
+
+def explain(statement):
+    """The plan Neo4j would run ``statement`` with, as nested dicts.
+
+    Only the operator tree and each operator's estimated rows are kept, so
+    plans compare equal across runs against the same data.
+    """
+    with Neo4jService.session() as session:
+        plan = session.run("EXPLAIN " + statement).consume().plan
+    return _operator(plan)
+
+
+def _operator(plan):
+    args = plan.get("args") or plan.get("arguments") or {}
+    return {
+        # e.g. "NodeUniqueIndexSeek@neo4j"
+        "operator": plan["operatorType"].split("@")[0],
+        "estimatedRows": round(float(args.get("EstimatedRows", 0)), 1),
+        "children": [_operator(child) for child in plan.get("children", [])],
+    }
+
+
+def operators(plan):
+    counts = Counter([plan["operator"]])
+    for child in plan["children"]:
+        counts.update(operators(child))
+    return counts
+
+
+def max_rows(plan):
+    """The largest intermediate result the planner expects"""
+    return max([plan["estimatedRows"]] + [max_rows(child) for child in plan["children"]])
+
+
+def regressions(old, new, tolerance=10):
+    """How plan ``new`` is worse than the snapshot ``old``, one message each"""
+    before, after = operators(old), operators(new)
+    problems = [
+        f"{operator}: {before[operator]} -> {after[operator]}"
+        for operator in REGRESSIONS
+        if after[operator] > before[operator]
+    ]
+    seeks_before = sum(count for operator, count in before.items() if "Seek" in operator)
+    seeks_after = sum(count for operator, count in after.items() if "Seek" in operator)
+    if seeks_after < seeks_before:
+        problems.append(f"index seeks: {seeks_before} -> {seeks_after}")
+    if max_rows(new) > tolerance * max(max_rows(old), 1):
+        problems.append(f"estimated rows: {max_rows(old):g} -> {max_rows(new):g}")
+    return problems
+
+
+def format_plan(plan, depth=0):
+    lines = [f"{'  ' * depth}{plan['operator']} ({plan['estimatedRows']:g} rows)"]
+    for child in plan["children"]:
+        lines += format_plan(child, depth + 1)
+    return lines
+
+
+def load_snapshot(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_snapshot(path, plans):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(plans, f, indent=1, sort_keys=True)
+        f.write("\n")
@@ -0,0 +1,219 @@
+from api.queries import Query
+from api.services.neo4j import Neo4jService
+
+
+# Sales rollups read by the breakdown analytics instead of re-aggregating
+# every ORDERS relationship:
+#   (:CategorySales {categoryID, orderCount, quantity, revenue})
+#   (:CountrySales {country, customerCount, orderCount, quantity, revenue})
+#   (:SupplierSales {supplierID, productCount, quantity, revenue})
+#   (:SalesTotal {name: 'all', lineCount, quantity, revenue})
+#
+# Revenue is net of line discounts everywhere: unitPrice * quantity *
+# (1 - discount), the same figure Order.total sums per order.
+#
+# Each delta statement adds ($sign = 1) or removes ($sign = -1) the
+# contribution of the orders in $orderIds. Writers retract an order before
+# changing its line items and apply it again afterwards, in the same
+# transaction, so the rollups always match what a full aggregation returns.
+
+CATEGORY_DELTA = Query("rollups.category_delta", """
+MATCH (o:Order)-[r:ORDERS]->(:Product)-[:PART_OF]->(c:Category)
+WHERE o.orderID IN $orderIds
+WITH c,
+     count(DISTINCT o) AS orders,
+     sum(r.quantity) AS quantity,
+     sum(r.unitPrice * r.quantity * (1 - coalesce(r.discount, 0))) AS revenue
+MERGE (g:CategorySales {categoryID: c.categoryID})
+ON CREATE SET g.orderCount = 0, g.quantity = 0, g.revenue = 0.0
+SET g.orderCount = g.orderCount + $sign * orders,
+    g.quantity = g.quantity + $sign * quantity,
+    g.revenue = g.revenue + $sign * revenue
+""")
+
+COUNTRY_DELTA = Query("rollups.country_delta", """
+MATCH (cu:Customer)-[:PURCHASED]->(o:Order)-[r:ORDERS]->(:Product)
+WHERE o.orderID IN $orderIds
+WITH cu,
+     count(DISTINCT o) AS orders,
+     sum(r.quantity) AS quantity,
+     sum(r.unitPrice * r.quantity * (1 - coalesce(r.discount, 0))) AS revenue
+WITH cu, orders, quantity, revenue,
+     CASE WHEN EXISTS {
+         MATCH (cu)-[:PURCHASED]->(x:Order)-[:ORDERS]->(:Product)
+         WHERE NOT x.orderID IN $orderIds
+     } THEN 0 ELSE 1 END AS customers
+WITH coalesce(cu.country, '') AS country,
+     sum(customers) AS customers,
+     sum(orders) AS orders,
+     sum(quantity) AS quantity,
+     sum(revenue) AS revenue
+MERGE (g:CountrySales {country: country})
+ON CREATE SET g.customerCount = 0, g.orderCount = 0, g.quantity = 0, g.revenue = 0.0
+SET g.customerCount = g.customerCount + $sign * customers,
+    g.orderCount = g.orderCount + $sign * orders,
+    g.quantity = g.quantity + $sign * quantity,
+    g.revenue = g.revenue + $sign * revenue
+""")
+
+SUPPLIER_DELTA = Query("rollups.supplier_delta", """
+MATCH (s:Supplier)-[:SUPPLIES]->(p:Product)<-[r:ORDERS]-(o:Order)
+WHERE o.orderID IN $orderIds
+WITH s, p,
+     sum(r.quantity) AS quantity,
+     sum(r.unitPrice * r.quantity * (1 - coalesce(r.discount, 0))) AS revenue
+WITH s, quantity, revenue,
+     CASE WHEN EXISTS {
+         MATCH (p)<-[:ORDERS]-(x:Order)
+         WHERE NOT x.orderID IN $orderIds
+     } THEN 0 ELSE 1 END AS products
+WITH s,
+     sum(products) AS products,
+     sum(quantity) AS quantity,
+     sum(revenue) AS revenue
+MERGE (g:SupplierSales {supplierID: s.supplierID})
+ON CREATE SET g.productCount = 0, g.quantity = 0, g.revenue = 0.0
+SET g.productCount = g.productCount + $sign * products,
+    g.quantity = g.quantity + $sign * quantity,
+    g.revenue = g.revenue + $sign * revenue
+""")
+
+TOTAL_DELTA = Query("rollups.total_delta", """
+MATCH (o:Order)-[r:ORDERS]->(:Product)
+WHERE o.orderID IN $orderIds
+WITH count(r) AS lines,
+     sum(r.quantity) AS quantity,
+     sum(r.unitPrice * r.quantity * (1 - coalesce(r.discount, 0))) AS revenue
+MERGE (g:SalesTotal {name: 'all'})
+ON CREATE SET g.lineCount = 0, g.quantity = 0, g.revenue = 0.0
+SET g.lineCount = g.lineCount + $sign * lines,
+    g.quantity = g.quantity + $sign * quantity,
+    g.revenue = g.revenue + $sign * revenue
+""")
+
+DELTAS = [CATEGORY_DELTA, COUNTRY_DELTA, SUPPLIER_DELTA, TOTAL_DELTA]
+
+# Per-order totals kept on the Order node so analytics can aggregate one
+# property per order instead of expanding every line item; `o` is bound by
+# the caller. Writers that change an order's line items also bump its
+# version so conditional GETs see the new totals
+ORDER_TOTALS = """
+OPTIONAL MATCH (o)-[r:ORDERS]->(:Product)
+WITH o,
+     count(r) AS lines,
+     sum(r.unitPrice * r.quantity) AS subtotal,
+     sum(r.unitPrice * r.quantity * coalesce(r.discount, 0)) AS discountTotal
+SET o.lineCount = lines,
+    o.subtotal = subtotal,
+    o.discountTotal = discountTotal,
+    o.total = subtotal - discountTotal
+"""
+
+APPLY_TOTALS = Query("rollups.order_totals", """
+MATCH (o:Order)
+WHERE o.orderID IN $orderIds""" + ORDER_TOTALS)
+
+BACKFILL_TOTALS = Query("rollups.backfill_totals", """
+MATCH (o:Order)
+CALL {
+    WITH o""" + ORDER_TOTALS + """} IN TRANSACTIONS OF $batchSize ROWS
+""")
+
+REBUILD_CLEAR = Query("rollups.rebuild.clear", """
+MATCH (g)
+WHERE g:CategorySales OR g:CountrySales OR g:SupplierSales OR g:SalesTotal
+DETACH DELETE g
+""")
+
+REBUILD_CATEGORY = Query("rollups.rebuild.category", """
+MATCH (o:Order)-[r:ORDERS]->(:Product)-[:PART_OF]->(c:Category)
+WITH c,
+     count(DISTINCT o) AS orders,
+     sum(r.quantity) AS quantity,
+     sum(r.unitPrice * r.quantity * (1 - coalesce(r.discount, 0))) AS revenue
+CREATE (:CategorySales {
+    categoryID: c.categoryID,
+    orderCount: orders,
+    quantity: quantity,
+    revenue: revenue
+})
+""")
+
+REBUILD_COUNTRY = Query("rollups.rebuild.country", """
+MATCH (cu:Customer)-[:PURCHASED]->(o:Order)-[r:ORDERS]->(:Product)
+WITH coalesce(cu.country, '') AS country,
+     count(DISTINCT cu) AS customers,
+     count(DISTINCT o) AS orders,
+     sum(r.quantity) AS quantity,
+     sum(r.unitPrice * r.quantity * (1 - coalesce(r.discount, 0))) AS revenue
+CREATE (:CountrySales {
+    country: country,
+    customerCount: customers,
+    orderCount: orders,
+    quantity: quantity,
+    revenue: revenue
+})
+""")
+
+REBUILD_SUPPLIER = Query("rollups.rebuild.supplier", """
+MATCH (s:Supplier)-[:SUPPLIES]->(p:Product)<-[r:ORDERS]-(:Order)
+WITH s,
+     count(DISTINCT p) AS products,
+     sum(r.quantity) AS quantity,
+     sum(r.unitPrice * r.quantity * (1 - coalesce(r.discount, 0))) AS revenue
+CREATE (:SupplierSales {
+    supplierID: s.supplierID,
+    productCount: products,
+    quantity: quantity,
+    revenue: revenue
+})
+""")
+
+REBUILD_TOTAL = Query("rollups.rebuild.total", """
+MATCH (:Order)-[r:ORDERS]->(:Product)
+WITH count(r) AS lines,
+     sum(r.quantity) AS quantity,
+     sum(r.unitPrice * r.quantity * (1 - coalesce(r.discount, 0))) AS revenue
+CREATE (:SalesTotal {
+    name: 'all',
+    lineCount: lines,
+    quantity: quantity,
+    revenue: revenue
+})
+""")
+
+REBUILD = [REBUILD_CLEAR, REBUILD_CATEGORY, REBUILD_COUNTRY, REBUILD_SUPPLIER, REBUILD_TOTAL]
+
+
+def apply_orders(tx, order_ids, sign=1):
+    """Add the current line items of ``order_ids`` to the rollups.
+
+    Applying (but not retracting) also refreshes the orders' own totals,
+    since writers always apply once their line items are final.
+    """
+    if not order_ids:
+        return
+    for statement in DELTAS:
+        tx.run(statement, orderIds=list(order_ids), sign=sign).consume()
+    if sign > 0:
+        tx.run(APPLY_TOTALS, orderIds=list(order_ids)).consume()
+
+
+def retract_orders(tx, order_ids):
+    """Remove the current line items of ``order_ids`` from the rollups"""
+    apply_orders(tx, order_ids, sign=-1)
+
+
+def backfill_totals(batch_size=10000):
+    """Recompute every order's totals, committing in batches"""
+    Neo4jService.run(BACKFILL_TOTALS, {"batchSize": int(batch_size)})
+
+
+def rebuild():
+    """Recompute every rollup from the order graph"""
+    Neo4jService.transaction(_rebuild)
+
+
+def _rebuild(tx):
+    for statement in REBUILD:
+        tx.run(statement).consume()
@@ -0,0 +1,173 @@
+import logging
+import threading
+
+from django.conf import settings
+from neo4j.exceptions import Neo4jError
+
+from api.services.neo4j import Neo4jService
+
+logger = logging.getLogger(__name__)
+
+
+# (label, property) pairs that must be unique; every detail endpoint and
+# relationship MATCH looks nodes up by these, as do the rollup writers
+CONSTRAINTS = [
+    ("Category", "categoryID"),
+    ("CategorySales", "categoryID"),
+    ("CountrySales", "country"),
+    ("Customer", "customerID"),
+    ("Employee", "employeeID"),
+    ("Order", "orderID"),
+    ("Product", "productID"),
+    ("Region", "regionID"),
+    ("SalesTotal", "name"),
+    ("Sequence", "name"),
+    ("Shipper", "shipperID"),
+    ("Supplier", "supplierID"),
+    ("SupplierSales", "supplierID"),
+    ("Territory", "territoryID"),
+]
+
+# (label, property) pairs used for sorting and filtering in list views
+INDEXES = [
+    ("Category", "categoryName"),
+    ("Customer", "companyName"),
+    ("Customer", "country"),
+    ("Employee", "lastName"),
+    ("Order", "orderDate"),
+    ("Order", "shippedDate"),
+    ("Product", "productName"),
+    ("Region", "regionDescription"),
+    ("Shipper", "companyName"),
+    ("Supplier", "companyName"),
+    ("Territory", "territoryDescription"),
+]
+
+# (name, label, properties) full-text indexes queried by the search views
+FULLTEXT_INDEXES = [
+    ("customer_search", "Customer", ["companyName", "contactName", "city"]),
+    ("product_search", "Product", ["productName"]),
+    ("supplier_search", "Supplier", ["companyName", "contactName", "city"]),
+]
+
+
+def constraint_statement(label, prop):
+    return (
+        f"CREATE CONSTRAINT {label.lower()}_{prop.lower()}_unique IF NOT EXISTS "
+        f"FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+    )
+
+
+def index_statement(label, prop):
+    return (
+        f"CREATE INDEX {label.lower()}_{prop.lower()} IF NOT EXISTS "
+        f"FOR (n:{label}) ON (n.{prop})"
+    )
+
+
+def fulltext_statement(name, label, props):
+    fields = ", ".join(f"n.{prop}" for prop in props)
+    return (
+        f"CREATE FULLTEXT INDEX {name} IF NOT EXISTS "
+        f"FOR (n:{label}) ON EACH [{fields}]"
+    )
+
+
+def missing_schema():
+    """Return the statements needed to create every missing constraint and index"""
+    constraints = {
+        (row["labelsOrTypes"][0], row["properties"][0])
+        for row in Neo4jService.run(
+            "SHOW CONSTRAINTS YIELD type, entityType, labelsOrTypes, properties"
+        )
+        if row["entityType"] == "NODE"
+        and len(row["properties"]) == 1
+        and ("UNIQUENESS" in row["type"] or row["type"] == "NODE_KEY")
+    }
+    index_rows = Neo4jService.run(
+        "SHOW INDEXES YIELD name, type, entityType, labelsOrTypes, properties"
+    )
+    indexes = {
+        (row["labelsOrTypes"][0], row["properties"][0])
+        for row in index_rows
+        if row["entityType"] == "NODE"
+        and row["properties"]
+        and len(row["properties"]) == 1
+        and row["type"] in ("RANGE", "BTREE")
+    }
+    fulltext = {row["name"] for row in index_rows if row["type"] == "FULLTEXT"}
+    missing = [
+        constraint_statement(label, prop)
+        for label, prop in CONSTRAINTS
+        if (label, prop) not in constraints
+    ]
+    missing += [
+        index_statement(label, prop)
+        for label, prop in INDEXES
+        if (label, prop) not in indexes
+    ]
+    missing += [
+        fulltext_statement(name, label, props)
+        for name, label, props in FULLTEXT_INDEXES
+        if name not in fulltext
+    ]
+    return missing
+
+
+def ensure_schema():
+    """Create whatever is missing.
+
+    Returns the statements that ran and ``(statement, reason)`` for those
+    that failed. A failure doesn't stop the rest; a uniqueness constraint
+    fails when the graph already holds duplicate IDs, and the reason says
+    how many.
+    """
+    constraints = {constraint_statement(label, prop): (label, prop) for label, prop in CONSTRAINTS}
+    created, failed = [], []
+    for statement in missing_schema():
+        try:
+            Neo4jService.run(statement)
+        except Neo4jError as exc:
+            reason = exc.message
+            if statement in constraints:
+                duplicates = duplicate_count(*constraints[statement])
+                if duplicates:
+                    label, prop = constraints[statement]
+                    reason = f"{duplicates} {label}.{prop} value(s) are used by more than one node"
+            failed.append((statement, reason))
+        else:
+            created.append(statement)
+    Neo4jService.run("CALL db.awaitIndexes(300)")
+    return created, failed
+
+
+def duplicate_count(label, prop):
+    """How many values of ``prop`` more than one ``label`` node shares"""
+    return Neo4jService.run(f"""
+        MATCH (n:{label})
+        WHERE n.{prop} IS NOT NULL
+        WITH n.{prop} AS value, count(*) AS nodes
+        WHERE nodes > 1
+        RETURN count(*) AS duplicates
+    """)[0]["duplicates"]
+
+
+def check_schema():
+    """Log a warning for every missing constraint or index; never raises"""
+    try:
+        missing = missing_schema()
+    except Exception as exc:
+        logger.warning("Neo4j schema check skipped: %s", exc)
+        return
+    for statement in missing:
+        logger.warning("Neo4j schema is missing: %s", statement)
+    if missing:
+        logger.warning("Run `python manage.py ensure_schema` to create them")
+
+
+def start_schema_check():
+    """Run ``check_schema`` in the background; called by the WSGI/ASGI entry
+    points so only a serving process checks, never management commands"""
+    if getattr(settings, "NEO4J_SCHEMA_CHECK", True):
+        # Don't hold up startup on the database; the check only logs
+        threading.Thread(target=check_schema, daemon=True).start()
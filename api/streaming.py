@@ -0,0 +1,71 @@
+import orjson
+from asgiref.sync import async_to_sync
+from django.http import StreamingHttpResponse
+
+from api.renderers import encode_default
+from api.services.neo4j import AsyncNeo4jService, Neo4jService
+
+CHUNK_SIZE = 64 * 1024
+
+
+def streaming_response(query, params=None):
+    """Stream a read query's rows to the client as a JSON array.
+
+    Rows are encoded one at a time and flushed in ~64KB chunks while the
+    driver is still fetching, so neither the records nor the rendered body
+    are ever held in memory whole. The first row is fetched up front so a
+    failing query still produces a normal error response.
+
+    Under ASGI the body is an async iterator on the async driver; Django
+    would otherwise collect a sync iterator into a list before sending it.
+    """
+    if AsyncNeo4jService.long_lived_loop:
+        rows = AsyncNeo4jService.stream(query, params)
+        # Sync views run in a thread; this awaits the row on the server's loop
+        first = async_to_sync(_first)(rows)
+        content = _aencode(first, rows)
+    else:
+        rows = Neo4jService.stream(query, params)
+        first = next(rows, None)
+        content = _encode(first, rows)
+    return StreamingHttpResponse(content, content_type="application/json")
+
+
+def _encode(first, rows):
+    if first is None:
+        yield b"[]"
+        return
+    chunk = [b"[", orjson.dumps(first, default=encode_default)]
+    size = len(chunk[1])
+    for row in rows:
+        item = orjson.dumps(row, default=encode_default)
+        chunk.append(b",")
+        chunk.append(item)
+        size += len(item) + 1
+        if size >= CHUNK_SIZE:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    chunk.append(b"]")
+    yield b"".join(chunk)
+
+
+async def _first(rows):
+    return await anext(rows, None)
+
+
+async def _aencode(first, rows):
+    if first is None:
+        yield b"[]"
+        return
+    chunk = [b"[", orjson.dumps(first, default=encode_default)]
+    size = len(chunk[1])
+    async for row in rows:
+        item = orjson.dumps(row, default=encode_default)
+        chunk.append(b",")
+        chunk.append(item)
+        size += len(item) + 1
+        if size >= CHUNK_SIZE:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    chunk.append(b"]")
+    yield b"".join(chunk)
@@ -1,3 +1,374 @@
-from django.test import TestCase
+import os
+from datetime import date
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+import msgpack
+import orjson
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.dates import DateRange
+from api.fields import FieldSet
+from api.multiget import MultiGet
+from api.pagination import KeysetPage
+from api.renderers import ColumnarJSONRenderer, MessagePackRenderer
+from api.services import plans
+from api.services.cache import AnalyticsCache
+from api.services.neo4j import Columns
+from api.services.orgchart import OrgChart
+from api.views.orders import _line_item, _order_params
+from api.views.search import _lucene_query
+
+factory = APIRequestFactory()
+
+
+def get(path="/", **params):
+    return Request(factory.get(path, params))
+
+
+class KeysetPageTests(SimpleTestCase):
+    def test_cursor_round_trip(self):
+        cursor = KeysetPage._encode("Chai", 1)
+        self.assertNotIn("=", cursor)
+        self.assertEqual(KeysetPage._decode(cursor), {"key": "Chai", "id": 1})
+
+    def test_first_page_has_no_cursor(self):
+        page = KeysetPage(get(), key="name")
+        self.assertEqual(page.params, {"after": None, "limit": 101})
+
+    def test_bad_cursors(self):
+        for cursor in ("not base64!", KeysetPage._encode("only", 1)[:-3], "WzFd"):
+            with self.subTest(cursor=cursor), self.assertRaises(ParseError):
+                KeysetPage(get(cursor=cursor), key="name")
+
+    def test_page_size(self):
+        self.assertEqual(KeysetPage(get(limit="5"), key="name").size, 5)
+        self.assertEqual(KeysetPage(get(limit="0"), key="name").size, 1)
+        self.assertEqual(KeysetPage(get(limit="99999"), key="name").size, 1000)
+        with self.assertRaises(ParseError):
+            KeysetPage(get(limit="ten"), key="name")
+
+    def test_response_links_next_page(self):
+        page = KeysetPage(get("/api/products/", limit="2"), key="name")
+        rows = [{"id": 1, "name": "A"}, {"id": 2, "name": "B"}, {"id": 3, "name": "C"}]
+        data = page.response(rows).data
+        self.assertEqual(data["results"], rows[:2])
+        cursor = parse_qs(urlsplit(data["next"]).query)["cursor"][0]
+        self.assertEqual(KeysetPage._decode(cursor), {"key": "B", "id": 2})
+
+    def test_last_page_and_columns(self):
+        page = KeysetPage(get(limit="2"), key=lambda row: row["date"] or "0001-01-01")
+        rows = Columns(["id", "date"], [[1, None], [2, "1997-01-01"]])
+        data = page.response(rows).data
+        self.assertIsNone(data["next"])
+        self.assertIs(data["results"], rows)
+
+
+COLUMNS = {
+    "id": "p.productID",
+    "name": "p.productName",
+    "category": ("c.categoryName", "OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)"),
+    "categoryId": ("c.categoryID", "OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)"),
+}
+TEMPLATE = "MATCH (p:Product)\n{matches}\nRETURN {returns}"
+
+
+class FieldSetTests(SimpleTestCase):
+    def test_default_fields(self):
+        fields = FieldSet(get(), COLUMNS, ["name"])
+        self.assertEqual(fields.names, ["id", "name"])
+        self.assertEqual(
+            fields.query(TEMPLATE),
+            "MATCH (p:Product)\n\nRETURN p.productID AS id,\n       p.productName AS name",
+        )
+
+    def test_requested_fields_keep_order_and_dedupe(self):
+        fields = FieldSet(get(fields="category, name,category,,"), COLUMNS, ["name"])
+        self.assertEqual(fields.names, ["id", "category", "name"])
+
+    def test_related_match_added_once(self):
+        fields = FieldSet(get(fields="category,categoryId"), COLUMNS, ["name"])
+        self.assertEqual(fields.matches, "OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)")
+        self.assertEqual(FieldSet(get(fields="name"), COLUMNS, ["name"]).matches, "")
+
+    def test_unknown_fields(self):
+        with self.assertRaises(ParseError) as raised:
+            FieldSet(get(fields="name,price,colour"), COLUMNS, ["name"])
+        self.assertEqual(raised.exception.detail["error"], "Unknown fields: price, colour")
+        self.assertEqual(raised.exception.detail["allowed"], list(COLUMNS))
+
+    def test_every(self):
+        self.assertEqual(FieldSet.every(COLUMNS).names, list(COLUMNS))
+
+
+class MultiGetTests(SimpleTestCase):
+    def test_results_follow_requested_order(self):
+        lookup = MultiGet(get(ids="3, 1,2"))
+        self.assertEqual(lookup.params, {"ids": [3, 1, 2]})
+        data = lookup.response([{"id": 1}, {"id": 3}]).data
+        self.assertEqual(data["results"], [{"id": 3}, {"id": 1}, None])
+        self.assertEqual(data["missing"], [2])
+
+    def test_string_ids_from_post_body(self):
+        request = Request(
+            factory.post("/", {"ids": ["ALFKI", " ANATR"]}, format="json"),
+            parsers=[JSONParser()],
+        )
+        self.assertEqual(MultiGet(request, cast=str).ids, ["ALFKI", "ANATR"])
+
+    def test_post_body_needs_a_list(self):
+        request = Request(factory.post("/", {"ids": "1,2"}, format="json"), parsers=[JSONParser()])
+        with self.assertRaises(ParseError):
+            MultiGet(request)
+
+    def test_invalid_ids(self):
+        with self.assertRaises(ParseError):
+            MultiGet(get(ids="1,two"))
+
+    @override_settings(API_MAX_PAGE_SIZE=2)
+    def test_too_many_ids(self):
+        with self.assertRaises(ParseError):
+            MultiGet(get(ids="1,2,3"))
+
+    def test_requested(self):
+        self.assertTrue(MultiGet.requested(get(ids="")))
+        self.assertFalse(MultiGet.requested(get()))
+
+
+class DateRangeTests(SimpleTestCase):
+    def test_open_range(self):
+        self.assertEqual(DateRange(get()).params, {"from": date.min, "to": date.max})
+
+    def test_bounds(self):
+        dates = DateRange(get(**{"from": "1997-01-01", "to": "1997-06-30T12:00:00"}))
+        self.assertEqual(dates.params, {"from": date(1997, 1, 1), "to": date(1997, 6, 30)})
+
+    def test_year(self):
+        self.assertEqual(
+            DateRange(get(year="1997")).params,
+            {"from": date(1997, 1, 1), "to": date(1997, 12, 31)},
+        )
+
+    def test_explicit_bounds_override_year(self):
+        dates = DateRange(get(year="1997", **{"from": "1996-07-01"}))
+        self.assertEqual(dates.params, {"from": date(1996, 7, 1), "to": date.max})
+
+    def test_invalid(self):
+        for params in ({"from": "01/02/1997"}, {"to": "1997-13-01"}, {"year": "nineties"}):
+            with self.subTest(params=params), self.assertRaises(ParseError):
+                DateRange(get(**params))
+
+
+class LuceneQueryTests(SimpleTestCase):
+    def test_words_match_exactly_or_as_prefix(self):
+        self.assertEqual(_lucene_query("Chai  Tea"), "(chai OR chai*) AND (tea OR tea*)")
+
+    def test_special_characters_escaped(self):
+        self.assertEqual(_lucene_query('a+b'), r"(a\+b OR a\+b*)")
+        self.assertEqual(_lucene_query('"x"'), r'(\"x\" OR \"x\"*)')
+        self.assertEqual(_lucene_query("c:/d*"), r"(c\:\/d\* OR c\:\/d\**)")
+
+    def test_operators_are_plain_words(self):
+        self.assertEqual(_lucene_query("NOT"), "(not OR not*)")
+
+
+def employee(id, *managers):
+    return {
+        "id": id, "firstName": f"F{id}", "lastName": f"L{id}", "name": f"E{id}",
+        "title": "Sales", "reportsToId": managers[0] if managers else None,
+        "managerIds": list(managers),
+    }
+
+
+class OrgChartTests(SimpleTestCase):
+    def test_team_level_by_level(self):
+        chart = OrgChart([employee(2), employee(5, 2), employee(1, 2), employee(6, 5)])
+        self.assertEqual(chart.team(2), [(2, 0, None), (5, 1, 2), (1, 1, 2), (6, 2, 5)])
+        self.assertEqual(chart.team(2, max_depth=1), [(2, 0, None), (5, 1, 2), (1, 1, 2)])
+
+    def test_cycle(self):
+        chart = OrgChart([employee(1, 2), employee(2, 1)])
+        self.assertEqual(chart.team(1), [(1, 0, None), (2, 1, 1)])
+        self.assertEqual(chart.chain(1), [(2, 1)])
+
+    def test_several_managers_counted_once(self):
+        chart = OrgChart([employee(2), employee(5, 2), employee(8, 2), employee(6, 5, 8)])
+        self.assertEqual(chart.team(2), [(2, 0, None), (5, 1, 2), (8, 1, 2), (6, 2, 5)])
+        # Walked from 8, the manager outside 5's team doesn't matter
+        self.assertEqual(chart.team(8), [(8, 0, None), (6, 1, 8)])
+
+    def test_missing_manager(self):
+        chart = OrgChart([employee(5, 2), employee(6, 5)])
+        self.assertEqual(chart.chain(6), [(5, 1)])
+        self.assertEqual(chart.team(5), [(5, 0, None), (6, 1, 5)])
+
+
+class RendererTests(SimpleTestCase):
+    rows = [{"id": 1, "name": "Chai"}, None, {"id": 3, "extra": date(1997, 1, 2)}]
+
+    def test_columnar_list(self):
+        data = orjson.loads(ColumnarJSONRenderer().render(self.rows))
+        self.assertEqual(data, {
+            "columns": ["id", "name", "extra"],
+            "rows": [[1, "Chai", None], None, [3, None, "1997-01-02"]],
+        })
+
+    def test_columnar_page_and_columns(self):
+        page = {"next": None, "results": Columns(["id"], [[1], [2]])}
+        data = orjson.loads(ColumnarJSONRenderer().render(page))
+        self.assertEqual(data, {"next": None, "results": {"columns": ["id"], "rows": [[1], [2]]}})
+
+    def test_columnar_leaves_other_data_alone(self):
+        self.assertEqual(orjson.loads(ColumnarJSONRenderer().render({"count": 3})), {"count": 3})
+        self.assertEqual(orjson.loads(ColumnarJSONRenderer().render([1, 2])), [1, 2])
+        self.assertEqual(ColumnarJSONRenderer().render(None), b"")
+
+    def test_msgpack(self):
+        body = MessagePackRenderer().render({"results": self.rows})
+        self.assertEqual(msgpack.unpackb(body), {"results": [
+            {"id": 1, "name": "Chai"}, None, {"id": 3, "extra": "1997-01-02"},
+        ]})
+        rows = Columns(["id"], [[1]])
+        self.assertEqual(msgpack.unpackb(MessagePackRenderer().render(rows)), [{"id": 1}])
+
+
+def node(operator, rows=1.0, *children):
+    return {"operator": operator, "estimatedRows": rows, "children": list(children)}
+
+
+class PlanRegressionTests(SimpleTestCase):
+    seek = node("ProduceResults", 1, node("NodeUniqueIndexSeek", 1))
+
+    def test_same_plan(self):
+        self.assertEqual(plans.regressions(self.seek, self.seek), [])
+
+    def test_lost_seek_to_scan(self):
+        scan = node("ProduceResults", 1, node("Filter", 1, node("NodeByLabelScan", 800)))
+        self.assertEqual(plans.regressions(self.seek, scan), [
+            "NodeByLabelScan: 0 -> 1",
+            "index seeks: 1 -> 0",
+            "estimated rows: 1 -> 800",
+        ])
+
+    def test_row_tolerance(self):
+        bigger = node("ProduceResults", 1, node("NodeUniqueIndexSeek", 9))
+        self.assertEqual(plans.regressions(self.seek, bigger), [])
+        self.assertEqual(plans.regressions(self.seek, bigger, tolerance=5), ["estimated rows: 1 -> 9"])
+
+    def test_format_plan(self):
+        self.assertEqual(plans.format_plan(self.seek), [
+            "ProduceResults (1 rows)", "  NodeUniqueIndexSeek (1 rows)",
+        ])
+
+
+@override_settings(ANALYTICS_CACHE_TTL=60, ANALYTICS_CACHE_MAX_BYTES=40)
+class AnalyticsCacheTests(SimpleTestCase):
+    def setUp(self):
+        AnalyticsCache.clear()
+
+    def test_get_and_set(self):
+        self.assertIs(AnalyticsCache.get("a"), AnalyticsCache.MISSING)
+        AnalyticsCache.set("a", [1, 2])
+        self.assertEqual(AnalyticsCache.get("a"), [1, 2])
+
+    def test_ttl(self):
+        with mock.patch("api.services.cache.time.monotonic", return_value=1000):
+            AnalyticsCache.set("a", [1])
+        with mock.patch("api.services.cache.time.monotonic", return_value=1059):
+            self.assertEqual(AnalyticsCache.get("a"), [1])
+        with mock.patch("api.services.cache.time.monotonic", return_value=1061):
+            self.assertIs(AnalyticsCache.get("a"), AnalyticsCache.MISSING)
+
+    def test_least_recently_used_evicted(self):
+        AnalyticsCache.set("a", "x" * 10)  # 12 bytes of JSON each
+        AnalyticsCache.set("b", "x" * 10)
+        AnalyticsCache.set("c", "x" * 10)
+        AnalyticsCache.get("a")
+        AnalyticsCache.set("d", "x" * 10)
+        self.assertIs(AnalyticsCache.get("b"), AnalyticsCache.MISSING)
+        self.assertEqual(AnalyticsCache.get("a"), "x" * 10)
+        self.assertLessEqual(AnalyticsCache.stats()["bytes"], 40)
+
+    def test_oversized_result_not_cached(self):
+        AnalyticsCache.set("a", "x" * 100)
+        self.assertIs(AnalyticsCache.get("a"), AnalyticsCache.MISSING)
+
+    def test_invalidate_by_tag(self):
+        AnalyticsCache.set("orders", [1], ("orders",))
+        AnalyticsCache.set("both", [2], ("orders", "shippers"))
+        AnalyticsCache.set("shippers", [3], ("shippers",))
+        AnalyticsCache.invalidate("orders")
+        self.assertIs(AnalyticsCache.get("orders"), AnalyticsCache.MISSING)
+        self.assertIs(AnalyticsCache.get("both"), AnalyticsCache.MISSING)
+        self.assertEqual(AnalyticsCache.get("shippers"), [3])
+
+    def test_result_computed_across_invalidation_not_stored(self):
+        def compute():
+            AnalyticsCache.invalidate("orders")
+            return [1]
+
+        self.assertEqual(AnalyticsCache.get_or_compute("a", compute, ("orders",)), [1])
+        self.assertIs(AnalyticsCache.get("a"), AnalyticsCache.MISSING)
+        self.assertEqual(AnalyticsCache.get_or_compute("a", lambda: [2], ("orders",)), [2])
+        self.assertEqual(AnalyticsCache.get("a"), [2])
+
+
+class OrderValidationTests(SimpleTestCase):
+    def test_line_item(self):
+        self.assertEqual(_line_item({"productId": "11", "quantity": 2, "discount": None}), {
+            "productID": 11, "unitPrice": None, "quantity": 2, "discount": 0.0,
+        })
+
+    def test_line_item_keeps_zero_price(self):
+        self.assertEqual(_line_item({"productId": 11, "quantity": 1, "unitPrice": 0})["unitPrice"], 0.0)
+
+    def test_line_item_errors(self):
+        cases = [
+            ({"quantity": 1}, "productId and quantity are required"),
+            ({"productId": "x", "quantity": 1}, "productId must be an integer"),
+            ({"productId": 1, "quantity": "1.5"}, "quantity must be an integer"),
+            ({"productId": 1, "quantity": 1, "unitPrice": "free"}, "unitPrice must be a number"),
+            ({"productId": 1, "quantity": 1, "discount": [0.1]}, "discount must be a number"),
+            ("11", "Each line item must be an object"),
+        ]
+        for data, message in cases:
+            with self.subTest(data=data), self.assertRaisesMessage(ValueError, message):
+                _line_item(data)
+
+    def test_order_params(self):
+        params = _order_params({
+            "customerId": "ALFKI", "employeeId": "5", "orderDate": "1997-01-02",
+            "freight": "3.5",
+        })
+        self.assertEqual(params["employeeId"], 5)
+        self.assertIsNone(params["shipperId"])
+        self.assertEqual(params["orderDate"], date(1997, 1, 2))
+        self.assertIsNone(params["shippedDate"])
+        self.assertEqual(params["freight"], 3.5)
+
+    def test_order_date_defaults_to_today(self):
+        self.assertEqual(_order_params({})["orderDate"], date.today())
+
+    def test_order_params_errors(self):
+        cases = [
+            ({"requiredDate": "2 Jan"}, "Dates must be formatted YYYY-MM-DD"),
+            ({"shipperId": "UPS"}, "employeeId and shipperId must be integers and freight a number"),
+            ({"freight": None}, "employeeId and shipperId must be integers and freight a number"),
+        ]
+        for data, message in cases:
+            with self.subTest(data=data), self.assertRaisesMessage(ValueError, message):
+                _order_params(data)
+
+
+@skipUnless(os.environ.get("NEO4J_PLAN_CHECK"), "set NEO4J_PLAN_CHECK=1 with NEO4J_URI on a scratch database")
+class QueryPlanTests(SimpleTestCase):
+    """EXPLAIN every registered query against seed_benchmark's graph and
+    compare with query_plans.json. Seeding wipes the database first."""
+
+    def test_plans_match_snapshot(self):
+        call_command("check_plans", seed=True)
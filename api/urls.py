@@ -1,17 +1,19 @@
 from django.urls import path
 
 # Customers
-from api.views.customers import list_customers, get_customer
+from api.views.customers import list_customers, lookup_customers, get_customer
 from api.views.customerOrders import customer_orders
 
 # Products
 from api.views.products import (
-    list_products, get_product, product_orders,
+    list_products, lookup_products, get_product, product_orders,
     products_by_category, products_by_supplier
 )
 
 # Orders
-from api.views.orders import list_orders, get_order, order_details
+from api.views.orders import (
+    list_orders, bulk_orders, lookup_orders, get_order, order_details
+)
 from api.views.orderProducts import order_products
 
 # Suppliers
@@ -22,8 +24,9 @@ from api.views.categories import list_categories, get_category
 
 # Employees
 from api.views.employees import (
-    list_employees, get_employee, employee_orders,
-    employee_territories, employee_subordinates
+    list_employees, lookup_employees, get_employee, employee_orders,
+    employee_territories, employee_subordinates, employee_hierarchy, employee_chain,
+    employee_team_sales
 )
 
 # Shippers
@@ -35,26 +38,33 @@ from api.views.regions import (
     list_territories, get_territory, territory_employees
 )
 
+# Search
+from api.views.search import search_products, search_customers, search_suppliers
+
 # Analytics
 from api.views.analytics import (
     top_products, top_customers, top_employees,
     sales_by_category, sales_by_country, sales_by_supplier,
-    shipping_stats, monthly_sales, dashboard_summary
+    shipping_stats, monthly_sales, dashboard_summary, cache_stats
 )
 
 urlpatterns = [
     # Customers
     path("customers/", list_customers),
+    path("customers/lookup/", lookup_customers),
     path("customers/<str:customer_id>/", get_customer),
     path("customers/<str:customer_id>/orders/", customer_orders),
 
     # Products
     path("products/", list_products),
+    path("products/lookup/", lookup_products),
     path("products/<int:product_id>/", get_product),
     path("products/<int:product_id>/orders/", product_orders),
 
     # Orders
     path("orders/", list_orders),
+    path("orders/bulk/", bulk_orders),
+    path("orders/lookup/", lookup_orders),
     path("orders/<int:order_id>/", get_order),
     path("orders/<int:order_id>/details/", order_details),
     path("orders/<int:order_id>/products/", order_products),
@@ -71,10 +81,14 @@ urlpatterns = [
 
     # Employees
     path("employees/", list_employees),
+    path("employees/lookup/", lookup_employees),
     path("employees/<int:employee_id>/", get_employee),
     path("employees/<int:employee_id>/orders/", employee_orders),
     path("employees/<int:employee_id>/territories/", employee_territories),
     path("employees/<int:employee_id>/subordinates/", employee_subordinates),
+    path("employees/<int:employee_id>/hierarchy/", employee_hierarchy),
+    path("employees/<int:employee_id>/chain/", employee_chain),
+    path("employees/<int:employee_id>/team-sales/", employee_team_sales),
 
     # Shippers
     path("shippers/", list_shippers),
@@ -91,6 +105,11 @@ urlpatterns = [
     path("territories/<str:territory_id>/", get_territory),
     path("territories/<str:territory_id>/employees/", territory_employees),
 
+    # Search
+    path("search/products/", search_products),
+    path("search/customers/", search_customers),
+    path("search/suppliers/", search_suppliers),
+
     # Analytics
     path("analytics/dashboard/", dashboard_summary),
     path("analytics/top-products/", top_products),
@@ -101,4 +120,5 @@ urlpatterns = [
     path("analytics/sales-by-supplier/", sales_by_supplier),
     path("analytics/shipping-stats/", shipping_stats),
     path("analytics/monthly-sales/", monthly_sales),
+    path("analytics/cache/", cache_stats),
 ]
\ No newline at end of file
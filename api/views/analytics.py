@@ -1,160 +1,227 @@
-from rest_framework.decorators import api_view
+import asyncio
+
+from adrf.decorators import api_view
 from rest_framework.response import Response
-from api.services.neo4j import Neo4jService
+from api.services.neo4j import AsyncNeo4jService
+from api.services.cache import AnalyticsCache, cached_analytics
+from api.dates import DateRange
+from api.queries import Query
+
+
+TOP_PRODUCTS = Query("analytics.top_products", """
+MATCH (o:Order)
+WHERE o.orderDate >= $from AND o.orderDate <= $to
+MATCH (o)-[r:ORDERS]->(p:Product)
+RETURN p.productID AS id,
+       p.productName AS name,
+       count(*) AS orderCount,
+       sum(r.quantity) AS totalQuantity,
+       sum(r.unitPrice * r.quantity * (1 - coalesce(r.discount, 0))) AS totalRevenue
+ORDER BY totalRevenue DESC
+LIMIT $limit
+""")
 
 
 @api_view(['GET'])
-def top_products(request):
+@cached_analytics("orders")
+async def top_products(request):
     """Get top 10 products by number of orders"""
     limit = request.query_params.get('limit', 10)
-    query = """
-    MATCH (:Order)-[r:ORDERS]->(p:Product)
-    RETURN p.productID AS id,
-           p.productName AS name,
-           count(*) AS orderCount,
-           sum(r.quantity) AS totalQuantity,
-           sum(r.unitPrice * r.quantity) AS totalRevenue
-    ORDER BY totalRevenue DESC
-    LIMIT $limit
-    """
-    data = Neo4jService.run(query, {"limit": int(limit)})
+    dates = DateRange(request)
+    data = await AsyncNeo4jService.read(TOP_PRODUCTS, {"limit": int(limit), **dates.params})
     return Response(data)
 
 
+TOP_CUSTOMERS = Query("analytics.top_customers", """
+MATCH (o:Order)
+WHERE o.orderDate >= $from AND o.orderDate <= $to
+MATCH (c:Customer)-[:PURCHASED]->(o)
+RETURN c.customerID AS id,
+       c.companyName AS name,
+       c.country AS country,
+       count(o) AS orderCount,
+       sum(coalesce(o.total, 0)) AS totalSpent
+ORDER BY totalSpent DESC
+LIMIT $limit
+""")
+
+
 @api_view(['GET'])
-def top_customers(request):
+@cached_analytics("orders")
+async def top_customers(request):
     """Get top customers by number of orders"""
     limit = request.query_params.get('limit', 10)
-    query = """
-    MATCH (c:Customer)-[:PURCHASED]->(o:Order)
-    OPTIONAL MATCH (o)-[r:ORDERS]->(p:Product)
-    RETURN c.customerID AS id,
-           c.companyName AS name,
-           c.country AS country,
-           count(DISTINCT o) AS orderCount,
-           sum(r.unitPrice * r.quantity) AS totalSpent
-    ORDER BY totalSpent DESC
-    LIMIT $limit
-    """
-    data = Neo4jService.run(query, {"limit": int(limit)})
+    dates = DateRange(request)
+    data = await AsyncNeo4jService.read(TOP_CUSTOMERS, {"limit": int(limit), **dates.params})
     return Response(data)
 
 
+TOP_EMPLOYEES = Query("analytics.top_employees", """
+MATCH (o:Order)
+WHERE o.orderDate >= $from AND o.orderDate <= $to
+MATCH (e:Employee)-[:SOLD]->(o)
+RETURN e.employeeID AS id,
+       e.firstName + ' ' + e.lastName AS name,
+       e.title AS title,
+       count(o) AS orderCount,
+       sum(coalesce(o.total, 0)) AS totalSales
+ORDER BY totalSales DESC
+LIMIT $limit
+""")
+
+
 @api_view(['GET'])
-def top_employees(request):
+@cached_analytics("orders")
+async def top_employees(request):
     """Get top employees by sales"""
     limit = request.query_params.get('limit', 10)
-    query = """
-    MATCH (e:Employee)-[:SOLD]->(o:Order)
-    OPTIONAL MATCH (o)-[r:ORDERS]->(p:Product)
-    RETURN e.employeeID AS id,
-           e.firstName + ' ' + e.lastName AS name,
-           e.title AS title,
-           count(DISTINCT o) AS orderCount,
-           sum(r.unitPrice * r.quantity) AS totalSales
-    ORDER BY totalSales DESC
-    LIMIT $limit
-    """
-    data = Neo4jService.run(query, {"limit": int(limit)})
+    dates = DateRange(request)
+    data = await AsyncNeo4jService.read(TOP_EMPLOYEES, {"limit": int(limit), **dates.params})
     return Response(data)
 
 
+SALES_BY_CATEGORY = Query("analytics.sales_by_category", """
+MATCH (g:CategorySales)
+WHERE g.orderCount > 0
+MATCH (c:Category {categoryID: g.categoryID})
+RETURN c.categoryID AS id,
+       c.categoryName AS category,
+       g.orderCount AS orderCount,
+       g.quantity AS totalQuantity,
+       g.revenue AS totalRevenue
+ORDER BY totalRevenue DESC
+""")
+
+
 @api_view(['GET'])
-def sales_by_category(request):
-    """Get sales breakdown by category"""
-    query = """
-    MATCH (o:Order)-[r:ORDERS]->(p:Product)-[:PART_OF]->(c:Category)
-    RETURN c.categoryID AS id,
-           c.categoryName AS category,
-           count(DISTINCT o) AS orderCount,
-           sum(r.quantity) AS totalQuantity,
-           sum(r.unitPrice * r.quantity) AS totalRevenue
-    ORDER BY totalRevenue DESC
-    """
-    data = Neo4jService.run(query)
+@cached_analytics("orders")
+async def sales_by_category(request):
+    """Get sales breakdown by category (from the maintained rollups)"""
+    data = await AsyncNeo4jService.read(SALES_BY_CATEGORY)
     return Response(data)
 
 
+SALES_BY_COUNTRY = Query("analytics.sales_by_country", """
+MATCH (g:CountrySales)
+WHERE g.orderCount > 0
+RETURN g.country AS country,
+       g.customerCount AS customerCount,
+       g.orderCount AS orderCount,
+       g.revenue AS totalRevenue
+ORDER BY totalRevenue DESC
+""")
+
+
 @api_view(['GET'])
-def sales_by_country(request):
-    """Get sales breakdown by customer country"""
-    query = """
-    MATCH (c:Customer)-[:PURCHASED]->(o:Order)-[r:ORDERS]->(p:Product)
-    RETURN c.country AS country,
-           count(DISTINCT c) AS customerCount,
-           count(DISTINCT o) AS orderCount,
-           sum(r.unitPrice * r.quantity) AS totalRevenue
-    ORDER BY totalRevenue DESC
-    """
-    data = Neo4jService.run(query)
+@cached_analytics("orders")
+async def sales_by_country(request):
+    """Get sales breakdown by customer country (from the maintained rollups)"""
+    data = await AsyncNeo4jService.read(SALES_BY_COUNTRY)
     return Response(data)
 
 
+SALES_BY_SUPPLIER = Query("analytics.sales_by_supplier", """
+MATCH (g:SupplierSales)
+WHERE g.productCount > 0
+MATCH (s:Supplier {supplierID: g.supplierID})
+RETURN s.supplierID AS id,
+       s.companyName AS supplier,
+       s.country AS country,
+       g.productCount AS productCount,
+       g.quantity AS totalQuantity,
+       g.revenue AS totalRevenue
+ORDER BY totalRevenue DESC
+""")
+
+
 @api_view(['GET'])
-def sales_by_supplier(request):
-    """Get sales breakdown by supplier"""
-    query = """
-    MATCH (s:Supplier)-[:SUPPLIES]->(p:Product)<-[r:ORDERS]-(o:Order)
-    RETURN s.supplierID AS id,
-           s.companyName AS supplier,
-           s.country AS country,
-           count(DISTINCT p) AS productCount,
-           sum(r.quantity) AS totalQuantity,
-           sum(r.unitPrice * r.quantity) AS totalRevenue
-    ORDER BY totalRevenue DESC
-    """
-    data = Neo4jService.run(query)
+@cached_analytics("orders")
+async def sales_by_supplier(request):
+    """Get sales breakdown by supplier (from the maintained rollups)"""
+    data = await AsyncNeo4jService.read(SALES_BY_SUPPLIER)
     return Response(data)
 
 
+SHIPPING_STATS = Query("analytics.shipping_stats", """
+MATCH (o:Order)
+WHERE o.orderDate >= $from AND o.orderDate <= $to
+MATCH (sh:Shipper)-[:SHIPS]->(o)
+RETURN sh.shipperID AS id,
+       sh.companyName AS shipper,
+       count(o) AS orderCount,
+       avg(o.freight) AS avgFreight,
+       sum(o.freight) AS totalFreight
+ORDER BY orderCount DESC
+""")
+
+
 @api_view(['GET'])
-def shipping_stats(request):
+@cached_analytics("orders", "shippers")
+async def shipping_stats(request):
     """Get shipping statistics by shipper"""
-    query = """
-    MATCH (sh:Shipper)-[:SHIPS]->(o:Order)
-    RETURN sh.shipperID AS id,
-           sh.companyName AS shipper,
-           count(o) AS orderCount,
-           avg(o.freight) AS avgFreight,
-           sum(o.freight) AS totalFreight
-    ORDER BY orderCount DESC
-    """
-    data = Neo4jService.run(query)
+    dates = DateRange(request)
+    data = await AsyncNeo4jService.read(SHIPPING_STATS, dates.params)
     return Response(data)
 
 
+MONTHLY_SALES = Query("analytics.monthly_sales", """
+MATCH (o:Order)
+WHERE o.orderDate >= $from AND o.orderDate <= $to AND o.lineCount > 0
+WITH date.truncate('month', o.orderDate) AS month,
+     count(o) AS orderCount,
+     sum(o.total) AS revenue
+RETURN substring(toString(month), 0, 7) AS month, orderCount, revenue
+ORDER BY month
+""")
+
+
 @api_view(['GET'])
-def monthly_sales(request):
+@cached_analytics("orders")
+async def monthly_sales(request):
     """Get monthly sales summary"""
-    year = request.query_params.get('year', None)
-    query = """
-    MATCH (o:Order)-[r:ORDERS]->(p:Product)
-    WHERE $year IS NULL OR o.orderDate STARTS WITH $year
-    RETURN substring(o.orderDate, 0, 7) AS month,
-           count(DISTINCT o) AS orderCount,
-           sum(r.unitPrice * r.quantity) AS revenue
-    ORDER BY month
-    """
-    data = Neo4jService.run(query, {"year": year})
+    dates = DateRange(request)
+    data = await AsyncNeo4jService.read(MONTHLY_SALES, dates.params)
     return Response(data)
 
 
+# Dashboard component -> (count-store query or maintained total, cache tag)
+DASHBOARD_COMPONENTS = {
+    name: (Query(f"analytics.dashboard.{name}", query), tag)
+    for name, (query, tag) in {
+        "customerCount": ("MATCH (n:Customer) RETURN count(n) AS value", "customers"),
+        "productCount": ("MATCH (n:Product) RETURN count(n) AS value", "products"),
+        "orderCount": ("MATCH (n:Order) RETURN count(n) AS value", "orders"),
+        "supplierCount": ("MATCH (n:Supplier) RETURN count(n) AS value", "suppliers"),
+        "employeeCount": ("MATCH (n:Employee) RETURN count(n) AS value", "employees"),
+        "totalRevenue": (
+            "MATCH (t:SalesTotal {name: 'all'}) RETURN t.revenue AS value", "orders",
+        ),
+    }.items()
+}
+
+
+async def _dashboard_component(name):
+    query, tag = DASHBOARD_COMPONENTS[name]
+
+    async def compute():
+        data = await AsyncNeo4jService.read(query)
+        return data[0]["value"] if data else 0
+
+    return await AnalyticsCache.get_or_compute_async(("dashboard", name), compute, (tag,))
+
+
 @api_view(['GET'])
-def dashboard_summary(request):
+async def dashboard_summary(request):
     """Get dashboard summary statistics"""
-    query = """
-    MATCH (c:Customer) WITH count(c) AS customerCount
-    MATCH (p:Product) WITH customerCount, count(p) AS productCount
-    MATCH (o:Order) WITH customerCount, productCount, count(o) AS orderCount
-    MATCH (s:Supplier) WITH customerCount, productCount, orderCount, count(s) AS supplierCount
-    MATCH (e:Employee) WITH customerCount, productCount, orderCount, supplierCount, count(e) AS employeeCount
-    MATCH (:Order)-[r:ORDERS]->(:Product)
-    RETURN customerCount,
-           productCount,
-           orderCount,
-           supplierCount,
-           employeeCount,
-           sum(r.unitPrice * r.quantity) AS totalRevenue
-    """
-    data = Neo4jService.run(query)
-    return Response(data[0] if data else {})
+    # Independent single-label counts are answered from Neo4j's count store
+    # and run concurrently; each one is cached on its own
+    values = await asyncio.gather(
+        *(_dashboard_component(name) for name in DASHBOARD_COMPONENTS)
+    )
+    return Response(dict(zip(DASHBOARD_COMPONENTS, values)))
+
+
+@api_view(['GET'])
+def cache_stats(request):
+    """Get analytics cache hit/miss counters"""
+    return Response(AnalyticsCache.stats())
@@ -1,24 +1,42 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from neo4j.exceptions import ConstraintError
 from api.services.neo4j import Neo4jService
+from api.etags import EntityTag
+from api.services.cache import ReferenceCache
+from api.services.ids import IdService
+from api.queries import Query
+
+# Served from ReferenceCache; product writes invalidate it for productCount
+CATEGORIES = Query("categories.list", """
+MATCH (c:Category)
+OPTIONAL MATCH (p:Product)-[:PART_OF]->(c)
+RETURN c.categoryID AS id,
+       c.categoryName AS name,
+       c.description AS description,
+       count(p) AS productCount,
+       coalesce(c.version, 0) AS version
+ORDER BY c.categoryName
+""")
+
+
+CATEGORY_CREATE = Query("categories.create", """
+CREATE (c:Category {
+    categoryID: $categoryID,
+    version: 1,
+    categoryName: $categoryName,
+    description: $description
+})
+RETURN c.categoryID AS id, c.categoryName AS name
+""")
 
 
 @api_view(['GET', 'POST'])
 def list_categories(request):
     """List all categories or create a new category"""
     if request.method == 'GET':
-        query = """
-        MATCH (c:Category)
-        OPTIONAL MATCH (p:Product)-[:PART_OF]->(c)
-        RETURN c.categoryID AS id,
-               c.categoryName AS name,
-               c.description AS description,
-               count(p) AS productCount
-        ORDER BY c.categoryName
-        """
-        data = Neo4jService.run(query)
-        return Response(data)
+        return Response(ReferenceCache.rows("categories", CATEGORIES))
     
     elif request.method == 'POST':
         data = request.data
@@ -29,67 +47,71 @@ def list_categories(request):
             )
         
         # Get next category ID
-        id_query = "MATCH (c:Category) RETURN max(c.categoryID) AS maxId"
-        max_id_result = Neo4jService.run(id_query)
-        next_id = (max_id_result[0]['maxId'] or 0) + 1
+        next_id = IdService.next_id("Category")
         
-        query = """
-        CREATE (c:Category {
-            categoryID: $categoryID,
-            categoryName: $categoryName,
-            description: $description
-        })
-        RETURN c.categoryID AS id, c.categoryName AS name
-        """
-        result = Neo4jService.run(query, {
-            "categoryID": next_id,
-            "categoryName": data.get('categoryName'),
-            "description": data.get('description', '')
-        })
+        try:
+            result = Neo4jService.write(CATEGORY_CREATE, {
+                "categoryID": next_id,
+                "categoryName": data.get('categoryName'),
+                "description": data.get('description', '')
+            })
+        except ConstraintError:
+            return Response(
+                {"error": f"Category {next_id} already exists"},
+                status=status.HTTP_409_CONFLICT
+            )
+        ReferenceCache.invalidate("categories")
         return Response(result[0], status=status.HTTP_201_CREATED)
 
 
+CATEGORY_UPDATE = Query("categories.update", """
+MATCH (c:Category {categoryID: $id})
+SET c.version = coalesce(c.version, 0) + 1,
+    c.categoryName = $categoryName,
+    c.description = $description
+RETURN c.categoryID AS id, c.categoryName AS name
+""")
+
+
+CATEGORY_DELETE = Query("categories.delete", """
+MATCH (c:Category {categoryID: $id})
+DETACH DELETE c
+RETURN count(*) AS deleted
+""")
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 def get_category(request, category_id):
     """Get, update or delete a category"""
     if request.method == 'GET':
-        query = """
-        MATCH (c:Category {categoryID: $id})
-        RETURN c.categoryID AS id,
-               c.categoryName AS name,
-               c.description AS description
-        """
-        data = Neo4jService.run(query, {"id": int(category_id)})
-        if not data:
+        category = ReferenceCache.get("categories", CATEGORIES, int(category_id))
+        if category is None:
             return Response({"error": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
-        return Response(data[0])
+        # The cached row carries the version, so the tag costs no query
+        tag = EntityTag(request, "Category", int(category_id), version=[category["version"]])
+        if tag.is_fresh():
+            return tag.not_modified()
+        return tag.response({
+            "id": category["id"],
+            "name": category["name"],
+            "description": category["description"],
+        })
     
     elif request.method == 'PUT':
         data = request.data
-        query = """
-        MATCH (c:Category {categoryID: $id})
-        SET c.categoryName = $categoryName,
-            c.description = $description
-        RETURN c.categoryID AS id, c.categoryName AS name
-        """
-        result = Neo4jService.run(query, {
+        result = Neo4jService.write(CATEGORY_UPDATE, {
             "id": int(category_id),
             "categoryName": data.get('categoryName', ''),
             "description": data.get('description', '')
         })
         if not result:
             return Response({"error": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
+        ReferenceCache.invalidate("categories")
         return Response(result[0])
     
     elif request.method == 'DELETE':
-        check_query = "MATCH (c:Category {categoryID: $id}) RETURN c"
-        exists = Neo4jService.run(check_query, {"id": int(category_id)})
-        if not exists:
+        result = Neo4jService.write(CATEGORY_DELETE, {"id": int(category_id)})
+        if not result[0]["deleted"]:
             return Response({"error": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        query = """
-        MATCH (c:Category {categoryID: $id})
-        DETACH DELETE c
-        """
-        Neo4jService.run(query, {"id": int(category_id)})
+        ReferenceCache.invalidate("categories")
         return Response({"message": "Category deleted"}, status=status.HTTP_204_NO_CONTENT)
@@ -1,15 +1,23 @@
 from rest_framework.decorators import api_view
-from rest_framework.response import Response
-from api.services.neo4j import Neo4jService
+from api.pagination import KeysetPage
+from api.dates import DateRange
+from api.queries import Query
+
+
+CUSTOMER_ORDERS = Query("customers.orders", """
+MATCH (c:Customer {customerID:$id})-[:PURCHASED]->(o:Order)
+WHERE o.orderDate >= $from AND o.orderDate <= $to
+  AND ($after IS NULL
+       OR o.orderDate < date($after.key)
+       OR (o.orderDate = date($after.key) AND o.orderID < $after.id))
+RETURN o.orderID AS id, toString(o.orderDate) AS date
+ORDER BY o.orderDate DESC, o.orderID DESC
+LIMIT $limit
+""")
 
 
 @api_view(['GET'])
 def customer_orders(request, customer_id):
-    query = """
-    MATCH (c:Customer {customerID:$id})-[:PURCHASED]->(o:Order)
-    RETURN o.orderID AS id, o.orderDate AS date
-    ORDER BY o.orderDate DESC
-    LIMIT 20
-    """
-    data = Neo4jService.run(query, {"id": customer_id})
-    return Response(data)
\ No newline at end of file
+    page = KeysetPage(request, key="date", default_size=20)
+    dates = DateRange(request)
+    return page.read(CUSTOMER_ORDERS, {"id": customer_id, **dates.params})
\ No newline at end of file
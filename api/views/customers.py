@@ -1,27 +1,84 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from neo4j.exceptions import ConstraintError
 from api.services.neo4j import Neo4jService
+from api.etags import EntityTag
+from api.pagination import KeysetPage
+from api.multiget import MultiGet
+from api.fields import FieldSet
+from api.services.cache import AnalyticsCache
+from api.services.rollups import apply_orders, retract_orders
+from api.queries import Query
+
+
+# Every field ?fields= can ask for, see api.fields
+CUSTOMER_COLUMNS = {
+    "id": "c.customerID",
+    "name": "c.companyName",
+    "contactName": "c.contactName",
+    "contactTitle": "c.contactTitle",
+    "address": "c.address",
+    "city": "c.city",
+    "region": "c.region",
+    "postalCode": "c.postalCode",
+    "country": "c.country",
+    "phone": "c.phone",
+    "fax": "c.fax",
+    "orderCount": ("count(o)", "OPTIONAL MATCH (c)-[:PURCHASED]->(o:Order)"),
+}
+CUSTOMER_LIST_FIELDS = ["id", "name", "contactName", "city", "country", "orderCount"]
+CUSTOMER_DETAIL_FIELDS = [
+    "id", "name", "contactName", "contactTitle", "address", "city", "region",
+    "postalCode", "country", "phone", "fax",
+]
+
+
+CUSTOMER_LIST = Query("customers.list", """
+MATCH (c:Customer)
+WHERE $after IS NULL
+   OR c.companyName > $after.key
+   OR (c.companyName = $after.key AND c.customerID > $after.id)
+WITH c
+ORDER BY c.companyName, c.customerID
+LIMIT $limit
+{matches}
+RETURN {returns}
+ORDER BY name, id
+""", columns=CUSTOMER_COLUMNS)
+
+
+CUSTOMER_CREATE = Query("customers.create", """
+CREATE (c:Customer {
+    customerID: $customerID,
+    version: 1,
+    companyName: $companyName,
+    contactName: $contactName,
+    contactTitle: $contactTitle,
+    address: $address,
+    city: $city,
+    region: $region,
+    postalCode: $postalCode,
+    country: $country,
+    phone: $phone,
+    fax: $fax
+})
+RETURN c.customerID AS id, c.companyName AS name
+""")
 
 
 @api_view(['GET', 'POST'])
 def list_customers(request):
     """List all customers or create a new customer"""
     if request.method == 'GET':
-        query = """
-        MATCH (c:Customer)
-        OPTIONAL MATCH (c)-[:PURCHASED]->(o:Order)
-        RETURN c.customerID AS id,
-               c.companyName AS name,
-               c.contactName AS contactName,
-               c.city AS city,
-               c.country AS country,
-               count(o) AS orderCount
-        ORDER BY c.companyName
-        LIMIT 100
-        """
-        data = Neo4jService.run(query)
-        return Response(data)
+        if MultiGet.requested(request):
+            lookup = MultiGet(request, cast=str)
+            query = _detail_fields(request).query(CUSTOMER_DETAIL)
+            return lookup.response(Neo4jService.read(query, lookup.params))
+        page = KeysetPage(request, key="name")
+        fields = FieldSet(request, CUSTOMER_COLUMNS, CUSTOMER_LIST_FIELDS, required=("id", "name"))
+        query = fields.query(CUSTOMER_LIST)
+        return page.read(query)
     
     elif request.method == 'POST':
         data = request.data
@@ -30,78 +87,129 @@ def list_customers(request):
                 {"error": "customerID and companyName are required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        query = """
-        CREATE (c:Customer {
-            customerID: $customerID,
-            companyName: $companyName,
-            contactName: $contactName,
-            contactTitle: $contactTitle,
-            address: $address,
-            city: $city,
-            region: $region,
-            postalCode: $postalCode,
-            country: $country,
-            phone: $phone,
-            fax: $fax
-        })
-        RETURN c.customerID AS id, c.companyName AS name
-        """
-        result = Neo4jService.run(query, {
-            "customerID": data.get('customerID'),
-            "companyName": data.get('companyName'),
-            "contactName": data.get('contactName', ''),
-            "contactTitle": data.get('contactTitle', ''),
-            "address": data.get('address', ''),
-            "city": data.get('city', ''),
-            "region": data.get('region', ''),
-            "postalCode": data.get('postalCode', ''),
-            "country": data.get('country', ''),
-            "phone": data.get('phone', ''),
-            "fax": data.get('fax', '')
-        })
+        try:
+            result = Neo4jService.write(CUSTOMER_CREATE, {
+                "customerID": data.get('customerID'),
+                "companyName": data.get('companyName'),
+                "contactName": data.get('contactName', ''),
+                "contactTitle": data.get('contactTitle', ''),
+                "address": data.get('address', ''),
+                "city": data.get('city', ''),
+                "region": data.get('region', ''),
+                "postalCode": data.get('postalCode', ''),
+                "country": data.get('country', ''),
+                "phone": data.get('phone', ''),
+                "fax": data.get('fax', '')
+            })
+        except ConstraintError:
+            return Response(
+                {"error": f"Customer {data.get('customerID')} already exists"},
+                status=status.HTTP_409_CONFLICT
+            )
+        AnalyticsCache.invalidate("customers")
         return Response(result[0], status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+def lookup_customers(request):
+    """Get several customers by ID (for ID lists too long for ?ids=)"""
+    lookup = MultiGet(request, cast=str)
+    query = _detail_fields(request).query(CUSTOMER_DETAIL)
+    return lookup.response(Neo4jService.read(query, lookup.params))
+
+
+CUSTOMER_DETAIL = Query("customers.detail", """
+MATCH (c:Customer)
+WHERE c.customerID IN $ids
+{matches}
+RETURN {returns}
+""", columns=CUSTOMER_COLUMNS)
+
+
+def _detail_fields(request):
+    return FieldSet(request, CUSTOMER_COLUMNS, CUSTOMER_DETAIL_FIELDS)
+
+
+CUSTOMER_VERSION = Query("customers.version", """
+MATCH (c:Customer {customerID: $id})
+RETURN [coalesce(c.version, 0)] AS version
+""")
+
+
+CUSTOMER_UPDATE = Query("customers.update", """
+MATCH (c:Customer {customerID: $id})
+SET c.version = coalesce(c.version, 0) + 1,
+    c.companyName = $companyName,
+    c.contactName = $contactName,
+    c.contactTitle = $contactTitle,
+    c.address = $address,
+    c.city = $city,
+    c.region = $region,
+    c.postalCode = $postalCode,
+    c.country = $country,
+    c.phone = $phone,
+    c.fax = $fax
+RETURN c.customerID AS id, c.companyName AS name
+""")
+
+
+CUSTOMER_DELETE = Query("customers.delete", """
+MATCH (c:Customer {customerID: $id})
+DETACH DELETE c
+RETURN count(*) AS deleted
+""")
+
+
+CUSTOMER_ORDER_IDS = Query("customers.order_ids", """
+MATCH (c:Customer {customerID: $id})
+OPTIONAL MATCH (c)-[:PURCHASED]->(o:Order)
+RETURN c.country AS country, collect(o.orderID) AS orderIds
+""")
+
+
+def _update_customer(tx, params):
+    customer = tx.run(CUSTOMER_ORDER_IDS, id=params["id"]).single()
+    if customer is None:
+        return [], []
+    # Country sales are grouped by the customer's country, so moving the
+    # customer moves their orders to another country's rollup
+    order_ids = []
+    if (customer["country"] or '') != params["country"]:
+        order_ids = customer["orderIds"]
+    retract_orders(tx, order_ids)
+    result = [record.data() for record in tx.run(CUSTOMER_UPDATE, params)]
+    apply_orders(tx, order_ids)
+    return result, order_ids
+
+
+def _delete_customer(tx, customer_id):
+    # Deleting the customer drops their PURCHASED relationships, which takes
+    # their orders out of the country rollups
+    customer = tx.run(CUSTOMER_ORDER_IDS, id=customer_id).single()
+    if customer is None:
+        return 0
+    retract_orders(tx, customer["orderIds"])
+    deleted = tx.run(CUSTOMER_DELETE, id=customer_id).single()["deleted"]
+    apply_orders(tx, customer["orderIds"])
+    return deleted
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 def get_customer(request, customer_id):
     """Get, update or delete a customer"""
     if request.method == 'GET':
-        query = """
-        MATCH (c:Customer {customerID: $id})
-        RETURN c.customerID AS id,
-               c.companyName AS name,
-               c.contactName AS contactName,
-               c.contactTitle AS contactTitle,
-               c.address AS address,
-               c.city AS city,
-               c.region AS region,
-               c.postalCode AS postalCode,
-               c.country AS country,
-               c.phone AS phone,
-               c.fax AS fax
-        """
-        data = Neo4jService.run(query, {"id": customer_id})
+        tag = EntityTag(request, "Customer", customer_id, CUSTOMER_VERSION)
+        if tag.is_fresh():
+            return tag.not_modified()
+        query = _detail_fields(request).query(CUSTOMER_DETAIL)
+        data = Neo4jService.read(query, {"ids": [customer_id]})
         if not data:
             return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
-        return Response(data[0])
+        return tag.response(data[0])
     
     elif request.method == 'PUT':
         data = request.data
-        query = """
-        MATCH (c:Customer {customerID: $id})
-        SET c.companyName = $companyName,
-            c.contactName = $contactName,
-            c.contactTitle = $contactTitle,
-            c.address = $address,
-            c.city = $city,
-            c.region = $region,
-            c.postalCode = $postalCode,
-            c.country = $country,
-            c.phone = $phone,
-            c.fax = $fax
-        RETURN c.customerID AS id, c.companyName AS name
-        """
-        result = Neo4jService.run(query, {
+        result, order_ids = Neo4jService.transaction(_update_customer, {
             "id": customer_id,
             "companyName": data.get('companyName', ''),
             "contactName": data.get('contactName', ''),
@@ -116,21 +224,17 @@ def get_customer(request, customer_id):
         })
         if not result:
             return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
+        if order_ids:
+            AnalyticsCache.invalidate("orders")
+        EntityTag.invalidate("Customer", customer_id)
         return Response(result[0])
     
     elif request.method == 'DELETE':
-        # First check if customer exists
-        check_query = "MATCH (c:Customer {customerID: $id}) RETURN c"
-        exists = Neo4jService.run(check_query, {"id": customer_id})
-        if not exists:
+        deleted = Neo4jService.transaction(_delete_customer, customer_id)
+        if not deleted:
             return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Delete customer and their relationships
-        query = """
-        MATCH (c:Customer {customerID: $id})
-        DETACH DELETE c
-        """
-        Neo4jService.run(query, {"id": customer_id})
+        AnalyticsCache.invalidate("customers", "orders")
+        EntityTag.invalidate("Customer", customer_id)
         return Response({"message": "Customer deleted"}, status=status.HTTP_204_NO_CONTENT)
 
 
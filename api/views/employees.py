@@ -1,28 +1,93 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from neo4j.exceptions import ConstraintError
+from rest_framework.exceptions import ParseError
 from api.services.neo4j import Neo4jService
+from api.etags import EntityTag
+from api.streaming import streaming_response
+from api.pagination import KeysetPage
+from api.dates import DateRange
+from api.multiget import MultiGet
+from api.fields import FieldSet
+from api.services.cache import AnalyticsCache, ReferenceCache, cached_analytics
+from api.services.ids import IdService
+from api.services.orgchart import OrgChart
+from api.queries import Query
+
+
+EMPLOYEE_MANAGER = "OPTIONAL MATCH (e)-[:REPORTS_TO]->(m:Employee)"
+
+# Every field ?fields= can ask for, see api.fields
+EMPLOYEE_COLUMNS = {
+    "id": "e.employeeID",
+    "firstName": "e.firstName",
+    "lastName": "e.lastName",
+    "title": "e.title",
+    "titleOfCourtesy": "e.titleOfCourtesy",
+    "birthDate": "e.birthDate",
+    "hireDate": "e.hireDate",
+    "address": "e.address",
+    "city": "e.city",
+    "region": "e.region",
+    "postalCode": "e.postalCode",
+    "country": "e.country",
+    "homePhone": "e.homePhone",
+    "extension": "e.extension",
+    "notes": "e.notes",
+    "reportsToId": ("m.employeeID", EMPLOYEE_MANAGER),
+    "reportsTo": ("m.firstName + ' ' + m.lastName", EMPLOYEE_MANAGER),
+}
+EMPLOYEE_LIST_FIELDS = [
+    "id", "firstName", "lastName", "title", "city", "country", "hireDate", "reportsTo",
+]
+
+
+EMPLOYEE_LIST = Query("employees.list", """
+MATCH (e:Employee)
+{matches}
+RETURN {returns}
+ORDER BY e.lastName, e.firstName
+""", columns=EMPLOYEE_COLUMNS)
+
+
+EMPLOYEE_CREATE = Query("employees.create", """
+CREATE (e:Employee {
+    employeeID: $employeeID,
+    version: 1,
+    firstName: $firstName,
+    lastName: $lastName,
+    title: $title,
+    titleOfCourtesy: $titleOfCourtesy,
+    birthDate: $birthDate,
+    hireDate: $hireDate,
+    address: $address,
+    city: $city,
+    region: $region,
+    postalCode: $postalCode,
+    country: $country,
+    homePhone: $homePhone,
+    extension: $extension,
+    notes: $notes
+})
+WITH e
+OPTIONAL MATCH (m:Employee {employeeID: $managerId})
+FOREACH (_ IN CASE WHEN m IS NULL THEN [] ELSE [1] END | CREATE (e)-[:REPORTS_TO]->(m))
+RETURN e.employeeID AS id, e.firstName AS firstName, e.lastName AS lastName
+""")
 
 
 @api_view(['GET', 'POST'])
 def list_employees(request):
     """List all employees or create a new employee"""
     if request.method == 'GET':
-        query = """
-        MATCH (e:Employee)
-        OPTIONAL MATCH (e)-[:REPORTS_TO]->(m:Employee)
-        RETURN e.employeeID AS id,
-               e.firstName AS firstName,
-               e.lastName AS lastName,
-               e.title AS title,
-               e.city AS city,
-               e.country AS country,
-               e.hireDate AS hireDate,
-               m.firstName + ' ' + m.lastName AS reportsTo
-        ORDER BY e.lastName, e.firstName
-        """
-        data = Neo4jService.run(query)
-        return Response(data)
+        if MultiGet.requested(request):
+            lookup = MultiGet(request)
+            query = _detail_fields(request).query(EMPLOYEE_DETAIL)
+            return lookup.response(Neo4jService.read(query, lookup.params))
+        fields = FieldSet(request, EMPLOYEE_COLUMNS, EMPLOYEE_LIST_FIELDS)
+        query = fields.query(EMPLOYEE_LIST)
+        return streaming_response(query)
     
     elif request.method == 'POST':
         data = request.data
@@ -32,112 +97,91 @@ def list_employees(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get next employee ID
-        id_query = "MATCH (e:Employee) RETURN max(e.employeeID) AS maxId"
-        max_id_result = Neo4jService.run(id_query)
-        next_id = (max_id_result[0]['maxId'] or 0) + 1
-        
-        query = """
-        CREATE (e:Employee {
-            employeeID: $employeeID,
-            firstName: $firstName,
-            lastName: $lastName,
-            title: $title,
-            titleOfCourtesy: $titleOfCourtesy,
-            birthDate: $birthDate,
-            hireDate: $hireDate,
-            address: $address,
-            city: $city,
-            region: $region,
-            postalCode: $postalCode,
-            country: $country,
-            homePhone: $homePhone,
-            extension: $extension,
-            notes: $notes
-        })
-        RETURN e.employeeID AS id, e.firstName AS firstName, e.lastName AS lastName
-        """
-        result = Neo4jService.run(query, {
-            "employeeID": next_id,
-            "firstName": data.get('firstName'),
-            "lastName": data.get('lastName'),
-            "title": data.get('title', ''),
-            "titleOfCourtesy": data.get('titleOfCourtesy', ''),
-            "birthDate": data.get('birthDate', ''),
-            "hireDate": data.get('hireDate', ''),
-            "address": data.get('address', ''),
-            "city": data.get('city', ''),
-            "region": data.get('region', ''),
-            "postalCode": data.get('postalCode', ''),
-            "country": data.get('country', ''),
-            "homePhone": data.get('homePhone', ''),
-            "extension": data.get('extension', ''),
-            "notes": data.get('notes', '')
-        })
-        
-        # Link to manager if provided
-        if data.get('reportsToId'):
-            Neo4jService.run("""
-                MATCH (e:Employee {employeeID: $employeeID})
-                MATCH (m:Employee {employeeID: $managerId})
-                CREATE (e)-[:REPORTS_TO]->(m)
-            """, {"employeeID": next_id, "managerId": int(data.get('reportsToId'))})
+        # Create the employee and link the manager together
+        employee_id = IdService.next_id("Employee")
+        try:
+            result = Neo4jService.write(EMPLOYEE_CREATE, {
+                "employeeID": employee_id,
+                "managerId": int(data['reportsToId']) if data.get('reportsToId') else None,
+                "firstName": data.get('firstName'),
+                "lastName": data.get('lastName'),
+                "title": data.get('title', ''),
+                "titleOfCourtesy": data.get('titleOfCourtesy', ''),
+                "birthDate": data.get('birthDate', ''),
+                "hireDate": data.get('hireDate', ''),
+                "address": data.get('address', ''),
+                "city": data.get('city', ''),
+                "region": data.get('region', ''),
+                "postalCode": data.get('postalCode', ''),
+                "country": data.get('country', ''),
+                "homePhone": data.get('homePhone', ''),
+                "extension": data.get('extension', ''),
+                "notes": data.get('notes', '')
+            })
+        except ConstraintError:
+            return Response(
+                {"error": f"Employee {employee_id} already exists"},
+                status=status.HTTP_409_CONFLICT
+            )
         
+        AnalyticsCache.invalidate("employees")
+        ReferenceCache.invalidate("employees")
         return Response(result[0], status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+def lookup_employees(request):
+    """Get several employees by ID (for ID lists too long for ?ids=)"""
+    lookup = MultiGet(request)
+    query = _detail_fields(request).query(EMPLOYEE_DETAIL)
+    return lookup.response(Neo4jService.read(query, lookup.params))
+
+
+EMPLOYEE_DETAIL = Query("employees.detail", """
+MATCH (e:Employee)
+WHERE e.employeeID IN $ids
+{matches}
+RETURN {returns}
+""", columns=EMPLOYEE_COLUMNS)
+
+
+def _detail_fields(request):
+    # Every column is returned by default
+    return FieldSet(request, EMPLOYEE_COLUMNS, list(EMPLOYEE_COLUMNS))
+
+
+EMPLOYEE_VERSION = Query("employees.version", """
+MATCH (e:Employee {employeeID: $id})
+OPTIONAL MATCH (e)-[:REPORTS_TO]->(m:Employee)
+RETURN [coalesce(e.version, 0), coalesce(m.version, 0)] AS version
+""")
+
+
+EMPLOYEE_DELETE = Query("employees.delete", """
+MATCH (e:Employee {employeeID: $id})
+DETACH DELETE e
+RETURN count(*) AS deleted
+""")
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 def get_employee(request, employee_id):
     """Get, update or delete an employee"""
     if request.method == 'GET':
-        query = """
-        MATCH (e:Employee {employeeID: $id})
-        OPTIONAL MATCH (e)-[:REPORTS_TO]->(m:Employee)
-        RETURN e.employeeID AS id,
-               e.firstName AS firstName,
-               e.lastName AS lastName,
-               e.title AS title,
-               e.titleOfCourtesy AS titleOfCourtesy,
-               e.birthDate AS birthDate,
-               e.hireDate AS hireDate,
-               e.address AS address,
-               e.city AS city,
-               e.region AS region,
-               e.postalCode AS postalCode,
-               e.country AS country,
-               e.homePhone AS homePhone,
-               e.extension AS extension,
-               e.notes AS notes,
-               m.employeeID AS reportsToId,
-               m.firstName + ' ' + m.lastName AS reportsTo
-        """
-        data = Neo4jService.run(query, {"id": int(employee_id)})
+        tag = EntityTag(request, "Employee", int(employee_id), EMPLOYEE_VERSION)
+        if tag.is_fresh():
+            return tag.not_modified()
+        query = _detail_fields(request).query(EMPLOYEE_DETAIL)
+        data = Neo4jService.read(query, {"ids": [int(employee_id)]})
         if not data:
             return Response({"error": "Employee not found"}, status=status.HTTP_404_NOT_FOUND)
-        return Response(data[0])
+        return tag.response(data[0])
     
     elif request.method == 'PUT':
         data = request.data
-        query = """
-        MATCH (e:Employee {employeeID: $id})
-        SET e.firstName = $firstName,
-            e.lastName = $lastName,
-            e.title = $title,
-            e.titleOfCourtesy = $titleOfCourtesy,
-            e.birthDate = $birthDate,
-            e.hireDate = $hireDate,
-            e.address = $address,
-            e.city = $city,
-            e.region = $region,
-            e.postalCode = $postalCode,
-            e.country = $country,
-            e.homePhone = $homePhone,
-            e.extension = $extension,
-            e.notes = $notes
-        RETURN e.employeeID AS id, e.firstName AS firstName, e.lastName AS lastName
-        """
-        result = Neo4jService.run(query, {
+        result = Neo4jService.transaction(_update_employee, {
             "id": int(employee_id),
+            "managerId": int(data['reportsToId']) if data.get('reportsToId') else None,
             "firstName": data.get('firstName', ''),
             "lastName": data.get('lastName', ''),
             "title": data.get('title', ''),
@@ -155,77 +199,223 @@ def get_employee(request, employee_id):
         })
         if not result:
             return Response({"error": "Employee not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Update manager relationship if provided
-        if data.get('reportsToId'):
-            Neo4jService.run(
-                "MATCH (e:Employee {employeeID: $id})-[r:REPORTS_TO]->() DELETE r",
-                {"id": int(employee_id)}
-            )
-            Neo4jService.run("""
-                MATCH (e:Employee {employeeID: $employeeID})
-                MATCH (m:Employee {employeeID: $managerId})
-                CREATE (e)-[:REPORTS_TO]->(m)
-            """, {"employeeID": int(employee_id), "managerId": int(data.get('reportsToId'))})
-        
+        # A new manager or name changes the org chart and team-sales
+        AnalyticsCache.invalidate("employees")
+        ReferenceCache.invalidate("employees")
+        EntityTag.invalidate("Employee", int(employee_id))
         return Response(result[0])
     
     elif request.method == 'DELETE':
-        check_query = "MATCH (e:Employee {employeeID: $id}) RETURN e"
-        exists = Neo4jService.run(check_query, {"id": int(employee_id)})
-        if not exists:
+        result = Neo4jService.write(EMPLOYEE_DELETE, {"id": int(employee_id)})
+        if not result[0]["deleted"]:
             return Response({"error": "Employee not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        query = """
-        MATCH (e:Employee {employeeID: $id})
-        DETACH DELETE e
-        """
-        Neo4jService.run(query, {"id": int(employee_id)})
+        AnalyticsCache.invalidate("employees")
+        ReferenceCache.invalidate("employees")
+        EntityTag.invalidate("Employee", int(employee_id))
         return Response({"message": "Employee deleted"}, status=status.HTTP_204_NO_CONTENT)
 
 
+EMPLOYEE_UPDATE = Query("employees.update", """
+MATCH (e:Employee {employeeID: $id})
+SET e.version = coalesce(e.version, 0) + 1,
+    e.firstName = $firstName,
+    e.lastName = $lastName,
+    e.title = $title,
+    e.titleOfCourtesy = $titleOfCourtesy,
+    e.birthDate = $birthDate,
+    e.hireDate = $hireDate,
+    e.address = $address,
+    e.city = $city,
+    e.region = $region,
+    e.postalCode = $postalCode,
+    e.country = $country,
+    e.homePhone = $homePhone,
+    e.extension = $extension,
+    e.notes = $notes
+RETURN e.employeeID AS id, e.firstName AS firstName, e.lastName AS lastName
+""")
+
+
+EMPLOYEE_SET_MANAGER = Query("employees.set_manager", """
+MATCH (e:Employee {employeeID: $id})
+OPTIONAL MATCH (e)-[r:REPORTS_TO]->()
+DELETE r
+WITH DISTINCT e
+MATCH (m:Employee {employeeID: $managerId})
+CREATE (e)-[:REPORTS_TO]->(m)
+""")
+
+
+def _update_employee(tx, params):
+    result = [record.data() for record in tx.run(EMPLOYEE_UPDATE, params)]
+    if not result:
+        return result
+    
+    # Replace the manager relationship if provided
+    if params["managerId"] is not None:
+        tx.run(EMPLOYEE_SET_MANAGER, params).consume()
+    return result
+
+
+EMPLOYEE_ORDERS = Query("employees.orders", """
+MATCH (e:Employee {employeeID: $id})-[:SOLD]->(o:Order)
+WHERE o.orderDate >= $from AND o.orderDate <= $to
+  AND ($after IS NULL
+       OR o.orderDate < date($after.key)
+       OR (o.orderDate = date($after.key) AND o.orderID < $after.id))
+MATCH (c:Customer)-[:PURCHASED]->(o)
+RETURN o.orderID AS orderId,
+       toString(o.orderDate) AS orderDate,
+       toString(o.shippedDate) AS shippedDate,
+       c.companyName AS customer
+ORDER BY o.orderDate DESC, o.orderID DESC
+LIMIT $limit
+""")
+
+
 @api_view(['GET'])
 def employee_orders(request, employee_id):
     """Get all orders sold by an employee"""
-    query = """
-    MATCH (e:Employee {employeeID: $id})-[:SOLD]->(o:Order)
-    MATCH (c:Customer)-[:PURCHASED]->(o)
-    RETURN o.orderID AS orderId,
-           o.orderDate AS orderDate,
-           o.shippedDate AS shippedDate,
-           c.companyName AS customer
-    ORDER BY o.orderDate DESC
-    LIMIT 50
-    """
-    data = Neo4jService.run(query, {"id": int(employee_id)})
-    return Response(data)
+    page = KeysetPage(request, key="orderDate", id_field="orderId", default_size=50)
+    dates = DateRange(request)
+    return page.read(EMPLOYEE_ORDERS, {"id": int(employee_id), **dates.params})
+
+
+EMPLOYEE_TERRITORIES = Query("employees.territories", """
+MATCH (e:Employee {employeeID: $id})-[:IN_TERRITORY]->(t:Territory)
+OPTIONAL MATCH (t)-[:IN_REGION]->(r:Region)
+RETURN t.territoryID AS id,
+       t.territoryDescription AS name,
+       r.regionDescription AS region
+ORDER BY t.territoryDescription
+""")
 
 
 @api_view(['GET'])
 def employee_territories(request, employee_id):
     """Get territories assigned to an employee"""
-    query = """
-    MATCH (e:Employee {employeeID: $id})-[:IN_TERRITORY]->(t:Territory)
-    OPTIONAL MATCH (t)-[:IN_REGION]->(r:Region)
-    RETURN t.territoryID AS id,
-           t.territoryDescription AS name,
-           r.regionDescription AS region
-    ORDER BY t.territoryDescription
-    """
-    data = Neo4jService.run(query, {"id": int(employee_id)})
+    data = Neo4jService.read(EMPLOYEE_TERRITORIES, {"id": int(employee_id)})
     return Response(data)
 
 
+EMPLOYEE_SUBORDINATES = Query("employees.subordinates", """
+MATCH (e:Employee)-[:REPORTS_TO]->(m:Employee {employeeID: $id})
+RETURN e.employeeID AS id,
+       e.firstName AS firstName,
+       e.lastName AS lastName,
+       e.title AS title
+ORDER BY e.lastName, e.firstName
+""")
+
+
 @api_view(['GET'])
 def employee_subordinates(request, employee_id):
     """Get employees who report to this employee"""
-    query = """
-    MATCH (e:Employee)-[:REPORTS_TO]->(m:Employee {employeeID: $id})
-    RETURN e.employeeID AS id,
-           e.firstName AS firstName,
-           e.lastName AS lastName,
-           e.title AS title
-    ORDER BY e.lastName, e.firstName
-    """
-    data = Neo4jService.run(query, {"id": int(employee_id)})
+    data = Neo4jService.read(EMPLOYEE_SUBORDINATES, {"id": int(employee_id)})
     return Response(data)
+
+
+# REPORTS_TO paths are followed at most this many levels, which also bounds
+# the work a REPORTS_TO cycle in bad data can cause
+HIERARCHY_DEPTH = 10
+
+
+def _depth(request):
+    value = request.query_params.get('depth')
+    if value is None:
+        return HIERARCHY_DEPTH
+    try:
+        depth = int(value)
+    except ValueError:
+        raise ParseError({"error": "depth must be an integer"})
+    return max(1, min(depth, HIERARCHY_DEPTH))
+
+
+def _person(employee):
+    return {
+        "id": employee["id"],
+        "firstName": employee["firstName"],
+        "lastName": employee["lastName"],
+        "title": employee["title"],
+    }
+
+
+@api_view(['GET'])
+def employee_hierarchy(request, employee_id):
+    """Get everyone who reports to this employee, directly or indirectly"""
+    chart = OrgChart.load()
+    if int(employee_id) not in chart.employees:
+        return Response({"error": "Employee not found"}, status=status.HTTP_404_NOT_FOUND)
+    team = chart.team(int(employee_id), _depth(request))[1:]
+    data = [
+        {**_person(chart.employees[id]), "reportsToId": manager_id, "depth": depth}
+        for id, depth, manager_id in team
+    ]
+    data.sort(key=lambda row: (row["depth"], row["lastName"] or "", row["firstName"] or ""))
+    return Response(data)
+
+
+@api_view(['GET'])
+def employee_chain(request, employee_id):
+    """Get the employee's managers, from their direct manager to the top"""
+    chart = OrgChart.load()
+    if int(employee_id) not in chart.employees:
+        return Response({"error": "Employee not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response([
+        {**_person(chart.employees[id]), "depth": depth}
+        for id, depth in chart.chain(int(employee_id))
+    ])
+
+
+TEAM_SALES = Query("employees.team_sales", """
+MATCH (e:Employee)-[:SOLD]->(o:Order)
+WHERE e.employeeID IN $ids AND o.orderDate >= $from AND o.orderDate <= $to
+RETURN e.employeeID AS id,
+       count(o) AS orderCount,
+       sum(coalesce(o.total, 0)) AS totalSales
+""")
+
+
+@api_view(['GET'])
+@cached_analytics("orders", "employees")
+def employee_team_sales(request, employee_id):
+    """Get the sales of an employee and everyone under them"""
+    chart = OrgChart.load()
+    if int(employee_id) not in chart.employees:
+        return Response({"error": "Employee not found"}, status=status.HTTP_404_NOT_FOUND)
+    dates = DateRange(request)
+    # The team comes from the cached org chart; Neo4j only aggregates
+    team = chart.team(int(employee_id))
+    rows = Neo4jService.read(TEAM_SALES, {"ids": [id for id, _, _ in team], **dates.params})
+    sales = {row["id"]: row for row in rows}
+    members = {}
+    for id, depth, manager_id in team:
+        employee = chart.employees[id]
+        own = sales.get(id, {"orderCount": 0, "totalSales": 0})
+        members[id] = {
+            "id": id,
+            "name": employee["name"],
+            "title": employee["title"],
+            "reportsToId": manager_id if depth else employee["reportsToId"],
+            "depth": depth,
+            "orderCount": own["orderCount"],
+            "totalSales": own["totalSales"],
+            "teamOrderCount": own["orderCount"],
+            "teamSales": own["totalSales"],
+        }
+    # Deepest first, so each member's team totals are complete before
+    # they are added to their manager's
+    for id, _, manager_id in reversed(team[1:]):
+        member = members[id]
+        manager = members[manager_id]
+        manager["teamOrderCount"] += member["teamOrderCount"]
+        manager["teamSales"] += member["teamSales"]
+    root = members[int(employee_id)]
+    return Response({
+        "id": root["id"],
+        "name": root["name"],
+        "teamSize": len(team) - 1,
+        "orderCount": root["teamOrderCount"],
+        "totalSales": root["teamSales"],
+        "members": list(members.values()),
+    })
@@ -0,0 +1,9 @@
+from django.http import HttpResponse
+from api.services.metrics import QueryMetrics
+
+
+def metrics(request):
+    """Expose Neo4j query metrics for Prometheus"""
+    return HttpResponse(
+        QueryMetrics.export(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
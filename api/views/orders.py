@@ -1,33 +1,113 @@
+from datetime import date
+
+from django.conf import settings
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from neo4j.exceptions import ConstraintError
 from api.services.neo4j import Neo4jService
+from api.etags import EntityTag
+from api.pagination import KeysetPage
+from api.dates import DateRange, parse_date
+from api.multiget import MultiGet
+from api.fields import FieldSet
+from api.services.cache import AnalyticsCache
+from api.services.ids import IdService
+from api.services.rollups import apply_orders, retract_orders
+from api.queries import Query
+
+ORDER_SHIPPER = "OPTIONAL MATCH (sh:Shipper)-[:SHIPS]->(o)"
+ORDER_EMPLOYEE = "OPTIONAL MATCH (e:Employee)-[:SOLD]->(o)"
+
+# Every field ?fields= can ask for, see api.fields; the customer is always
+# matched since every order has one
+ORDER_COLUMNS = {
+    "id": "o.orderID",
+    "orderDate": "toString(o.orderDate)",
+    "requiredDate": "toString(o.requiredDate)",
+    "shippedDate": "toString(o.shippedDate)",
+    "freight": "o.freight",
+    "shipName": "o.shipName",
+    "shipAddress": "o.shipAddress",
+    "shipCity": "o.shipCity",
+    "shipRegion": "o.shipRegion",
+    "shipPostalCode": "o.shipPostalCode",
+    "shipCountry": "o.shipCountry",
+    "lineCount": "o.lineCount",
+    "subtotal": "o.subtotal",
+    "discountTotal": "o.discountTotal",
+    "total": "o.total",
+    "customer": "c.companyName",
+    "customerId": "c.customerID",
+    "shipper": ("sh.companyName", ORDER_SHIPPER),
+    "shipperId": ("sh.shipperID", ORDER_SHIPPER),
+    "employee": ("e.firstName + ' ' + e.lastName", ORDER_EMPLOYEE),
+    "employeeId": ("e.employeeID", ORDER_EMPLOYEE),
+}
+ORDER_LIST_FIELDS = [
+    "id", "orderDate", "requiredDate", "shippedDate", "freight", "shipCity", "shipCountry",
+    "customer", "customerId", "shipper", "employee",
+]
+ORDER_DETAIL_FIELDS = list(ORDER_COLUMNS)
+
+
+ORDER_LIST = Query("orders.list", """
+MATCH (c:Customer)-[:PURCHASED]->(o:Order)
+WHERE o.orderDate >= $from AND o.orderDate <= $to
+  AND ($after IS NULL
+       OR o.orderDate < date($after.key)
+       OR (o.orderDate = date($after.key) AND o.orderID < $after.id))
+WITH c, o
+ORDER BY o.orderDate DESC, o.orderID DESC
+LIMIT $limit
+{matches}
+RETURN {returns}
+ORDER BY o.orderDate DESC, o.orderID DESC
+""", columns=ORDER_COLUMNS)
+
+
+ORDER_CREATE = Query("orders.create", """
+MATCH (c:Customer {customerID: $customerId})
+OPTIONAL MATCH (e:Employee {employeeID: $employeeId})
+OPTIONAL MATCH (s:Shipper {shipperID: $shipperId})
+CREATE (o:Order {
+    orderID: $orderID,
+    version: 1,
+    orderDate: $orderDate,
+    requiredDate: $requiredDate,
+    shippedDate: $shippedDate,
+    freight: $freight,
+    shipName: $shipName,
+    shipAddress: $shipAddress,
+    shipCity: $shipCity,
+    shipRegion: $shipRegion,
+    shipPostalCode: $shipPostalCode,
+    shipCountry: $shipCountry,
+    lineCount: 0,
+    subtotal: 0.0,
+    discountTotal: 0.0,
+    total: 0.0
+})
+CREATE (c)-[:PURCHASED]->(o)
+FOREACH (_ IN CASE WHEN e IS NULL THEN [] ELSE [1] END | CREATE (e)-[:SOLD]->(o))
+FOREACH (_ IN CASE WHEN s IS NULL THEN [] ELSE [1] END | CREATE (s)-[:SHIPS]->(o))
+RETURN o.orderID AS id
+""")
 
 
 @api_view(['GET', 'POST'])
 def list_orders(request):
     """List all orders or create a new order"""
     if request.method == 'GET':
-        query = """
-        MATCH (c:Customer)-[:PURCHASED]->(o:Order)
-        OPTIONAL MATCH (sh:Shipper)-[:SHIPS]->(o)
-        OPTIONAL MATCH (e:Employee)-[:SOLD]->(o)
-        RETURN o.orderID AS id,
-               o.orderDate AS orderDate,
-               o.requiredDate AS requiredDate,
-               o.shippedDate AS shippedDate,
-               o.freight AS freight,
-               o.shipCity AS shipCity,
-               o.shipCountry AS shipCountry,
-               c.companyName AS customer,
-               c.customerID AS customerId,
-               sh.companyName AS shipper,
-               e.firstName + ' ' + e.lastName AS employee
-        ORDER BY o.orderDate DESC
-        LIMIT 100
-        """
-        data = Neo4jService.run(query)
-        return Response(data)
+        if MultiGet.requested(request):
+            lookup = MultiGet(request)
+            query = _detail_fields(request).query(ORDER_DETAIL)
+            return lookup.response(Neo4jService.read(query, lookup.params))
+        page = KeysetPage(request, key="orderDate")
+        dates = DateRange(request)
+        fields = FieldSet(request, ORDER_COLUMNS, ORDER_LIST_FIELDS, required=("id", "orderDate"))
+        query = fields.query(ORDER_LIST)
+        return page.read(query, dates.params)
     
     elif request.method == 'POST':
         data = request.data
@@ -37,120 +117,256 @@ def list_orders(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get next order ID
-        id_query = "MATCH (o:Order) RETURN max(o.orderID) AS maxId"
-        max_id_result = Neo4jService.run(id_query)
-        next_id = (max_id_result[0]['maxId'] or 0) + 1
+        try:
+            params = _order_params(data)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        # Create the order and link it to its customer, employee and shipper
+        # in a single transaction so a failure never leaves a half-linked order
+        order_id = IdService.next_id("Order")
+        try:
+            result = Neo4jService.write(ORDER_CREATE, {"orderID": order_id, **params})
+        except ConstraintError:
+            return Response(
+                {"error": f"Order {order_id} already exists"},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not result:
+            return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        # Create order
-        query = """
-        CREATE (o:Order {
-            orderID: $orderID,
-            orderDate: $orderDate,
-            requiredDate: $requiredDate,
-            shippedDate: $shippedDate,
-            freight: $freight,
-            shipName: $shipName,
-            shipAddress: $shipAddress,
-            shipCity: $shipCity,
-            shipRegion: $shipRegion,
-            shipPostalCode: $shipPostalCode,
-            shipCountry: $shipCountry
-        })
-        RETURN o.orderID AS id
-        """
-        result = Neo4jService.run(query, {
-            "orderID": next_id,
-            "orderDate": data.get('orderDate', ''),
-            "requiredDate": data.get('requiredDate', ''),
-            "shippedDate": data.get('shippedDate', ''),
+        AnalyticsCache.invalidate("orders")
+        return Response(result[0], status=status.HTTP_201_CREATED)
+
+
+def _order_params(data):
+    """The order's query parameters; a ValueError says which field is bad"""
+    try:
+        # Stored as native dates; a new order is dated today unless given
+        dates = {
+            "orderDate": parse_date(data.get('orderDate')) or date.today(),
+            "requiredDate": parse_date(data.get('requiredDate')),
+            "shippedDate": parse_date(data.get('shippedDate')),
+        }
+    except ValueError:
+        raise ValueError("Dates must be formatted YYYY-MM-DD")
+    try:
+        numbers = {
+            "employeeId": int(data['employeeId']) if data.get('employeeId') else None,
+            "shipperId": int(data['shipperId']) if data.get('shipperId') else None,
             "freight": float(data.get('freight', 0)),
-            "shipName": data.get('shipName', ''),
-            "shipAddress": data.get('shipAddress', ''),
-            "shipCity": data.get('shipCity', ''),
-            "shipRegion": data.get('shipRegion', ''),
-            "shipPostalCode": data.get('shipPostalCode', ''),
-            "shipCountry": data.get('shipCountry', '')
-        })
-        
-        # Link to customer
-        Neo4jService.run("""
-            MATCH (c:Customer {customerID: $customerId})
-            MATCH (o:Order {orderID: $orderID})
-            CREATE (c)-[:PURCHASED]->(o)
-        """, {"customerId": data.get('customerId'), "orderID": next_id})
-        
-        # Link to employee if provided
-        if data.get('employeeId'):
-            Neo4jService.run("""
-                MATCH (e:Employee {employeeID: $employeeId})
-                MATCH (o:Order {orderID: $orderID})
-                CREATE (e)-[:SOLD]->(o)
-            """, {"employeeId": int(data.get('employeeId')), "orderID": next_id})
-        
-        # Link to shipper if provided
-        if data.get('shipperId'):
-            Neo4jService.run("""
-                MATCH (s:Shipper {shipperID: $shipperId})
-                MATCH (o:Order {orderID: $orderID})
-                CREATE (s)-[:SHIPS]->(o)
-            """, {"shipperId": int(data.get('shipperId')), "orderID": next_id})
-        
-        return Response({"id": next_id}, status=status.HTTP_201_CREATED)
+        }
+    except (TypeError, ValueError):
+        raise ValueError("employeeId and shipperId must be integers and freight a number")
+    return {
+        "customerId": data.get('customerId'),
+        **dates,
+        **numbers,
+        "shipName": data.get('shipName', ''),
+        "shipAddress": data.get('shipAddress', ''),
+        "shipCity": data.get('shipCity', ''),
+        "shipRegion": data.get('shipRegion', ''),
+        "shipPostalCode": data.get('shipPostalCode', ''),
+        "shipCountry": data.get('shipCountry', '')
+    }
+
+
+@api_view(['POST'])
+def bulk_orders(request):
+    """Create many orders with their line items, one transaction per batch"""
+    orders = request.data
+    if not isinstance(orders, list):
+        return Response(
+            {"error": "Expected a list of orders"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    results = [None] * len(orders)
+    rows = []
+    for index, data in enumerate(orders):
+        try:
+            if not isinstance(data, dict) or not data.get('customerId'):
+                raise ValueError("customerId is required")
+            items = [_line_item(item) for item in data.get('items', [])]
+            rows.append({"index": index, "items": items, **_order_params(data)})
+        except (ValueError, TypeError, AttributeError) as exc:
+            results[index] = {"index": index, "status": 400, "error": str(exc)}
+
+    batch_size = settings.API_BULK_BATCH_SIZE
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        first_id, _ = IdService.reserve("Order", len(batch))
+        for offset, row in enumerate(batch):
+            row["orderID"] = first_id + offset
+        try:
+            created = Neo4jService.transaction(_create_orders, batch)
+        except ConstraintError:
+            # The whole batch rolled back
+            created = [
+                {"index": row["index"], "status": 409,
+                 "error": "An order ID in this batch already exists"}
+                for row in batch
+            ]
+        for result in created:
+            results[result["index"]] = result
+
+    if rows:
+        AnalyticsCache.invalidate("orders")
+    return Response(results)
+
+
+BULK_ORDER_CHECK = Query("orders.bulk_check", """
+UNWIND $rows AS row
+OPTIONAL MATCH (c:Customer {customerID: row.customerId})
+RETURN row.index AS index,
+       c IS NOT NULL AS customerFound,
+       [item IN row.items
+        WHERE NOT EXISTS { MATCH (:Product {productID: item.productID}) }
+        | item.productID] AS missingProducts
+""")
+
+
+BULK_ORDER_CREATE = Query("orders.bulk_create", """
+UNWIND $rows AS row
+MATCH (c:Customer {customerID: row.customerId})
+OPTIONAL MATCH (e:Employee {employeeID: row.employeeId})
+OPTIONAL MATCH (s:Shipper {shipperID: row.shipperId})
+CREATE (o:Order {
+    orderID: row.orderID,
+    version: 1,
+    orderDate: row.orderDate,
+    requiredDate: row.requiredDate,
+    shippedDate: row.shippedDate,
+    freight: row.freight,
+    shipName: row.shipName,
+    shipAddress: row.shipAddress,
+    shipCity: row.shipCity,
+    shipRegion: row.shipRegion,
+    shipPostalCode: row.shipPostalCode,
+    shipCountry: row.shipCountry,
+    lineCount: 0,
+    subtotal: 0.0,
+    discountTotal: 0.0,
+    total: 0.0
+})
+CREATE (c)-[:PURCHASED]->(o)
+FOREACH (_ IN CASE WHEN e IS NULL THEN [] ELSE [1] END | CREATE (e)-[:SOLD]->(o))
+FOREACH (_ IN CASE WHEN s IS NULL THEN [] ELSE [1] END | CREATE (s)-[:SHIPS]->(o))
+WITH row, o
+CALL {
+    WITH row, o
+    UNWIND row.items AS item
+    MATCH (p:Product {productID: item.productID})
+    CREATE (o)-[:ORDERS {
+        unitPrice: coalesce(item.unitPrice, p.unitPrice),
+        quantity: item.quantity,
+        discount: item.discount
+    }]->(p)
+    RETURN count(*) AS lineCount
+}
+RETURN row.index AS index, o.orderID AS id, lineCount
+""")
+
+
+def _create_orders(tx, rows):
+    # Check references up front so one bad order doesn't fail the batch
+    checks = tx.run(BULK_ORDER_CHECK, rows=rows)
+    results = {}
+    for check in checks:
+        if not check["customerFound"]:
+            error = "Customer not found"
+        elif check["missingProducts"]:
+            error = f"Products not found: {check['missingProducts']}"
+        else:
+            continue
+        results[check["index"]] = {"index": check["index"], "status": 404, "error": error}
+
+    valid = [row for row in rows if row["index"] not in results]
+    for record in tx.run(BULK_ORDER_CREATE, rows=valid):
+        results[record["index"]] = {
+            "index": record["index"],
+            "status": 201,
+            "id": record["id"],
+            "lineCount": record["lineCount"]
+        }
+    apply_orders(tx, [row["orderID"] for row in valid])
+    return list(results.values())
+
+
+@api_view(['POST'])
+def lookup_orders(request):
+    """Get several orders by ID (for ID lists too long for ?ids=)"""
+    lookup = MultiGet(request)
+    query = _detail_fields(request).query(ORDER_DETAIL)
+    return lookup.response(Neo4jService.read(query, lookup.params))
+
+
+ORDER_DETAIL = Query("orders.detail", """
+MATCH (c:Customer)-[:PURCHASED]->(o:Order)
+WHERE o.orderID IN $ids
+{matches}
+RETURN {returns}
+""", columns=ORDER_COLUMNS)
+
+
+def _detail_fields(request):
+    return FieldSet(request, ORDER_COLUMNS, ORDER_DETAIL_FIELDS)
+
+
+ORDER_VERSION = Query("orders.version", """
+MATCH (c:Customer)-[:PURCHASED]->(o:Order {orderID: $id})
+OPTIONAL MATCH (sh:Shipper)-[:SHIPS]->(o)
+OPTIONAL MATCH (e:Employee)-[:SOLD]->(o)
+RETURN [coalesce(o.version, 0), coalesce(c.version, 0),
+        coalesce(sh.version, 0), coalesce(e.version, 0)] AS version
+""")
+
+
+ORDER_UPDATE = Query("orders.update", """
+MATCH (o:Order {orderID: $id})
+SET o.version = coalesce(o.version, 0) + 1,
+    o.orderDate = coalesce($orderDate, o.orderDate),
+    o.requiredDate = $requiredDate,
+    o.shippedDate = $shippedDate,
+    o.freight = $freight,
+    o.shipName = $shipName,
+    o.shipAddress = $shipAddress,
+    o.shipCity = $shipCity,
+    o.shipRegion = $shipRegion,
+    o.shipPostalCode = $shipPostalCode,
+    o.shipCountry = $shipCountry
+RETURN o.orderID AS id
+""")
 
 
 @api_view(['GET', 'PUT', 'DELETE'])
 def get_order(request, order_id):
     """Get, update or delete an order"""
     if request.method == 'GET':
-        query = """
-        MATCH (c:Customer)-[:PURCHASED]->(o:Order {orderID: $id})
-        OPTIONAL MATCH (sh:Shipper)-[:SHIPS]->(o)
-        OPTIONAL MATCH (e:Employee)-[:SOLD]->(o)
-        RETURN o.orderID AS id,
-               o.orderDate AS orderDate,
-               o.requiredDate AS requiredDate,
-               o.shippedDate AS shippedDate,
-               o.freight AS freight,
-               o.shipName AS shipName,
-               o.shipAddress AS shipAddress,
-               o.shipCity AS shipCity,
-               o.shipRegion AS shipRegion,
-               o.shipPostalCode AS shipPostalCode,
-               o.shipCountry AS shipCountry,
-               c.companyName AS customer,
-               c.customerID AS customerId,
-               sh.companyName AS shipper,
-               sh.shipperID AS shipperId,
-               e.firstName + ' ' + e.lastName AS employee,
-               e.employeeID AS employeeId
-        """
-        data = Neo4jService.run(query, {"id": int(order_id)})
+        tag = EntityTag(request, "Order", int(order_id), ORDER_VERSION)
+        if tag.is_fresh():
+            return tag.not_modified()
+        query = _detail_fields(request).query(ORDER_DETAIL)
+        data = Neo4jService.read(query, {"ids": [int(order_id)]})
         if not data:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
-        return Response(data[0])
+        return tag.response(data[0])
     
     elif request.method == 'PUT':
         data = request.data
-        query = """
-        MATCH (o:Order {orderID: $id})
-        SET o.orderDate = $orderDate,
-            o.requiredDate = $requiredDate,
-            o.shippedDate = $shippedDate,
-            o.freight = $freight,
-            o.shipName = $shipName,
-            o.shipAddress = $shipAddress,
-            o.shipCity = $shipCity,
-            o.shipRegion = $shipRegion,
-            o.shipPostalCode = $shipPostalCode,
-            o.shipCountry = $shipCountry
-        RETURN o.orderID AS id
-        """
-        result = Neo4jService.run(query, {
+        try:
+            dates = {
+                "orderDate": parse_date(data.get('orderDate')),
+                "requiredDate": parse_date(data.get('requiredDate')),
+                "shippedDate": parse_date(data.get('shippedDate'))
+            }
+        except ValueError:
+            return Response(
+                {"error": "Dates must be formatted YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        result = Neo4jService.write(ORDER_UPDATE, {
             "id": int(order_id),
-            "orderDate": data.get('orderDate', ''),
-            "requiredDate": data.get('requiredDate', ''),
-            "shippedDate": data.get('shippedDate', ''),
+            **dates,
             "freight": float(data.get('freight', 0)),
             "shipName": data.get('shipName', ''),
             "shipAddress": data.get('shipAddress', ''),
@@ -161,72 +377,137 @@ def get_order(request, order_id):
         })
         if not result:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+        AnalyticsCache.invalidate("orders")
+        EntityTag.invalidate("Order", int(order_id))
         return Response(result[0])
     
     elif request.method == 'DELETE':
-        check_query = "MATCH (o:Order {orderID: $id}) RETURN o"
-        exists = Neo4jService.run(check_query, {"id": int(order_id)})
-        if not exists:
+        deleted = Neo4jService.transaction(_delete_order, int(order_id))
+        if not deleted:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        query = """
-        MATCH (o:Order {orderID: $id})
-        DETACH DELETE o
-        """
-        Neo4jService.run(query, {"id": int(order_id)})
+        AnalyticsCache.invalidate("orders")
+        EntityTag.invalidate("Order", int(order_id))
         return Response({"message": "Order deleted"}, status=status.HTTP_204_NO_CONTENT)
 
 
+ORDER_DELETE = Query("orders.delete", """
+MATCH (o:Order {orderID: $id})
+DETACH DELETE o
+RETURN count(*) AS deleted
+""")
+
+
+def _delete_order(tx, order_id):
+    retract_orders(tx, [order_id])
+    return tx.run(ORDER_DELETE, id=order_id).single()["deleted"]
+
+
 @api_view(['GET', 'POST'])
 def order_details(request, order_id):
-    """Get order line items or add a product to order"""
+    """Get order line items or add one or more products to an order"""
     if request.method == 'GET':
-        query = """
-        MATCH (o:Order {orderID: $id})-[r:ORDERS]->(p:Product)
-        RETURN p.productID AS productId,
-               p.productName AS productName,
-               r.unitPrice AS unitPrice,
-               r.quantity AS quantity,
-               r.discount AS discount,
-               (r.unitPrice * r.quantity * (1 - r.discount)) AS lineTotal
-        ORDER BY p.productName
-        """
-        data = Neo4jService.run(query, {"id": int(order_id)})
+        data = Neo4jService.read(ORDER_LINES, {"id": int(order_id)})
         return Response(data)
     
     elif request.method == 'POST':
-        data = request.data
-        if not data.get('productId') or not data.get('quantity'):
+        # A single line item or a list of them, all added in one transaction
+        many = isinstance(request.data, list)
+        try:
+            items = [_line_item(item) for item in (request.data if many else [request.data])]
+        except (ValueError, TypeError, AttributeError) as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if not items:
             return Response(
-                {"error": "productId and quantity are required"},
+                {"error": "At least one line item is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get product price if not provided
-        unit_price = data.get('unitPrice')
-        if not unit_price:
-            price_query = "MATCH (p:Product {productID: $id}) RETURN p.unitPrice AS price"
-            price_result = Neo4jService.run(price_query, {"id": int(data.get('productId'))})
-            if price_result:
-                unit_price = price_result[0]['price']
-            else:
-                unit_price = 0
-        
-        query = """
-        MATCH (o:Order {orderID: $orderID})
-        MATCH (p:Product {productID: $productID})
-        CREATE (o)-[r:ORDERS {
-            unitPrice: $unitPrice,
-            quantity: $quantity,
-            discount: $discount
-        }]->(p)
-        RETURN p.productID AS productId, r.quantity AS quantity
-        """
-        result = Neo4jService.run(query, {
-            "orderID": int(order_id),
-            "productID": int(data.get('productId')),
-            "unitPrice": float(unit_price),
-            "quantity": int(data.get('quantity')),
-            "discount": float(data.get('discount', 0))
-        })
-        return Response(result[0], status=status.HTTP_201_CREATED)
+        error, lines = Neo4jService.transaction(_add_line_items, int(order_id), items)
+        if error:
+            return Response({"error": error}, status=status.HTTP_404_NOT_FOUND)
+        AnalyticsCache.invalidate("orders")
+        EntityTag.invalidate("Order", int(order_id))
+        if many:
+            return Response(lines, status=status.HTTP_201_CREATED)
+        return Response(
+            {"productId": items[0]["productID"], "quantity": items[0]["quantity"]},
+            status=status.HTTP_201_CREATED
+        )
+
+
+ORDER_LINES = Query("orders.lines", """
+MATCH (o:Order {orderID: $id})-[r:ORDERS]->(p:Product)
+RETURN p.productID AS productId,
+       p.productName AS productName,
+       r.unitPrice AS unitPrice,
+       r.quantity AS quantity,
+       r.discount AS discount,
+       (r.unitPrice * r.quantity * (1 - coalesce(r.discount, 0))) AS lineTotal
+ORDER BY p.productName
+""")
+
+
+def _line_item(data):
+    """A line item's query parameters; a ValueError says which field is bad"""
+    if not isinstance(data, dict):
+        raise ValueError("Each line item must be an object")
+    if not data.get('productId') or not data.get('quantity'):
+        raise ValueError("productId and quantity are required")
+    return {
+        "productID": _field(data, 'productId', int, "an integer"),
+        # Resolved from the product in the insert query when left out
+        "unitPrice": (
+            _field(data, 'unitPrice', float, "a number")
+            if data.get('unitPrice') is not None else None
+        ),
+        "quantity": _field(data, 'quantity', int, "an integer"),
+        "discount": (
+            _field(data, 'discount', float, "a number")
+            if data.get('discount') is not None else 0.0
+        ),
+    }
+
+
+def _field(data, name, cast, kind):
+    try:
+        return cast(data[name])
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be {kind}")
+
+
+LINE_ITEM_CHECK = Query("orders.line_items_check", """
+OPTIONAL MATCH (o:Order {orderID: $orderID})
+RETURN o IS NOT NULL AS orderFound,
+       [item IN $items
+        WHERE NOT EXISTS { MATCH (:Product {productID: item.productID}) }
+        | item.productID] AS missingProducts
+""")
+
+
+LINE_ITEM_CREATE = Query("orders.line_items_create", """
+MATCH (o:Order {orderID: $orderID})
+SET o.version = coalesce(o.version, 0) + 1
+WITH o
+UNWIND $items AS item
+MATCH (p:Product {productID: item.productID})
+CREATE (o)-[:ORDERS {
+    unitPrice: coalesce(item.unitPrice, p.unitPrice),
+    quantity: item.quantity,
+    discount: item.discount
+}]->(p)
+""")
+
+
+def _add_line_items(tx, order_id, items):
+    """Add ``items`` to the order; returns (error, the order's lines)"""
+    check = tx.run(LINE_ITEM_CHECK, orderID=order_id, items=items).single()
+    if not check["orderFound"]:
+        return "Order not found", []
+    if check["missingProducts"]:
+        return f"Products not found: {check['missingProducts']}", []
+
+    # Keep the sales rollups in step with the order's line items
+    retract_orders(tx, [order_id])
+    tx.run(LINE_ITEM_CREATE, orderID=order_id, items=items).consume()
+    apply_orders(tx, [order_id])
+    return None, [record.data() for record in tx.run(ORDER_LINES, id=order_id)]
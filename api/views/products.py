@@ -1,30 +1,94 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from neo4j.exceptions import ConstraintError
 from api.services.neo4j import Neo4jService
+from api.etags import EntityTag
+from api.pagination import KeysetPage
+from api.dates import DateRange
+from api.multiget import MultiGet
+from api.fields import FieldSet
+from api.services.cache import AnalyticsCache, ReferenceCache
+from api.services.ids import IdService
+from api.services.rollups import apply_orders, retract_orders
+from api.queries import Query
+
+
+PRODUCT_CATEGORY = "OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)"
+PRODUCT_SUPPLIER = "OPTIONAL MATCH (s:Supplier)-[:SUPPLIES]->(p)"
+
+# Every field ?fields= can ask for, see api.fields
+PRODUCT_COLUMNS = {
+    "id": "p.productID",
+    "name": "p.productName",
+    "unitPrice": "p.unitPrice",
+    "unitsInStock": "p.unitsInStock",
+    "unitsOnOrder": "p.unitsOnOrder",
+    "quantityPerUnit": "p.quantityPerUnit",
+    "discontinued": "p.discontinued",
+    "reorderLevel": "p.reorderLevel",
+    "category": ("c.categoryName", PRODUCT_CATEGORY),
+    "categoryId": ("c.categoryID", PRODUCT_CATEGORY),
+    "supplier": ("s.companyName", PRODUCT_SUPPLIER),
+    "supplierId": ("s.supplierID", PRODUCT_SUPPLIER),
+}
+PRODUCT_LIST_FIELDS = [
+    "id", "name", "unitPrice", "unitsInStock", "unitsOnOrder", "discontinued",
+    "category", "supplier",
+]
+PRODUCT_DETAIL_FIELDS = [
+    "id", "name", "unitPrice", "unitsInStock", "unitsOnOrder", "quantityPerUnit",
+    "discontinued", "category", "categoryId", "supplier", "supplierId",
+]
+
+
+PRODUCT_LIST = Query("products.list", """
+MATCH (p:Product)
+WHERE $after IS NULL
+   OR p.productName > $after.key
+   OR (p.productName = $after.key AND p.productID > $after.id)
+WITH p
+ORDER BY p.productName, p.productID
+LIMIT $limit
+{matches}
+RETURN {returns}
+ORDER BY p.productName, p.productID
+""", columns=PRODUCT_COLUMNS)
+
+
+PRODUCT_CREATE = Query("products.create", """
+CREATE (p:Product {
+    productID: $productID,
+    version: 1,
+    productName: $productName,
+    unitPrice: $unitPrice,
+    unitsInStock: $unitsInStock,
+    unitsOnOrder: $unitsOnOrder,
+    quantityPerUnit: $quantityPerUnit,
+    discontinued: $discontinued,
+    reorderLevel: $reorderLevel
+})
+WITH p
+OPTIONAL MATCH (c:Category {categoryID: $categoryID})
+OPTIONAL MATCH (s:Supplier {supplierID: $supplierID})
+FOREACH (_ IN CASE WHEN c IS NULL THEN [] ELSE [1] END | CREATE (p)-[:PART_OF]->(c))
+FOREACH (_ IN CASE WHEN s IS NULL THEN [] ELSE [1] END | CREATE (s)-[:SUPPLIES]->(p))
+RETURN p.productID AS id, p.productName AS name
+""")
 
 
 @api_view(['GET', 'POST'])
 def list_products(request):
     """List all products or create a new product"""
     if request.method == 'GET':
-        query = """
-        MATCH (p:Product)
-        OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)
-        OPTIONAL MATCH (s:Supplier)-[:SUPPLIES]->(p)
-        RETURN p.productID AS id, 
-               p.productName AS name,
-               p.unitPrice AS unitPrice,
-               p.unitsInStock AS unitsInStock,
-               p.unitsOnOrder AS unitsOnOrder,
-               p.discontinued AS discontinued,
-               c.categoryName AS category,
-               s.companyName AS supplier
-        ORDER BY p.productName
-        LIMIT 100
-        """
-        data = Neo4jService.run(query)
-        return Response(data)
+        if MultiGet.requested(request):
+            lookup = MultiGet(request)
+            query = _detail_fields(request).query(PRODUCT_DETAIL)
+            return lookup.response(Neo4jService.read(query, lookup.params))
+        page = KeysetPage(request, key="name")
+        fields = FieldSet(request, PRODUCT_COLUMNS, PRODUCT_LIST_FIELDS, required=("id", "name"))
+        query = fields.query(PRODUCT_LIST)
+        return page.read(query)
     
     elif request.method == 'POST':
         data = request.data
@@ -34,102 +98,79 @@ def list_products(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get next product ID
-        id_query = "MATCH (p:Product) RETURN max(p.productID) AS maxId"
-        max_id_result = Neo4jService.run(id_query)
-        next_id = (max_id_result[0]['maxId'] or 0) + 1
-        
-        query = """
-        CREATE (p:Product {
-            productID: $productID,
-            productName: $productName,
-            unitPrice: $unitPrice,
-            unitsInStock: $unitsInStock,
-            unitsOnOrder: $unitsOnOrder,
-            quantityPerUnit: $quantityPerUnit,
-            discontinued: $discontinued,
-            reorderLevel: $reorderLevel
-        })
-        RETURN p.productID AS id, p.productName AS name
-        """
-        result = Neo4jService.run(query, {
-            "productID": next_id,
-            "productName": data.get('productName'),
-            "unitPrice": float(data.get('unitPrice', 0)),
-            "unitsInStock": int(data.get('unitsInStock', 0)),
-            "unitsOnOrder": int(data.get('unitsOnOrder', 0)),
-            "quantityPerUnit": data.get('quantityPerUnit', ''),
-            "discontinued": data.get('discontinued', False),
-            "reorderLevel": int(data.get('reorderLevel', 0))
-        })
-        
-        # Link to category if provided
-        if data.get('categoryId'):
-            cat_query = """
-            MATCH (p:Product {productID: $productID})
-            MATCH (c:Category {categoryID: $categoryID})
-            CREATE (p)-[:PART_OF]->(c)
-            """
-            Neo4jService.run(cat_query, {
-                "productID": next_id,
-                "categoryID": int(data.get('categoryId'))
-            })
-        
-        # Link to supplier if provided
-        if data.get('supplierId'):
-            sup_query = """
-            MATCH (p:Product {productID: $productID})
-            MATCH (s:Supplier {supplierID: $supplierID})
-            CREATE (s)-[:SUPPLIES]->(p)
-            """
-            Neo4jService.run(sup_query, {
-                "productID": next_id,
-                "supplierID": int(data.get('supplierId'))
+        # Create the product and link its category and supplier together
+        product_id = IdService.next_id("Product")
+        try:
+            result = Neo4jService.write(PRODUCT_CREATE, {
+                "productID": product_id,
+                "categoryID": int(data['categoryId']) if data.get('categoryId') else None,
+                "supplierID": int(data['supplierId']) if data.get('supplierId') else None,
+                "productName": data.get('productName'),
+                "unitPrice": float(data.get('unitPrice', 0)),
+                "unitsInStock": int(data.get('unitsInStock', 0)),
+                "unitsOnOrder": int(data.get('unitsOnOrder', 0)),
+                "quantityPerUnit": data.get('quantityPerUnit', ''),
+                "discontinued": data.get('discontinued', False),
+                "reorderLevel": int(data.get('reorderLevel', 0))
             })
+        except ConstraintError:
+            return Response(
+                {"error": f"Product {product_id} already exists"},
+                status=status.HTTP_409_CONFLICT
+            )
         
+        AnalyticsCache.invalidate("products")
+        ReferenceCache.invalidate("categories")
         return Response(result[0], status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+def lookup_products(request):
+    """Get several products by ID (for ID lists too long for ?ids=)"""
+    lookup = MultiGet(request)
+    query = _detail_fields(request).query(PRODUCT_DETAIL)
+    return lookup.response(Neo4jService.read(query, lookup.params))
+
+
+PRODUCT_DETAIL = Query("products.detail", """
+MATCH (p:Product)
+WHERE p.productID IN $ids
+{matches}
+RETURN {returns}
+""", columns=PRODUCT_COLUMNS)
+
+
+def _detail_fields(request):
+    return FieldSet(request, PRODUCT_COLUMNS, PRODUCT_DETAIL_FIELDS)
+
+
+PRODUCT_VERSION = Query("products.version", """
+MATCH (p:Product {productID: $id})
+OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)
+OPTIONAL MATCH (s:Supplier)-[:SUPPLIES]->(p)
+RETURN [coalesce(p.version, 0), coalesce(c.version, 0), coalesce(s.version, 0)] AS version
+""")
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 def get_product(request, product_id):
     """Get, update or delete a product"""
     if request.method == 'GET':
-        query = """
-        MATCH (p:Product {productID: $id})
-        OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)
-        OPTIONAL MATCH (s:Supplier)-[:SUPPLIES]->(p)
-        RETURN p.productID AS id,
-               p.productName AS name,
-               p.unitPrice AS unitPrice,
-               p.unitsInStock AS unitsInStock,
-               p.unitsOnOrder AS unitsOnOrder,
-               p.quantityPerUnit AS quantityPerUnit,
-               p.discontinued AS discontinued,
-               c.categoryName AS category,
-               c.categoryID AS categoryId,
-               s.companyName AS supplier,
-               s.supplierID AS supplierId
-        """
-        data = Neo4jService.run(query, {"id": int(product_id)})
+        tag = EntityTag(request, "Product", int(product_id), PRODUCT_VERSION)
+        if tag.is_fresh():
+            return tag.not_modified()
+        query = _detail_fields(request).query(PRODUCT_DETAIL)
+        data = Neo4jService.read(query, {"ids": [int(product_id)]})
         if not data:
             return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
-        return Response(data[0])
+        return tag.response(data[0])
     
     elif request.method == 'PUT':
         data = request.data
-        query = """
-        MATCH (p:Product {productID: $id})
-        SET p.productName = $productName,
-            p.unitPrice = $unitPrice,
-            p.unitsInStock = $unitsInStock,
-            p.unitsOnOrder = $unitsOnOrder,
-            p.quantityPerUnit = $quantityPerUnit,
-            p.discontinued = $discontinued,
-            p.reorderLevel = $reorderLevel
-        RETURN p.productID AS id, p.productName AS name
-        """
-        result = Neo4jService.run(query, {
+        result = Neo4jService.transaction(_update_product, {
             "id": int(product_id),
+            "categoryID": int(data['categoryId']) if data.get('categoryId') else None,
+            "supplierID": int(data['supplierId']) if data.get('supplierId') else None,
             "productName": data.get('productName', ''),
             "unitPrice": float(data.get('unitPrice', 0)),
             "unitsInStock": int(data.get('unitsInStock', 0)),
@@ -140,91 +181,163 @@ def get_product(request, product_id):
         })
         if not result:
             return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Update category relationship if provided
         if data.get('categoryId'):
-            Neo4jService.run(
-                "MATCH (p:Product {productID: $id})-[r:PART_OF]->() DELETE r",
-                {"id": int(product_id)}
-            )
-            Neo4jService.run("""
-                MATCH (p:Product {productID: $productID})
-                MATCH (c:Category {categoryID: $categoryID})
-                CREATE (p)-[:PART_OF]->(c)
-            """, {"productID": int(product_id), "categoryID": int(data.get('categoryId'))})
-        
-        # Update supplier relationship if provided
-        if data.get('supplierId'):
-            Neo4jService.run(
-                "MATCH ()-[r:SUPPLIES]->(p:Product {productID: $id}) DELETE r",
-                {"id": int(product_id)}
-            )
-            Neo4jService.run("""
-                MATCH (p:Product {productID: $productID})
-                MATCH (s:Supplier {supplierID: $supplierID})
-                CREATE (s)-[:SUPPLIES]->(p)
-            """, {"productID": int(product_id), "supplierID": int(data.get('supplierId'))})
-        
+            ReferenceCache.invalidate("categories")
+        if data.get('categoryId') or data.get('supplierId'):
+            AnalyticsCache.invalidate("products", "orders")
+        EntityTag.invalidate("Product", int(product_id))
         return Response(result[0])
     
     elif request.method == 'DELETE':
-        check_query = "MATCH (p:Product {productID: $id}) RETURN p"
-        exists = Neo4jService.run(check_query, {"id": int(product_id)})
-        if not exists:
+        deleted, order_ids = Neo4jService.transaction(_delete_product, int(product_id))
+        if not deleted:
             return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        query = """
-        MATCH (p:Product {productID: $id})
-        DETACH DELETE p
-        """
-        Neo4jService.run(query, {"id": int(product_id)})
+        AnalyticsCache.invalidate("products", "orders")
+        ReferenceCache.invalidate("categories")
+        EntityTag.invalidate("Product", int(product_id))
+        for order_id in order_ids:
+            EntityTag.invalidate("Order", order_id)
         return Response({"message": "Product deleted"}, status=status.HTTP_204_NO_CONTENT)
 
 
+PRODUCT_ORDER_IDS = Query("products.order_ids", """
+MATCH (o:Order)-[:ORDERS]->(:Product {productID: $id})
+RETURN DISTINCT o.orderID AS id
+""")
+
+
+# The orders that had the product lose a line item, so their version moves
+# on like any other line-item change
+PRODUCT_DELETE = Query("products.delete", """
+MATCH (p:Product {productID: $id})
+OPTIONAL MATCH (o:Order)-[:ORDERS]->(p)
+WITH p, collect(DISTINCT o) AS orders
+FOREACH (o IN orders | SET o.version = coalesce(o.version, 0) + 1)
+DETACH DELETE p
+RETURN count(*) AS deleted
+""")
+
+
+def _delete_product(tx, product_id):
+    # Deleting the product drops its line items, so the orders that had
+    # them leave the rollups first and come back with their new totals
+    order_ids = [record["id"] for record in tx.run(PRODUCT_ORDER_IDS, id=product_id)]
+    retract_orders(tx, order_ids)
+    deleted = tx.run(PRODUCT_DELETE, id=product_id).single()["deleted"]
+    apply_orders(tx, order_ids)
+    return deleted, order_ids
+
+
+PRODUCT_UPDATE = Query("products.update", """
+MATCH (p:Product {productID: $id})
+SET p.version = coalesce(p.version, 0) + 1,
+    p.productName = $productName,
+    p.unitPrice = $unitPrice,
+    p.unitsInStock = $unitsInStock,
+    p.unitsOnOrder = $unitsOnOrder,
+    p.quantityPerUnit = $quantityPerUnit,
+    p.discontinued = $discontinued,
+    p.reorderLevel = $reorderLevel
+RETURN p.productID AS id, p.productName AS name
+""")
+
+
+PRODUCT_SET_CATEGORY = Query("products.set_category", """
+MATCH (p:Product {productID: $id})
+OPTIONAL MATCH (p)-[r:PART_OF]->()
+DELETE r
+WITH DISTINCT p
+MATCH (c:Category {categoryID: $categoryID})
+CREATE (p)-[:PART_OF]->(c)
+""")
+
+
+PRODUCT_SET_SUPPLIER = Query("products.set_supplier", """
+MATCH (p:Product {productID: $id})
+OPTIONAL MATCH ()-[r:SUPPLIES]->(p)
+DELETE r
+WITH DISTINCT p
+MATCH (s:Supplier {supplierID: $supplierID})
+CREATE (s)-[:SUPPLIES]->(p)
+""")
+
+
+def _update_product(tx, params):
+    result = [record.data() for record in tx.run(PRODUCT_UPDATE, params)]
+    if not result:
+        return result
+    
+    # Replace the category and supplier relationships if provided. The
+    # category and supplier rollups credit the product's orders to the old
+    # ones, so those orders leave the rollups first and come back afterwards
+    relink = params["categoryID"] is not None or params["supplierID"] is not None
+    order_ids = []
+    if relink:
+        order_ids = [record["id"] for record in tx.run(PRODUCT_ORDER_IDS, id=params["id"])]
+        retract_orders(tx, order_ids)
+    if params["categoryID"] is not None:
+        tx.run(PRODUCT_SET_CATEGORY, params).consume()
+    if params["supplierID"] is not None:
+        tx.run(PRODUCT_SET_SUPPLIER, params).consume()
+    apply_orders(tx, order_ids)
+    return result
+
+
+PRODUCT_ORDERS = Query("products.orders", """
+MATCH (o:Order)-[:ORDERS]->(p:Product {productID: $id})
+WHERE o.orderDate >= $from AND o.orderDate <= $to
+  AND ($after IS NULL
+       OR o.orderDate < date($after.key)
+       OR (o.orderDate = date($after.key) AND o.orderID < $after.id))
+MATCH (c:Customer)-[:PURCHASED]->(o)
+RETURN o.orderID AS orderId,
+       toString(o.orderDate) AS orderDate,
+       c.companyName AS customer,
+       c.customerID AS customerId
+ORDER BY o.orderDate DESC, o.orderID DESC
+LIMIT $limit
+""")
+
+
 @api_view(['GET'])
 def product_orders(request, product_id):
     """Get all orders containing this product"""
-    query = """
-    MATCH (o:Order)-[:ORDERS]->(p:Product {productID: $id})
-    MATCH (c:Customer)-[:PURCHASED]->(o)
-    RETURN o.orderID AS orderId,
-           o.orderDate AS orderDate,
-           c.companyName AS customer,
-           c.customerID AS customerId
-    ORDER BY o.orderDate DESC
-    LIMIT 50
-    """
-    data = Neo4jService.run(query, {"id": int(product_id)})
-    return Response(data)
+    page = KeysetPage(request, key="orderDate", id_field="orderId", default_size=50)
+    dates = DateRange(request)
+    return page.read(PRODUCT_ORDERS, {"id": int(product_id), **dates.params})
+
+
+CATEGORY_PRODUCTS = Query("categories.products", """
+MATCH (p:Product)-[:PART_OF]->(c:Category {categoryID: $id})
+RETURN p.productID AS id,
+       p.productName AS name,
+       p.unitPrice AS unitPrice,
+       p.unitsInStock AS unitsInStock
+ORDER BY p.productName
+""")
 
 
 @api_view(['GET'])
 def products_by_category(request, category_id):
     """Get all products in a category"""
-    query = """
-    MATCH (p:Product)-[:PART_OF]->(c:Category {categoryID: $id})
-    RETURN p.productID AS id,
-           p.productName AS name,
-           p.unitPrice AS unitPrice,
-           p.unitsInStock AS unitsInStock
-    ORDER BY p.productName
-    """
-    data = Neo4jService.run(query, {"id": int(category_id)})
+    data = Neo4jService.read(CATEGORY_PRODUCTS, {"id": int(category_id)})
     return Response(data)
 
 
+SUPPLIER_PRODUCTS = Query("suppliers.products", """
+MATCH (s:Supplier {supplierID: $id})-[:SUPPLIES]->(p:Product)
+OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)
+RETURN p.productID AS id,
+       p.productName AS name,
+       p.unitPrice AS unitPrice,
+       p.unitsInStock AS unitsInStock,
+       c.categoryName AS category
+ORDER BY p.productName
+""")
+
+
 @api_view(['GET'])
 def products_by_supplier(request, supplier_id):
     """Get all products from a supplier"""
-    query = """
-    MATCH (s:Supplier {supplierID: $id})-[:SUPPLIES]->(p:Product)
-    OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)
-    RETURN p.productID AS id,
-           p.productName AS name,
-           p.unitPrice AS unitPrice,
-           p.unitsInStock AS unitsInStock,
-           c.categoryName AS category
-    ORDER BY p.productName
-    """
-    data = Neo4jService.run(query, {"id": int(supplier_id)})
+    data = Neo4jService.read(SUPPLIER_PRODUCTS, {"id": int(supplier_id)})
     return Response(data)
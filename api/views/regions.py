@@ -1,93 +1,87 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from api.services.cache import ReferenceCache
 from api.services.neo4j import Neo4jService
+from api.queries import Query
+
+# Regions and territories have no write endpoints; both sets are served from
+# ReferenceCache and reloaded every REFERENCE_CACHE_TTL seconds
+REGIONS = Query("regions.list", """
+MATCH (r:Region)
+OPTIONAL MATCH (t:Territory)-[:IN_REGION]->(r)
+RETURN r.regionID AS id,
+       r.regionDescription AS name,
+       count(t) AS territoryCount
+ORDER BY r.regionDescription
+""")
+
+TERRITORIES = Query("territories.list", """
+MATCH (t:Territory)
+OPTIONAL MATCH (t)-[:IN_REGION]->(r:Region)
+RETURN t.territoryID AS id,
+       t.territoryDescription AS name,
+       r.regionID AS regionId,
+       r.regionDescription AS region
+ORDER BY t.territoryDescription
+""")
 
 
 @api_view(['GET'])
 def list_regions(request):
     """List all regions with territory count"""
-    query = """
-    MATCH (r:Region)
-    OPTIONAL MATCH (t:Territory)-[:IN_REGION]->(r)
-    RETURN r.regionID AS id,
-           r.regionDescription AS name,
-           count(t) AS territoryCount
-    ORDER BY r.regionDescription
-    """
-    data = Neo4jService.run(query)
-    return Response(data)
+    return Response(ReferenceCache.rows("regions", REGIONS))
 
 
 @api_view(['GET'])
 def get_region(request, region_id):
     """Get a single region by ID"""
-    query = """
-    MATCH (r:Region {regionID: $id})
-    RETURN r.regionID AS id,
-           r.regionDescription AS name
-    """
-    data = Neo4jService.run(query, {"id": int(region_id)})
-    if not data:
+    region = ReferenceCache.get("regions", REGIONS, int(region_id))
+    if region is None:
         return Response({"error": "Region not found"}, status=status.HTTP_404_NOT_FOUND)
-    return Response(data[0])
+    return Response({"id": region["id"], "name": region["name"]})
 
 
 @api_view(['GET'])
 def region_territories(request, region_id):
     """Get all territories in a region"""
-    query = """
-    MATCH (t:Territory)-[:IN_REGION]->(r:Region {regionID: $id})
-    RETURN t.territoryID AS id,
-           t.territoryDescription AS name
-    ORDER BY t.territoryDescription
-    """
-    data = Neo4jService.run(query, {"id": int(region_id)})
-    return Response(data)
+    return Response([
+        {"id": territory["id"], "name": territory["name"]}
+        for territory in ReferenceCache.rows("territories", TERRITORIES)
+        if territory["regionId"] == int(region_id)
+    ])
 
 
 @api_view(['GET'])
 def list_territories(request):
     """List all territories"""
-    query = """
-    MATCH (t:Territory)
-    OPTIONAL MATCH (t)-[:IN_REGION]->(r:Region)
-    RETURN t.territoryID AS id,
-           t.territoryDescription AS name,
-           r.regionDescription AS region
-    ORDER BY t.territoryDescription
-    """
-    data = Neo4jService.run(query)
-    return Response(data)
+    return Response([
+        {"id": territory["id"], "name": territory["name"], "region": territory["region"]}
+        for territory in ReferenceCache.rows("territories", TERRITORIES)
+    ])
 
 
 @api_view(['GET'])
 def get_territory(request, territory_id):
     """Get a single territory by ID"""
-    query = """
-    MATCH (t:Territory {territoryID: $id})
-    OPTIONAL MATCH (t)-[:IN_REGION]->(r:Region)
-    RETURN t.territoryID AS id,
-           t.territoryDescription AS name,
-           r.regionID AS regionId,
-           r.regionDescription AS region
-    """
-    data = Neo4jService.run(query, {"id": territory_id})
-    if not data:
+    territory = ReferenceCache.get("territories", TERRITORIES, territory_id)
+    if territory is None:
         return Response({"error": "Territory not found"}, status=status.HTTP_404_NOT_FOUND)
-    return Response(data[0])
+    return Response(territory)
+
+
+TERRITORY_EMPLOYEES = Query("territories.employees", """
+MATCH (e:Employee)-[:IN_TERRITORY]->(t:Territory {territoryID: $id})
+RETURN e.employeeID AS id,
+       e.firstName AS firstName,
+       e.lastName AS lastName,
+       e.title AS title
+ORDER BY e.lastName, e.firstName
+""")
 
 
 @api_view(['GET'])
 def territory_employees(request, territory_id):
     """Get all employees in a territory"""
-    query = """
-    MATCH (e:Employee)-[:IN_TERRITORY]->(t:Territory {territoryID: $id})
-    RETURN e.employeeID AS id,
-           e.firstName AS firstName,
-           e.lastName AS lastName,
-           e.title AS title
-    ORDER BY e.lastName, e.firstName
-    """
-    data = Neo4jService.run(query, {"id": territory_id})
+    data = Neo4jService.read(TERRITORY_EMPLOYEES, {"id": territory_id})
     return Response(data)
@@ -0,0 +1,105 @@
+import re
+
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import ParseError
+from api.pagination import KeysetPage
+from api.queries import Query
+
+# Characters with a meaning in Lucene query syntax
+LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+
+def _lucene_query(text):
+    """Turn free text into a Lucene query matching every word.
+
+    Each word matches exactly or as a prefix (so results update while the
+    user types), with exact matches scoring higher.
+    """
+    words = [LUCENE_SPECIAL.sub(r"\\\1", word) for word in text.lower().split()]
+    return " AND ".join(f"({word} OR {word}*)" for word in words)
+
+
+def _search_text(request):
+    text = request.query_params.get('q', '').strip()
+    if not text:
+        raise ParseError({"error": "q is required"})
+    return _lucene_query(text)
+
+
+PRODUCT_SEARCH = Query("search.products", """
+CALL db.index.fulltext.queryNodes('product_search', $q) YIELD node AS p, score
+WHERE ($category IS NULL OR EXISTS { MATCH (p)-[:PART_OF]->(:Category {categoryID: $category}) })
+  AND ($after IS NULL
+       OR score < $after.key
+       OR (score = $after.key AND p.productID > $after.id))
+OPTIONAL MATCH (p)-[:PART_OF]->(c:Category)
+RETURN p.productID AS id,
+       p.productName AS name,
+       p.unitPrice AS unitPrice,
+       c.categoryName AS category,
+       score
+ORDER BY score DESC, id
+LIMIT $limit
+""")
+
+
+@api_view(['GET'])
+def search_products(request):
+    """Search products by name, optionally within a category"""
+    q = _search_text(request)
+    page = KeysetPage(request, key="score", default_size=20)
+    try:
+        category = int(request.query_params.get('category') or 0) or None
+    except ValueError:
+        raise ParseError({"error": "category must be an integer"})
+    return page.read(PRODUCT_SEARCH, {"q": q, "category": category})
+
+
+CUSTOMER_SEARCH = Query("search.customers", """
+CALL db.index.fulltext.queryNodes('customer_search', $q) YIELD node AS c, score
+WHERE ($country IS NULL OR c.country = $country)
+  AND ($after IS NULL
+       OR score < $after.key
+       OR (score = $after.key AND c.customerID > $after.id))
+RETURN c.customerID AS id,
+       c.companyName AS name,
+       c.contactName AS contactName,
+       c.city AS city,
+       c.country AS country,
+       score
+ORDER BY score DESC, id
+LIMIT $limit
+""")
+
+
+@api_view(['GET'])
+def search_customers(request):
+    """Search customers by company name, contact name or city"""
+    q = _search_text(request)
+    page = KeysetPage(request, key="score", default_size=20)
+    return page.read(CUSTOMER_SEARCH, {"q": q, "country": request.query_params.get('country') or None})
+
+
+SUPPLIER_SEARCH = Query("search.suppliers", """
+CALL db.index.fulltext.queryNodes('supplier_search', $q) YIELD node AS s, score
+WHERE ($country IS NULL OR s.country = $country)
+  AND ($after IS NULL
+       OR score < $after.key
+       OR (score = $after.key AND s.supplierID > $after.id))
+RETURN s.supplierID AS id,
+       s.companyName AS name,
+       s.contactName AS contactName,
+       s.city AS city,
+       s.country AS country,
+       score
+ORDER BY score DESC, id
+LIMIT $limit
+""")
+
+
+@api_view(['GET'])
+def search_suppliers(request):
+    """Search suppliers by company name, contact name or city"""
+    q = _search_text(request)
+    page = KeysetPage(request, key="score", default_size=20)
+    return page.read(SUPPLIER_SEARCH, {"q": q, "country": request.query_params.get('country') or None})
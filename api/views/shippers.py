@@ -1,24 +1,44 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from neo4j.exceptions import ConstraintError
 from api.services.neo4j import Neo4jService
+from api.etags import EntityTag
+from api.pagination import KeysetPage
+from api.dates import DateRange
+from api.services.cache import AnalyticsCache, ReferenceCache
+from api.services.ids import IdService
+from api.queries import Query
+
+# Served from ReferenceCache; orderCount can lag by REFERENCE_CACHE_TTL
+SHIPPERS = Query("shippers.list", """
+MATCH (s:Shipper)
+OPTIONAL MATCH (s)-[:SHIPS]->(o:Order)
+RETURN s.shipperID AS id,
+       s.companyName AS name,
+       s.phone AS phone,
+       count(o) AS orderCount,
+       coalesce(s.version, 0) AS version
+ORDER BY s.companyName
+""")
+
+
+SHIPPER_CREATE = Query("shippers.create", """
+CREATE (s:Shipper {
+    shipperID: $shipperID,
+    version: 1,
+    companyName: $companyName,
+    phone: $phone
+})
+RETURN s.shipperID AS id, s.companyName AS name
+""")
 
 
 @api_view(['GET', 'POST'])
 def list_shippers(request):
     """List all shippers or create a new shipper"""
     if request.method == 'GET':
-        query = """
-        MATCH (s:Shipper)
-        OPTIONAL MATCH (s)-[:SHIPS]->(o:Order)
-        RETURN s.shipperID AS id,
-               s.companyName AS name,
-               s.phone AS phone,
-               count(o) AS orderCount
-        ORDER BY s.companyName
-        """
-        data = Neo4jService.run(query)
-        return Response(data)
+        return Response(ReferenceCache.rows("shippers", SHIPPERS))
     
     elif request.method == 'POST':
         data = request.data
@@ -29,86 +49,107 @@ def list_shippers(request):
             )
         
         # Get next shipper ID
-        id_query = "MATCH (s:Shipper) RETURN max(s.shipperID) AS maxId"
-        max_id_result = Neo4jService.run(id_query)
-        next_id = (max_id_result[0]['maxId'] or 0) + 1
+        next_id = IdService.next_id("Shipper")
         
-        query = """
-        CREATE (s:Shipper {
-            shipperID: $shipperID,
-            companyName: $companyName,
-            phone: $phone
-        })
-        RETURN s.shipperID AS id, s.companyName AS name
-        """
-        result = Neo4jService.run(query, {
-            "shipperID": next_id,
-            "companyName": data.get('companyName'),
-            "phone": data.get('phone', '')
-        })
+        try:
+            result = Neo4jService.write(SHIPPER_CREATE, {
+                "shipperID": next_id,
+                "companyName": data.get('companyName'),
+                "phone": data.get('phone', '')
+            })
+        except ConstraintError:
+            return Response(
+                {"error": f"Shipper {next_id} already exists"},
+                status=status.HTTP_409_CONFLICT
+            )
+        AnalyticsCache.invalidate("shippers")
+        ReferenceCache.invalidate("shippers")
         return Response(result[0], status=status.HTTP_201_CREATED)
 
 
+SHIPPER_UPDATE = Query("shippers.update", """
+MATCH (s:Shipper {shipperID: $id})
+SET s.version = coalesce(s.version, 0) + 1,
+    s.companyName = $companyName,
+    s.phone = $phone
+RETURN s.shipperID AS id, s.companyName AS name
+""")
+
+
+SHIPPER_DELETE = Query("shippers.delete", """
+MATCH (s:Shipper {shipperID: $id})
+DETACH DELETE s
+RETURN count(*) AS deleted
+""")
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 def get_shipper(request, shipper_id):
     """Get, update or delete a shipper"""
     if request.method == 'GET':
-        query = """
-        MATCH (s:Shipper {shipperID: $id})
-        RETURN s.shipperID AS id,
-               s.companyName AS name,
-               s.phone AS phone
-        """
-        data = Neo4jService.run(query, {"id": int(shipper_id)})
-        if not data:
+        shipper = ReferenceCache.get("shippers", SHIPPERS, int(shipper_id))
+        if shipper is None:
             return Response({"error": "Shipper not found"}, status=status.HTTP_404_NOT_FOUND)
-        return Response(data[0])
+        # The cached row carries the version, so the tag costs no query
+        tag = EntityTag(request, "Shipper", int(shipper_id), version=[shipper["version"]])
+        if tag.is_fresh():
+            return tag.not_modified()
+        return tag.response({
+            "id": shipper["id"],
+            "name": shipper["name"],
+            "phone": shipper["phone"],
+        })
     
     elif request.method == 'PUT':
         data = request.data
-        query = """
-        MATCH (s:Shipper {shipperID: $id})
-        SET s.companyName = $companyName,
-            s.phone = $phone
-        RETURN s.shipperID AS id, s.companyName AS name
-        """
-        result = Neo4jService.run(query, {
+        result = Neo4jService.write(SHIPPER_UPDATE, {
             "id": int(shipper_id),
             "companyName": data.get('companyName', ''),
             "phone": data.get('phone', '')
         })
         if not result:
             return Response({"error": "Shipper not found"}, status=status.HTTP_404_NOT_FOUND)
+        AnalyticsCache.invalidate("shippers")
+        ReferenceCache.invalidate("shippers")
         return Response(result[0])
     
     elif request.method == 'DELETE':
-        check_query = "MATCH (s:Shipper {shipperID: $id}) RETURN s"
-        exists = Neo4jService.run(check_query, {"id": int(shipper_id)})
-        if not exists:
+        result = Neo4jService.write(SHIPPER_DELETE, {"id": int(shipper_id)})
+        if not result[0]["deleted"]:
             return Response({"error": "Shipper not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        query = """
-        MATCH (s:Shipper {shipperID: $id})
-        DETACH DELETE s
-        """
-        Neo4jService.run(query, {"id": int(shipper_id)})
+        AnalyticsCache.invalidate("shippers")
+        ReferenceCache.invalidate("shippers")
         return Response({"message": "Shipper deleted"}, status=status.HTTP_204_NO_CONTENT)
 
 
+SHIPPER_ORDERS = Query("shippers.orders", """
+MATCH (s:Shipper {shipperID: $id})-[:SHIPS]->(o:Order)
+WHERE coalesce(o.shippedDate, date('0001-01-01')) >= $from
+  AND coalesce(o.shippedDate, date('0001-01-01')) <= $to
+  AND ($after IS NULL
+       OR coalesce(o.shippedDate, date('0001-01-01')) < date($after.key)
+       OR (coalesce(o.shippedDate, date('0001-01-01')) = date($after.key) AND o.orderID < $after.id))
+MATCH (c:Customer)-[:PURCHASED]->(o)
+RETURN o.orderID AS orderId,
+       toString(o.orderDate) AS orderDate,
+       toString(o.shippedDate) AS shippedDate,
+       o.shipCity AS shipCity,
+       o.shipCountry AS shipCountry,
+       c.companyName AS customer
+ORDER BY coalesce(o.shippedDate, date('0001-01-01')) DESC, o.orderID DESC
+LIMIT $limit
+""")
+
+
 @api_view(['GET'])
 def shipper_orders(request, shipper_id):
     """Get all orders shipped by this shipper"""
-    query = """
-    MATCH (s:Shipper {shipperID: $id})-[:SHIPS]->(o:Order)
-    MATCH (c:Customer)-[:PURCHASED]->(o)
-    RETURN o.orderID AS orderId,
-           o.orderDate AS orderDate,
-           o.shippedDate AS shippedDate,
-           o.shipCity AS shipCity,
-           o.shipCountry AS shipCountry,
-           c.companyName AS customer
-    ORDER BY o.shippedDate DESC
-    LIMIT 50
-    """
-    data = Neo4jService.run(query, {"id": int(shipper_id)})
-    return Response(data)
+    # Unshipped orders have no shippedDate; they sort last as the minimum date
+    page = KeysetPage(
+        request,
+        key=lambda row: row["shippedDate"] or "0001-01-01",
+        id_field="orderId",
+        default_size=50,
+    )
+    dates = DateRange(request)
+    return page.read(SHIPPER_ORDERS, {"id": int(shipper_id), **dates.params})
@@ -1,27 +1,75 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from neo4j.exceptions import ConstraintError
 from api.services.neo4j import Neo4jService
+from api.etags import EntityTag
+from api.fields import FieldSet
+from api.services.cache import AnalyticsCache
+from api.services.ids import IdService
+from api.queries import Query
+
+
+# Every field ?fields= can ask for, see api.fields
+SUPPLIER_COLUMNS = {
+    "id": "s.supplierID",
+    "name": "s.companyName",
+    "contactName": "s.contactName",
+    "contactTitle": "s.contactTitle",
+    "address": "s.address",
+    "city": "s.city",
+    "region": "s.region",
+    "postalCode": "s.postalCode",
+    "country": "s.country",
+    "phone": "s.phone",
+    "fax": "s.fax",
+    "homePage": "s.homePage",
+    "productCount": ("count(p)", "OPTIONAL MATCH (s)-[:SUPPLIES]->(p:Product)"),
+}
+SUPPLIER_LIST_FIELDS = [
+    "id", "name", "contactName", "contactTitle", "city", "country", "phone", "productCount",
+]
+SUPPLIER_DETAIL_FIELDS = [
+    "id", "name", "contactName", "contactTitle", "address", "city", "region",
+    "postalCode", "country", "phone", "fax", "homePage",
+]
+
+
+SUPPLIER_LIST = Query("suppliers.list", """
+MATCH (s:Supplier)
+{matches}
+RETURN {returns}
+ORDER BY name
+""", columns=SUPPLIER_COLUMNS)
+
+
+SUPPLIER_CREATE = Query("suppliers.create", """
+CREATE (s:Supplier {
+    supplierID: $supplierID,
+    version: 1,
+    companyName: $companyName,
+    contactName: $contactName,
+    contactTitle: $contactTitle,
+    address: $address,
+    city: $city,
+    region: $region,
+    postalCode: $postalCode,
+    country: $country,
+    phone: $phone,
+    fax: $fax,
+    homePage: $homePage
+})
+RETURN s.supplierID AS id, s.companyName AS name
+""")
 
 
 @api_view(['GET', 'POST'])
 def list_suppliers(request):
     """List all suppliers or create a new supplier"""
     if request.method == 'GET':
-        query = """
-        MATCH (s:Supplier)
-        OPTIONAL MATCH (s)-[:SUPPLIES]->(p:Product)
-        RETURN s.supplierID AS id,
-               s.companyName AS name,
-               s.contactName AS contactName,
-               s.contactTitle AS contactTitle,
-               s.city AS city,
-               s.country AS country,
-               s.phone AS phone,
-               count(p) AS productCount
-        ORDER BY s.companyName
-        """
-        data = Neo4jService.run(query)
+        fields = FieldSet(request, SUPPLIER_COLUMNS, SUPPLIER_LIST_FIELDS, required=("id", "name"))
+        query = fields.query(SUPPLIER_LIST)
+        data = Neo4jService.read(query)
         return Response(data)
     
     elif request.method == 'POST':
@@ -33,86 +81,87 @@ def list_suppliers(request):
             )
         
         # Get next supplier ID
-        id_query = "MATCH (s:Supplier) RETURN max(s.supplierID) AS maxId"
-        max_id_result = Neo4jService.run(id_query)
-        next_id = (max_id_result[0]['maxId'] or 0) + 1
+        next_id = IdService.next_id("Supplier")
         
-        query = """
-        CREATE (s:Supplier {
-            supplierID: $supplierID,
-            companyName: $companyName,
-            contactName: $contactName,
-            contactTitle: $contactTitle,
-            address: $address,
-            city: $city,
-            region: $region,
-            postalCode: $postalCode,
-            country: $country,
-            phone: $phone,
-            fax: $fax,
-            homePage: $homePage
-        })
-        RETURN s.supplierID AS id, s.companyName AS name
-        """
-        result = Neo4jService.run(query, {
-            "supplierID": next_id,
-            "companyName": data.get('companyName'),
-            "contactName": data.get('contactName', ''),
-            "contactTitle": data.get('contactTitle', ''),
-            "address": data.get('address', ''),
-            "city": data.get('city', ''),
-            "region": data.get('region', ''),
-            "postalCode": data.get('postalCode', ''),
-            "country": data.get('country', ''),
-            "phone": data.get('phone', ''),
-            "fax": data.get('fax', ''),
-            "homePage": data.get('homePage', '')
-        })
+        try:
+            result = Neo4jService.write(SUPPLIER_CREATE, {
+                "supplierID": next_id,
+                "companyName": data.get('companyName'),
+                "contactName": data.get('contactName', ''),
+                "contactTitle": data.get('contactTitle', ''),
+                "address": data.get('address', ''),
+                "city": data.get('city', ''),
+                "region": data.get('region', ''),
+                "postalCode": data.get('postalCode', ''),
+                "country": data.get('country', ''),
+                "phone": data.get('phone', ''),
+                "fax": data.get('fax', ''),
+                "homePage": data.get('homePage', '')
+            })
+        except ConstraintError:
+            return Response(
+                {"error": f"Supplier {next_id} already exists"},
+                status=status.HTTP_409_CONFLICT
+            )
+        AnalyticsCache.invalidate("suppliers")
         return Response(result[0], status=status.HTTP_201_CREATED)
 
 
+SUPPLIER_VERSION = Query("suppliers.version", """
+MATCH (s:Supplier {supplierID: $id})
+RETURN [coalesce(s.version, 0)] AS version
+""")
+
+
+SUPPLIER_DETAIL = Query("suppliers.detail", """
+MATCH (s:Supplier {supplierID: $id})
+{matches}
+RETURN {returns}
+""", columns=SUPPLIER_COLUMNS)
+
+
+SUPPLIER_UPDATE = Query("suppliers.update", """
+MATCH (s:Supplier {supplierID: $id})
+SET s.version = coalesce(s.version, 0) + 1,
+    s.companyName = $companyName,
+    s.contactName = $contactName,
+    s.contactTitle = $contactTitle,
+    s.address = $address,
+    s.city = $city,
+    s.region = $region,
+    s.postalCode = $postalCode,
+    s.country = $country,
+    s.phone = $phone,
+    s.fax = $fax,
+    s.homePage = $homePage
+RETURN s.supplierID AS id, s.companyName AS name
+""")
+
+
+SUPPLIER_DELETE = Query("suppliers.delete", """
+MATCH (s:Supplier {supplierID: $id})
+DETACH DELETE s
+RETURN count(*) AS deleted
+""")
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 def get_supplier(request, supplier_id):
     """Get, update or delete a supplier"""
     if request.method == 'GET':
-        query = """
-        MATCH (s:Supplier {supplierID: $id})
-        RETURN s.supplierID AS id,
-               s.companyName AS name,
-               s.contactName AS contactName,
-               s.contactTitle AS contactTitle,
-               s.address AS address,
-               s.city AS city,
-               s.region AS region,
-               s.postalCode AS postalCode,
-               s.country AS country,
-               s.phone AS phone,
-               s.fax AS fax,
-               s.homePage AS homePage
-        """
-        data = Neo4jService.run(query, {"id": int(supplier_id)})
+        tag = EntityTag(request, "Supplier", int(supplier_id), SUPPLIER_VERSION)
+        if tag.is_fresh():
+            return tag.not_modified()
+        fields = FieldSet(request, SUPPLIER_COLUMNS, SUPPLIER_DETAIL_FIELDS)
+        query = fields.query(SUPPLIER_DETAIL)
+        data = Neo4jService.read(query, {"id": int(supplier_id)})
         if not data:
             return Response({"error": "Supplier not found"}, status=status.HTTP_404_NOT_FOUND)
-        return Response(data[0])
+        return tag.response(data[0])
     
     elif request.method == 'PUT':
         data = request.data
-        query = """
-        MATCH (s:Supplier {supplierID: $id})
-        SET s.companyName = $companyName,
-            s.contactName = $contactName,
-            s.contactTitle = $contactTitle,
-            s.address = $address,
-            s.city = $city,
-            s.region = $region,
-            s.postalCode = $postalCode,
-            s.country = $country,
-            s.phone = $phone,
-            s.fax = $fax,
-            s.homePage = $homePage
-        RETURN s.supplierID AS id, s.companyName AS name
-        """
-        result = Neo4jService.run(query, {
+        result = Neo4jService.write(SUPPLIER_UPDATE, {
             "id": int(supplier_id),
             "companyName": data.get('companyName', ''),
             "contactName": data.get('contactName', ''),
@@ -128,17 +177,13 @@ def get_supplier(request, supplier_id):
         })
         if not result:
             return Response({"error": "Supplier not found"}, status=status.HTTP_404_NOT_FOUND)
+        EntityTag.invalidate("Supplier", int(supplier_id))
         return Response(result[0])
     
     elif request.method == 'DELETE':
-        check_query = "MATCH (s:Supplier {supplierID: $id}) RETURN s"
-        exists = Neo4jService.run(check_query, {"id": int(supplier_id)})
-        if not exists:
+        result = Neo4jService.write(SUPPLIER_DELETE, {"id": int(supplier_id)})
+        if not result[0]["deleted"]:
             return Response({"error": "Supplier not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        query = """
-        MATCH (s:Supplier {supplierID: $id})
-        DETACH DELETE s
-        """
-        Neo4jService.run(query, {"id": int(supplier_id)})
+        AnalyticsCache.invalidate("suppliers")
+        EntityTag.invalidate("Supplier", int(supplier_id))
         return Response({"message": "Supplier deleted"}, status=status.HTTP_204_NO_CONTENT)
@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+from api.services.neo4j import AsyncNeo4jService  # noqa: E402
+from api.services.schema import start_schema_check  # noqa: E402
+
+# Every request on this worker runs on one event loop, so the async driver
+# and its connection pool can live as long as the worker
+AsyncNeo4jService.long_lived_loop = True
+start_schema_check()
@@ -44,17 +44,55 @@ INSTALLED_APPS = [
     'rest_framework',
     
 ]
+# Default and maximum page size for cursor-paginated lists, see api.pagination
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+# Orders written per transaction by POST /orders/bulk/
+API_BULK_BATCH_SIZE = 500
+# Per-worker map of detail-view ETags, see api.etags
+API_ETAG_TTL = 10  # seconds
+API_ETAG_CACHE_SIZE = 100000
+# Analytics result cache, see api.services.cache
+ANALYTICS_CACHE_TTL = 60  # seconds
+ANALYTICS_CACHE_MAX_BYTES = 16 * 1024 * 1024
+# Categories, shippers, regions and territories, see api.services.cache
+REFERENCE_CACHE_TTL = 300  # seconds
+# Responses smaller than this are sent uncompressed, see api.middleware
+API_GZIP_MIN_BYTES = 1024
 REST_FRAMEWORK = {
+    # JSON is the default; clients can ask for the others with Accept or ?format=
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.ColumnarJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
 }
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_EXPOSE_HEADERS = ["ETag"]
 NEO4J_URI = "neo4j://127.0.0.1:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "123456789"
+NEO4J_DATABASE = None  # the server's default database
+# Driver connection pool and managed-transaction retry settings
+NEO4J_MAX_CONNECTION_POOL_SIZE = 100
+NEO4J_MAX_CONNECTION_LIFETIME = 3600  # seconds
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = 60  # seconds
+NEO4J_MAX_TRANSACTION_RETRY_TIME = 30  # seconds
+# IDs reserved per worker from the (:Sequence) nodes, see api.services.ids
+NEO4J_ID_BLOCK_SIZE = 100
+# Warn at startup about missing constraints/indexes, see `manage.py ensure_schema`
+NEO4J_SCHEMA_CHECK = True
+# Log queries slower than this (None disables), see api.services.metrics
+NEO4J_SLOW_QUERY_MS = 500
+# Run queries under PROFILE so /metrics can report db hits (adds overhead)
+NEO4J_PROFILE_QUERIES = False
 MIDDLEWARE = [
+    'api.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -63,6 +101,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.QueryMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'